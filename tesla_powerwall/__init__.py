@@ -1,42 +1,161 @@
 # ruff: noqa: F401
 
-from .api import API
-from .const import (
-    SUPPORTED_OPERATION_MODES,
-    DeviceType,
-    GridState,
-    GridStatus,
-    IslandMode,
-    LineStatus,
-    MeterType,
-    OperationMode,
-    Roles,
-    SyncType,
-    User,
-)
-from .error import (
-    AccessDeniedError,
-    ApiError,
-    MeterNotAvailableError,
-    MissingAttributeError,
-    PowerwallError,
-    PowerwallUnreachableError,
-)
-from .helpers import assert_attribute, convert_to_kw
-from .powerwall import Powerwall
-from .responses import (
-    BatteryResponse,
-    LoginResponse,
-    MeterDetailsReadings,
-    MeterDetailsResponse,
-    MeterResponse,
-    MetersAggregatesResponse,
-    PowerwallStatusResponse,
-    SiteInfoResponse,
-    SiteMasterResponse,
-    SolarResponse,
-)
+# The public API is loaded lazily on first attribute access (PEP 562), so
+# importing the package or a light submodule like `const` does not import
+# aiohttp, yarl and orjson. Even typing is only imported for type checkers.
+
+import importlib
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Dict, List
+
+    from .api import API
+    from .battery_table import BatteryBlockTable
+    from .const import (
+        SUPPORTED_OPERATION_MODES,
+        DeviceType,
+        GridState,
+        GridStatus,
+        IslandMode,
+        LineStatus,
+        MeterType,
+        OperationMode,
+        Roles,
+        SyncType,
+        User,
+    )
+    from .discovery import DiscoveredGateway, discover
+    from .download import DownloadResult
+    from .energy import EnergyIntegrator, EnergyInterval, PowerIntegrator
+    from .error import (
+        AccessDeniedError,
+        ApiError,
+        ApiStatusError,
+        InvalidResponseError,
+        MeterNotAvailableError,
+        MissingAttributeError,
+        PowerwallError,
+        PowerwallUnreachableError,
+        RequestTimeoutError,
+        ResponseTooLargeError,
+        SnapshotDecodeError,
+    )
+    from .failover import FailoverAPI
+    from .helpers import (
+        assert_attribute,
+        classify_power_flows,
+        convert_to_kw,
+        convert_to_kw_many,
+    )
+    from .history import MeterHistory
+    from .phases import PhaseAnalytics, PhaseReadings
+    from .powerwall import Powerwall
+    from .responses import (
+        BatteryResponse,
+        LoginResponse,
+        MeterDetailsReadings,
+        MeterDetailsResponse,
+        MeterResponse,
+        MetersAggregatesResponse,
+        PowerwallStatusResponse,
+        SiteInfoResponse,
+        SiteMasterResponse,
+        SolarResponse,
+        SystemStatusResponse,
+    )
+    from .rollups import TelemetryRollups
+    from .snapshot import TelemetrySnapshot
+    from .sqlite_sink import SQLiteSink
+    from .sync import SyncPowerwall
+    from .timeouts import AdaptiveTimeout, FixedTimeout, TimeoutPolicy, deadline
 
 VERSION = "0.5.2"
 
-__all__ = list(filter(lambda n: not n.startswith("_"), globals().keys()))
+# Must be kept in sync with the imports above
+_EXPORTS = {
+    "api": ("API",),
+    "battery_table": ("BatteryBlockTable",),
+    "const": (
+        "SUPPORTED_OPERATION_MODES",
+        "DeviceType",
+        "GridState",
+        "GridStatus",
+        "IslandMode",
+        "LineStatus",
+        "MeterType",
+        "OperationMode",
+        "Roles",
+        "SyncType",
+        "User",
+    ),
+    "discovery": ("DiscoveredGateway", "discover"),
+    "download": ("DownloadResult",),
+    "energy": ("EnergyIntegrator", "EnergyInterval", "PowerIntegrator"),
+    "error": (
+        "AccessDeniedError",
+        "ApiError",
+        "ApiStatusError",
+        "InvalidResponseError",
+        "MeterNotAvailableError",
+        "MissingAttributeError",
+        "PowerwallError",
+        "PowerwallUnreachableError",
+        "RequestTimeoutError",
+        "ResponseTooLargeError",
+        "SnapshotDecodeError",
+    ),
+    "failover": ("FailoverAPI",),
+    "helpers": (
+        "assert_attribute",
+        "classify_power_flows",
+        "convert_to_kw",
+        "convert_to_kw_many",
+    ),
+    "history": ("MeterHistory",),
+    "phases": ("PhaseAnalytics", "PhaseReadings"),
+    "powerwall": ("Powerwall",),
+    "responses": (
+        "BatteryResponse",
+        "LoginResponse",
+        "MeterDetailsReadings",
+        "MeterDetailsResponse",
+        "MeterResponse",
+        "MetersAggregatesResponse",
+        "PowerwallStatusResponse",
+        "SiteInfoResponse",
+        "SiteMasterResponse",
+        "SolarResponse",
+        "SystemStatusResponse",
+    ),
+    "rollups": ("TelemetryRollups",),
+    "snapshot": ("TelemetrySnapshot",),
+    "sqlite_sink": ("SQLiteSink",),
+    "sync": ("SyncPowerwall",),
+    "timeouts": ("AdaptiveTimeout", "FixedTimeout", "TimeoutPolicy", "deadline"),
+}
+
+_MODULES: "Dict[str, str]" = {
+    name: module for module, names in _EXPORTS.items() for name in names
+}
+
+# Like before the package was lazy, __all__ also lists the submodules, which
+# used to be imported and thereby set as attributes of the package
+__all__: "List[str]" = [*_EXPORTS, *_MODULES, "VERSION"]
+
+
+def __getattr__(name: str) -> "Any":
+    module = _MODULES.get(name)
+    if module is None:
+        if name in _EXPORTS:
+            # Submodules were attributes of the package before it was lazy
+            return importlib.import_module("." + name, __name__)
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    # Cache the attribute so __getattr__ is only called once per name
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> "List[str]":
+    return sorted(set(globals()) | set(__all__))
@@ -1,28 +1,92 @@
+import asyncio
+import json
+import time
+from concurrent.futures import Executor
 from http.client import responses
 from json.decoder import JSONDecodeError
 from types import TracebackType
-from typing import Any, List, Optional, Type
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
 
 import aiohttp
 import orjson
 from yarl import URL
 
-from .error import AccessDeniedError, ApiError, PowerwallUnreachableError
+from .download import (
+    DEFAULT_CHUNK_SIZE,
+    Destination,
+    DownloadResult,
+    ProgressCallback,
+    resume_offset,
+    write_response,
+)
+from .error import (
+    AccessDeniedError,
+    ApiError,
+    ApiStatusError,
+    PowerwallUnreachableError,
+    RequestTimeoutError,
+)
+from .timeouts import TimeoutPolicy, as_policy, remaining
+
+# Bodies of at least this many bytes are decoded in an executor. Decoding
+# 64 KiB inline blocks the event loop for well below a millisecond.
+DEFAULT_OFFLOAD_THRESHOLD = 64 * 1024
+DEFAULT_MAX_ERROR_BODY_SIZE = 4096
+
+
+def _keep_object(value: dict) -> dict:
+    return value
+
+
+def _decode_large_json(content: bytes) -> Any:
+    """
+    Decodes content in a way which lets other threads run while decoding.
+
+    orjson holds the GIL until the whole document is decoded, so decoding a
+    large body in a worker thread would still block the event loop. The
+    json module calls the Python object hook for every object, which allows
+    the interpreter to switch to the thread of the event loop in between.
+    """
+    return json.loads(content, object_hook=_keep_object)
 
 
 class API(object):
     def __init__(
         self,
         endpoint: str,
-        timeout: int = 10,
+        timeout: Optional[Union[float, TimeoutPolicy]] = 10,
         http_session: Optional[aiohttp.ClientSession] = None,
         verify_ssl: bool = False,
+        endpoint_timeouts: Optional[
+            Dict[str, Optional[Union[float, TimeoutPolicy]]]
+        ] = None,
+        offload_threshold: Optional[int] = DEFAULT_OFFLOAD_THRESHOLD,
+        executor: Optional[Executor] = None,
+        max_error_body_size: int = DEFAULT_MAX_ERROR_BODY_SIZE,
+        read_error_body: bool = True,
     ) -> None:
+        # At most max_error_body_size bytes of the body of an error response
+        # are read and kept in the ApiStatusError. With read_error_body=False
+        # the body is not read at all and only the status is reported.
+        self._max_error_body_size = max_error_body_size
+        self._read_error_body = read_error_body
+        # Bodies of at least offload_threshold bytes are decoded in executor
+        # (the default executor of the loop if None) instead of on the event
+        # loop. None decodes all bodies inline.
+        self._offload_threshold = offload_threshold
+        self._executor = executor
+
         # Required if endpoint is a single ip address, because yarl does not correctly process them.
         if not endpoint.startswith("http"):
             endpoint = f"https://{endpoint}"
         self._endpoint = URL(endpoint).with_path("api").with_scheme("https")
-        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        # The timeout of each request is decided by the policy of its path in
+        # endpoint_timeouts or by timeout. Numbers are fixed timeouts.
+        self._timeout = as_policy(timeout)
+        self._endpoint_timeouts = {
+            path: as_policy(policy)
+            for path, policy in (endpoint_timeouts or {}).items()
+        }
         self._owns_http_session = False if http_session else True
         self._ssl = None if verify_ssl else False
 
@@ -37,41 +101,64 @@ class API(object):
             jar = aiohttp.CookieJar(unsafe=True)
             self._http_session = aiohttp.ClientSession(cookie_jar=jar)
 
-    @staticmethod
-    async def _handle_error(response: aiohttp.ClientResponse) -> None:
+    async def _read_bounded_body(
+        self, response: aiohttp.ClientResponse
+    ) -> Tuple[bytes, bool]:
+        """
+        Reads at most max_error_body_size bytes of the body and returns them
+        together with whether the body was truncated
+        """
+        limit = self._max_error_body_size
+        body = b""
+        # One byte more than the limit tells whether the body is longer
+        while len(body) <= limit:
+            chunk = await response.content.read(limit + 1 - len(body))
+            if not chunk:
+                break
+            body += chunk
+        return body[:limit], len(body) > limit
+
+    async def _handle_error(self, response: aiohttp.ClientResponse) -> None:
+        try:
+            await self._raise_error(response)
+        finally:
+            # Closes the connection instead of reading the rest of the body if
+            # the body was not read completely
+            response.release()
+
+    async def _raise_error(self, response: aiohttp.ClientResponse) -> None:
         if response.status == 404:
             raise ApiError(
                 "The url {} returned error 404".format(str(response.real_url))
             )
 
         if response.status == 401 or response.status == 403:
-            response_json = None
+            if not self._read_error_body:
+                raise AccessDeniedError(str(response.real_url))
+            body, _ = await self._read_bounded_body(response)
             try:
-                response_json = await response.json(loads=orjson.loads)
+                response_json = orjson.loads(body)
+                error = response_json.get("error")
+                message = response_json.get("message")
             except Exception:
                 raise AccessDeniedError(str(response.real_url))
             else:
-                raise AccessDeniedError(
-                    str(response.real_url),
-                    response_json.get("error"),
-                    response_json.get("message"),
-                )
-
-        response_text = await response.text()
-        if response_text is not None and len(response_text) > 0:
-            raise ApiError(
-                "API returned status code '{}: {}' with body: {}".format(
-                    response.status,
-                    responses.get(response.status),
-                    response_text,
-                )
-            )
-        else:
-            raise ApiError(
-                "API returned status code '{}: {}' ".format(
-                    response.status, responses.get(response.status)
-                )
-            )
+                raise AccessDeniedError(str(response.real_url), error, message)
+
+        if not self._read_error_body:
+            raise ApiStatusError(response.status, responses.get(response.status))
+
+        body, truncated = await self._read_bounded_body(response)
+        body_size = response.content_length
+        if body_size is None and not truncated:
+            body_size = len(body)
+        raise ApiStatusError(
+            response.status,
+            responses.get(response.status),
+            body.decode(errors="replace") if body else None,
+            body_size,
+            truncated,
+        )
 
     async def _process_response(self, response: aiohttp.ClientResponse) -> dict:
         if response.status >= 400:
@@ -79,14 +166,24 @@ class API(object):
             await self._handle_error(response)
 
         content = await response.read()
-        if len(content) == 0:
+        if len(content) == 0 or content.isspace():
             return {}
 
         try:
-            response_json = await response.json(content_type=None, loads=orjson.loads)
-        except JSONDecodeError:
+            if (
+                self._offload_threshold is not None
+                and len(content) >= self._offload_threshold
+            ):
+                response_json = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, _decode_large_json, content
+                )
+            else:
+                response_json = orjson.loads(content)
+        except (JSONDecodeError, UnicodeDecodeError, RecursionError):
             raise ApiError(
-                "Error while decoding json of response: {}".format(response.text)
+                "Error while decoding json of response: {}".format(
+                    content[: self._max_error_body_size].decode(errors="replace")
+                )
             )
 
         if response_json is None:
@@ -102,18 +199,48 @@ class API(object):
     def url(self, path: str) -> URL:
         return self._endpoint.joinpath(path)
 
-    async def get(self, path: str, headers: dict = {}) -> Any:
+    def timeout_policy(self, path: str) -> TimeoutPolicy:
+        return self._endpoint_timeouts.get(path, self._timeout)
+
+    async def _request(self, method: str, path: str, **kwargs: Any) -> Any:
+        policy = self.timeout_policy(path)
+        timeout = policy.timeout(path)
+        # False if the deadline shortened the timeout, then a timed out
+        # request says nothing about the latency of the endpoint
+        limited_by_policy = True
+        left = remaining()
+        if left is not None:
+            if left <= 0:
+                raise RequestTimeoutError(path, 0)
+            if timeout is None or left < timeout:
+                timeout = left
+                limited_by_policy = False
+
+        start = time.monotonic()
         try:
-            response = await self._http_session.get(
+            response = await self._http_session.request(
+                method,
                 url=self.url(path),
-                timeout=self._timeout,
-                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout),
                 ssl=self._ssl,
+                **kwargs,
             )
+            result = await self._process_response(response)
+        except asyncio.TimeoutError:
+            elapsed = time.monotonic() - start
+            if limited_by_policy:
+                policy.observe(path, elapsed)
+            raise RequestTimeoutError(
+                path, elapsed if timeout is None else timeout
+            ) from None
         except aiohttp.ClientConnectionError as e:
             raise PowerwallUnreachableError(str(e))
 
-        return await self._process_response(response)
+        policy.observe(path, time.monotonic() - start)
+        return result
+
+    async def get(self, path: str, headers: dict = {}) -> Any:
+        return await self._request("GET", path, headers=headers)
 
     async def post(
         self,
@@ -121,18 +248,60 @@ class API(object):
         payload: dict,
         headers: dict = {},
     ) -> Any:
+        return await self._request("POST", path, json=payload, headers=headers)
+
+    async def download(
+        self,
+        path: str,
+        destination: Destination,
+        compression: Optional[str] = None,
+        max_size: Optional[int] = None,
+        resume: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        progress: Optional[ProgressCallback] = None,
+    ) -> DownloadResult:
+        """
+        Streams the body of path to destination, a path or a sink with a
+        (possibly async) write method. See `tesla_powerwall.download`.
+
+        With resume=True, the download continues after the bytes already in
+        the file at destination if the gateway supports range requests and
+        starts over otherwise. Resuming is not possible for compressed
+        downloads. To abort a download, cancel it.
+        """
+        if resume and compression is not None:
+            raise ValueError("Compressed downloads can not be resumed")
+        offset = resume_offset(destination) if resume else 0
+        headers = {"Range": "bytes={}-".format(offset)} if offset else {}
+
+        # The total timeout would limit the duration of the whole download
+        seconds = self.timeout_policy(path).timeout(path)
+        timeout = aiohttp.ClientTimeout(sock_connect=seconds, sock_read=seconds)
         try:
-            response = await self._http_session.post(
-                url=self.url(path),
-                json=payload,
-                timeout=self._timeout,
-                headers=headers,
-                ssl=self._ssl,
+            response = await self._http_session.get(
+                url=self.url(path), timeout=timeout, headers=headers, ssl=self._ssl
             )
         except aiohttp.ClientConnectionError as e:
             raise PowerwallUnreachableError(str(e))
 
-        return await self._process_response(response)
+        async with response:
+            if offset and response.status == 416:
+                # Range Not Satisfiable: the file is already complete
+                return DownloadResult(0, 0, offset, 0.0, True)
+            if response.status >= 400:
+                await self._handle_error(response)
+            if response.status != 206:
+                offset = 0
+            return await write_response(
+                response,
+                destination,
+                resumed_from=offset,
+                compression=compression,
+                max_size=max_size,
+                chunk_size=chunk_size,
+                progress=progress,
+                executor=self._executor,
+            )
 
     def is_authenticated(self) -> bool:
         for cookie in self._http_session.cookie_jar:
@@ -229,6 +398,12 @@ class API(object):
     async def get_logs(self):
         return await self.get("getlogs")
 
+    async def download_logs(
+        self, destination: Destination, **kwargs: Any
+    ) -> DownloadResult:
+        """Streams the logs to destination, see `download`"""
+        return await self.download("getlogs", destination, **kwargs)
+
     async def get_meters(self) -> list:
         return await self.get("meters")
 
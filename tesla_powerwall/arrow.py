@@ -0,0 +1,265 @@
+"""
+Columnar export of TelemetrySnapshots to Arrow record batches and Parquet.
+
+Requires pyarrow, which is installed by `pip install tesla_powerwall[arrow]`.
+
+Snapshots are converted into two tables: one row per snapshot with the SOE,
+grid status, operation mode and the fields of every meter, and one row per
+battery pack and snapshot. Rows are buffered per column and converted into a
+record batch once chunk_size rows are buffered, so the memory needed does
+not depend on the number of exported snapshots. Enums are dictionary encoded.
+"""
+
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+
+from .battery_table import BATTERY_BLOCK_FIELDS
+from .const import GridState, GridStatus, MeterType, OperationMode
+from .history import DEFAULT_HISTORY_METERS, METER_HISTORY_FIELDS
+from .snapshot import TelemetrySnapshot
+
+try:
+    import pyarrow as pa  # type: ignore[import-untyped]
+    import pyarrow.parquet as pq  # type: ignore[import-untyped]
+except ImportError:
+    pa = None
+    pq = None
+
+DEFAULT_CHUNK_SIZE = 10000
+
+_Batches = List["pa.RecordBatch"]
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError(
+            "pyarrow is required for exporting telemetry, "
+            "install it with `pip install tesla_powerwall[arrow]`"
+        )
+
+
+def _enum_type() -> "pa.DataType":
+    return pa.dictionary(pa.int8(), pa.string())
+
+
+def _enum_codes(enum: Type[Enum]) -> Dict[Enum, int]:
+    return {member: code for code, member in enumerate(enum)}
+
+
+def _batches(batch: Optional["pa.RecordBatch"]) -> _Batches:
+    return [] if batch is None else [batch]
+
+
+class _BatchBuilder:
+    # Buffers rows per column and converts them into record batches
+
+    def __init__(
+        self,
+        schema: "pa.Schema",
+        enums: Dict[str, Type[Enum]],
+        chunk_size: int,
+    ) -> None:
+        self.schema = schema
+        self.chunk_size = chunk_size
+        self._columns: List[List[Any]] = [[] for _ in schema.names]
+        self._dictionaries = {
+            name: pa.array([member.value for member in enum], pa.string())
+            for name, enum in enums.items()
+        }
+        self._rows = 0
+
+    def append(self, row: Iterable[Any]) -> Optional["pa.RecordBatch"]:
+        for column, value in zip(self._columns, row):
+            column.append(value)
+        self._rows += 1
+        if self._rows >= self.chunk_size:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional["pa.RecordBatch"]:
+        if not self._rows:
+            return None
+        arrays = []
+        for field, column in zip(self.schema, self._columns):
+            dictionary = self._dictionaries.get(field.name)
+            if dictionary is None:
+                arrays.append(pa.array(column, field.type))
+            else:
+                arrays.append(
+                    pa.DictionaryArray.from_arrays(
+                        pa.array(column, pa.int8()), dictionary
+                    )
+                )
+            column.clear()
+        self._rows = 0
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+class TelemetryBatches:
+    """
+    Converts TelemetrySnapshots into Arrow record batches of up to chunk_size
+    rows. The fields of meters are stored in columns named
+    "<meter>_<field>", e.g. "site_instant_power"; missing meters are null.
+    With batteries=False, no battery rows are buffered and no battery record
+    batches are returned.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        meters: Iterable[MeterType] = DEFAULT_HISTORY_METERS,
+        batteries: bool = True,
+    ) -> None:
+        _require_pyarrow()
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+
+        self._meters = tuple(meters)
+        self._with_batteries = batteries
+        timestamp = pa.timestamp("us", tz="UTC")
+        self.snapshot_schema = pa.schema(
+            [
+                pa.field("timestamp", timestamp, nullable=False),
+                pa.field("soe", pa.float64()),
+                pa.field("grid_status", _enum_type()),
+                pa.field("operation_mode", _enum_type()),
+            ]
+            + [
+                pa.field("{}_{}".format(meter.value, field), pa.float64())
+                for meter in self._meters
+                for field in METER_HISTORY_FIELDS
+            ]
+        )
+        self.battery_schema = pa.schema(
+            [
+                pa.field("timestamp", timestamp, nullable=False),
+                pa.field("serial_number", pa.string()),
+                pa.field("part_number", pa.string()),
+                pa.field("grid_state", _enum_type()),
+                pa.field("wobble_detected", pa.bool_()),
+            ]
+            + [pa.field(field, pa.float64()) for field in BATTERY_BLOCK_FIELDS]
+        )
+
+        self._snapshots = _BatchBuilder(
+            self.snapshot_schema,
+            {"grid_status": GridStatus, "operation_mode": OperationMode},
+            chunk_size,
+        )
+        self._batteries = _BatchBuilder(
+            self.battery_schema, {"grid_state": GridState}, chunk_size
+        )
+        self._grid_status_codes = _enum_codes(GridStatus)
+        self._operation_mode_codes = _enum_codes(OperationMode)
+        self._grid_state_codes = _enum_codes(GridState)
+
+    def add(self, snapshot: TelemetrySnapshot) -> Tuple[_Batches, _Batches]:
+        """
+        Adds a snapshot and returns the completed snapshot and battery record
+        batches, which are empty while less than chunk_size rows are buffered
+        """
+        # Microseconds since the epoch
+        timestamp = round(snapshot.timestamp * 1000000)
+        # Snapshots might not have an operation mode
+        operation_mode = snapshot.operation_mode
+        row: List[Any] = [
+            timestamp,
+            snapshot.soe,
+            self._grid_status_codes[snapshot.grid_status],
+            None
+            if operation_mode is None
+            else self._operation_mode_codes[operation_mode],
+        ]
+        meters = snapshot.meters.meters
+        for meter in self._meters:
+            response = meters.get(meter)
+            if response is None:
+                row.extend([None] * len(METER_HISTORY_FIELDS))
+            else:
+                row.extend(getattr(response, field) for field in METER_HISTORY_FIELDS)
+        snapshot_batches = _batches(self._snapshots.append(row))
+
+        battery_batches: _Batches = []
+        if not self._with_batteries:
+            return snapshot_batches, battery_batches
+        for battery in snapshot.batteries:
+            row = [
+                timestamp,
+                battery.serial_number,
+                battery.part_number,
+                self._grid_state_codes.get(battery.grid_state),
+                battery.wobble_detected,
+            ]
+            row.extend(getattr(battery, field) for field in BATTERY_BLOCK_FIELDS)
+            battery_batches.extend(_batches(self._batteries.append(row)))
+        return snapshot_batches, battery_batches
+
+    def flush(self) -> Tuple[_Batches, _Batches]:
+        """Returns the record batches of all buffered rows"""
+        return _batches(self._snapshots.flush()), _batches(self._batteries.flush())
+
+
+class ParquetExporter:
+    """
+    Streams TelemetrySnapshots into a Parquet file of snapshots and, if
+    battery_path is given, a Parquet file of battery packs.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        battery_path: Optional[str] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        meters: Iterable[MeterType] = DEFAULT_HISTORY_METERS,
+        compression: str = "zstd",
+    ) -> None:
+        # Battery rows are only buffered if they are written
+        self._batches = TelemetryBatches(
+            chunk_size, meters, batteries=battery_path is not None
+        )
+        self._writer = pq.ParquetWriter(
+            path, self._batches.snapshot_schema, compression=compression
+        )
+        self._battery_writer = (
+            pq.ParquetWriter(
+                battery_path, self._batches.battery_schema, compression=compression
+            )
+            if battery_path is not None
+            else None
+        )
+
+    def _write(self, batches: Tuple[_Batches, _Batches]) -> None:
+        snapshot_batches, battery_batches = batches
+        for batch in snapshot_batches:
+            self._writer.write_batch(batch)
+        if self._battery_writer is not None:
+            for batch in battery_batches:
+                self._battery_writer.write_batch(batch)
+
+    def write(self, snapshot: TelemetrySnapshot) -> None:
+        self._write(self._batches.add(snapshot))
+
+    def close(self) -> None:
+        """Writes all buffered rows and closes the files"""
+        self._write(self._batches.flush())
+        self._writer.close()
+        if self._battery_writer is not None:
+            self._battery_writer.close()
+
+    def __enter__(self) -> "ParquetExporter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def export_parquet(
+    snapshots: Iterable[TelemetrySnapshot],
+    path: str,
+    battery_path: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> None:
+    """Writes snapshots, which may be a lazily evaluated iterator, to Parquet"""
+    with ParquetExporter(path, battery_path, chunk_size) as exporter:
+        for snapshot in snapshots:
+            exporter.write(snapshot)
@@ -0,0 +1,312 @@
+import math
+import statistics
+import time
+from array import array
+from dataclasses import dataclass
+from itertools import compress
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from .const import GridState
+from .responses import BatteryResponse, SystemStatusResponse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+# Numeric fields of BatteryResponse which are stored as columns
+BATTERY_BLOCK_FIELDS = (
+    "energy_remaining",
+    "capacity",
+    "energy_charged",
+    "energy_discharged",
+    "p_out",
+    "q_out",
+    "v_out",
+    "f_out",
+    "i_out",
+)
+
+_GRID_STATES = tuple(GridState)
+_GRID_STATE_CODES = {state: code for code, state in enumerate(_GRID_STATES)}
+
+# Scale factors of the median and mean absolute deviation which make them
+# estimates of the standard deviation of normally distributed values
+_MAD_SCALE = 1.4826
+_MEAN_AD_SCALE = 1.2533
+
+
+@dataclass
+class BlockStatistics:
+    count: int
+    mean: float
+    minimum: float
+    maximum: float
+    stdev: float
+
+    @property
+    def spread(self) -> float:
+        return self.maximum - self.minimum
+
+
+class BatteryBlockTable:
+    """
+    Columnar table of battery packs (`BatteryResponse`).
+
+    Every numeric field is stored in an `array` of doubles with a separate
+    mask marking which rows hold a value; fields of packs in
+    GridState.DISABLED are usually missing and stored as NaN with the mask
+    unset. Rows are appended per snapshot, so the table can hold the history
+    of every pack. All rows of a snapshot share the same timestamp.
+
+    If numpy is installed (`pip install tesla_powerwall[numpy]`), the values,
+    statistics, state of charge and outliers are computed on copies of the
+    columns as numpy arrays.
+    """
+
+    def __init__(self) -> None:
+        self.timestamps = array("d")
+        self.serial_numbers: List[str] = []
+        self.part_numbers: List[str] = []
+        self.wobble_detected = bytearray()
+        self._grid_states = array("b")
+        self._columns: Dict[str, array] = {
+            field: array("d") for field in BATTERY_BLOCK_FIELDS
+        }
+        self._masks: Dict[str, bytearray] = {
+            field: bytearray() for field in BATTERY_BLOCK_FIELDS
+        }
+        self._rows_by_serial: Dict[str, List[int]] = {}
+
+    @staticmethod
+    def from_batteries(
+        batteries: Iterable[BatteryResponse], timestamp: Optional[float] = None
+    ) -> "BatteryBlockTable":
+        table = BatteryBlockTable()
+        table.append(batteries, timestamp)
+        return table
+
+    @staticmethod
+    def from_system_status(
+        system_status: SystemStatusResponse, timestamp: Optional[float] = None
+    ) -> "BatteryBlockTable":
+        return BatteryBlockTable.from_batteries(system_status.batteries, timestamp)
+
+    def __len__(self) -> int:
+        return len(self.serial_numbers)
+
+    def append(
+        self, batteries: Iterable[BatteryResponse], timestamp: Optional[float] = None
+    ) -> None:
+        """Appends one row per battery pack; timestamp defaults to now"""
+        if timestamp is None:
+            timestamp = time.time()
+        for battery in batteries:
+            row = len(self.serial_numbers)
+            self.timestamps.append(timestamp)
+            self.serial_numbers.append(battery.serial_number)
+            self.part_numbers.append(battery.part_number)
+            self.wobble_detected.append(bool(battery.wobble_detected))
+            self._grid_states.append(_GRID_STATE_CODES[battery.grid_state])
+            for field in BATTERY_BLOCK_FIELDS:
+                value = getattr(battery, field)
+                if value is None:
+                    self._columns[field].append(math.nan)
+                    self._masks[field].append(0)
+                else:
+                    self._columns[field].append(value)
+                    self._masks[field].append(1)
+            self._rows_by_serial.setdefault(battery.serial_number, []).append(row)
+
+    def column(self, field: str) -> array:
+        """Returns the values of field, NaN where the mask is unset"""
+        try:
+            return self._columns[field]
+        except KeyError:
+            raise KeyError("Field {} is not stored".format(field)) from None
+
+    def mask(self, field: str) -> bytearray:
+        """Returns 1 for every row in which field has a value and 0 otherwise"""
+        try:
+            return self._masks[field]
+        except KeyError:
+            raise KeyError("Field {} is not stored".format(field)) from None
+
+    def grid_state(self, row: int) -> GridState:
+        return _GRID_STATES[self._grid_states[row]]
+
+    def disabled(self) -> bytearray:
+        """Returns 1 for every row of a pack in GridState.DISABLED"""
+        code = _GRID_STATE_CODES[GridState.DISABLED]
+        return bytearray(state == code for state in self._grid_states)
+
+    def rows(self, serial_number: str) -> List[int]:
+        """Returns the rows of a battery pack from oldest to newest"""
+        return list(self._rows_by_serial.get(serial_number, []))
+
+    def latest_rows(self) -> List[int]:
+        """Returns the rows of the newest snapshot"""
+        if not self.timestamps:
+            return []
+        newest = self.timestamps[-1]
+        row = len(self.timestamps)
+        while row > 0 and self.timestamps[row - 1] == newest:
+            row -= 1
+        return list(range(row, len(self.timestamps)))
+
+    def values(self, field: str, rows: Optional[Sequence[int]] = None) -> List[float]:
+        """Returns the present values of field, optionally limited to rows"""
+        if np is not None:
+            return self._values_numpy(field, rows).tolist()
+        column = self.column(field)
+        mask = self.mask(field)
+        if rows is None:
+            return list(compress(column, mask))
+        return [column[row] for row in rows if mask[row]]
+
+    def _values_numpy(
+        self, field: str, rows: Optional[Sequence[int]] = None
+    ) -> "np.ndarray":
+        # The columns are copied, so that they can still grow
+        column = np.array(self.column(field), dtype=np.float64)
+        mask = np.array(self.mask(field), dtype=bool)
+        if rows is not None:
+            index = np.asarray(rows, dtype=np.intp)
+            column = column[index]
+            mask = mask[index]
+        return column[mask]
+
+    def statistics(
+        self, field: str, rows: Optional[Sequence[int]] = None
+    ) -> Optional[BlockStatistics]:
+        """Aggregate statistics of field over rows (default: all rows)"""
+        if np is not None:
+            array_values = self._values_numpy(field, rows)
+            if not len(array_values):
+                return None
+            return BlockStatistics(
+                count=len(array_values),
+                mean=float(array_values.mean()),
+                minimum=float(array_values.min()),
+                maximum=float(array_values.max()),
+                stdev=float(array_values.std()),
+            )
+
+        values = self.values(field, rows)
+        if not values:
+            return None
+        count = len(values)
+        mean = math.fsum(values) / count
+        variance = math.fsum([(value - mean) ** 2 for value in values]) / count
+        return BlockStatistics(
+            count=count,
+            mean=mean,
+            minimum=min(values),
+            maximum=max(values),
+            stdev=math.sqrt(variance),
+        )
+
+    def state_of_charge(self, rows: Optional[Sequence[int]] = None) -> List[float]:
+        """Returns energy_remaining / capacity in percent for every row"""
+        if np is not None:
+            return self._state_of_charge_numpy(rows).tolist()
+        if rows is None:
+            rows = range(len(self))
+        remaining = self._columns["energy_remaining"]
+        capacity = self._columns["capacity"]
+        remaining_mask = self._masks["energy_remaining"]
+        capacity_mask = self._masks["capacity"]
+        return [
+            remaining[row] / capacity[row] * 100
+            if remaining_mask[row] and capacity_mask[row] and capacity[row]
+            else math.nan
+            for row in rows
+        ]
+
+    def _state_of_charge_numpy(
+        self, rows: Optional[Sequence[int]] = None
+    ) -> "np.ndarray":
+        remaining = np.array(self._columns["energy_remaining"], dtype=np.float64)
+        capacity = np.array(self._columns["capacity"], dtype=np.float64)
+        if rows is not None:
+            index = np.asarray(rows, dtype=np.intp)
+            remaining = remaining[index]
+            capacity = capacity[index]
+        # Missing values are NaN in the columns already
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(capacity != 0, remaining / capacity * 100, np.nan)
+
+    def imbalance(self, rows: Optional[Sequence[int]] = None) -> float:
+        """
+        Spread of the state of charge in percentage points between the enabled
+        packs of rows (default: the newest snapshot)
+        """
+        if rows is None:
+            rows = self.latest_rows()
+        disabled = _GRID_STATE_CODES[GridState.DISABLED]
+        enabled = [row for row in rows if self._grid_states[row] != disabled]
+        charges = [
+            charge for charge in self.state_of_charge(enabled) if not math.isnan(charge)
+        ]
+        if len(charges) < 2:
+            return 0.0
+        return max(charges) - min(charges)
+
+    def outliers(
+        self, field: str, threshold: float = 3.0, rows: Optional[Sequence[int]] = None
+    ) -> List[int]:
+        """
+        Returns the rows in which field deviates more than threshold standard
+        deviations from the median of rows (default: the newest snapshot).
+
+        The standard deviation is estimated from the median absolute deviation
+        (or the mean absolute deviation, if more than half of the values are
+        equal), so that a single outlier can be found among a few packs.
+        """
+        if rows is None:
+            rows = self.latest_rows()
+        if np is not None:
+            return self._outliers_numpy(field, threshold, rows)
+        values = self.values(field, rows)
+        if not values:
+            return []
+        median = statistics.median(values)
+        deviations = [abs(value - median) for value in values]
+        scale = _MAD_SCALE * statistics.median(deviations)
+        if scale == 0:
+            scale = _MEAN_AD_SCALE * math.fsum(deviations) / len(deviations)
+        if scale == 0:
+            return []
+        column = self.column(field)
+        mask = self.mask(field)
+        return [
+            row
+            for row in rows
+            if mask[row] and abs(column[row] - median) > threshold * scale
+        ]
+
+    def _outliers_numpy(
+        self, field: str, threshold: float, rows: Sequence[int]
+    ) -> List[int]:
+        index = np.asarray(rows, dtype=np.intp)
+        column = np.array(self.column(field), dtype=np.float64)[index]
+        present = np.array(self.mask(field), dtype=bool)[index]
+        values = column[present]
+        if not len(values):
+            return []
+        median = np.median(values)
+        deviations = np.abs(values - median)
+        scale = _MAD_SCALE * np.median(deviations)
+        if scale == 0:
+            scale = _MEAN_AD_SCALE * deviations.mean()
+        if scale == 0:
+            return []
+        outlier = present & (np.abs(column - median) > threshold * scale)
+        return index[outlier].tolist()
+
+    def wobble_counts(self) -> Dict[str, int]:
+        """Returns the number of rows with wobble_detected per serial number"""
+        return {
+            serial_number: sum(self.wobble_detected[row] for row in rows)
+            for serial_number, rows in self._rows_by_serial.items()
+        }
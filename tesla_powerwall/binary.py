@@ -0,0 +1,265 @@
+"""
+Compact fixed-layout binary encoding of TelemetrySnapshots.
+
+The encoding is meant for passing snapshots between processes on the same
+machine. A whole snapshot is packed and unpacked with a single precompiled
+`struct.Struct`, which is much cheaper than pickling the responses. Layout
+(little endian, no padding):
+
+    header:  magic "PWSB", version (u8), meter count (u8), battery count (u16),
+             timestamp (f64), soe (f64), grid status (i8), operation mode (i8)
+    meter:   meter type (u8), last_communication_time (40 bytes), instant_power,
+             frequency, energy_exported, energy_imported, instant_total_current,
+             instant_average_voltage (f64 each)
+    battery: part_number (32 bytes), serial_number (32 bytes),
+             wobble_detected (bool), grid state (i8), mask of present values
+             (u16), energy_remaining ... i_out (f64 each, NaN if missing)
+    tail:    per battery: number of disabled reasons (u8), each reason as
+             length (u8) and utf-8 bytes
+
+Enums are stored as their index in the enum (-1 for None), strings as
+null-padded utf-8. Numbers are stored as doubles and therefore unpacked as
+floats. Responses are unpacked without their raw response.
+"""
+
+import math
+import struct
+from typing import Dict, List, Tuple
+
+from .const import GridState, GridStatus, MeterType, OperationMode
+from .error import SnapshotDecodeError
+from .responses import BatteryResponse, MeterResponse, MetersAggregatesResponse
+from .snapshot import TelemetrySnapshot
+
+MAGIC = b"PWSB"
+VERSION = 1
+
+_HEADER = "4sBBHddbb"
+_METER = "B40s6d"
+_BATTERY = "32s32s?bH9d"
+
+_HEADER_STRUCT = struct.Struct("<" + _HEADER)
+HEADER_SIZE = _HEADER_STRUCT.size
+
+_METER_FIELDS = (
+    "instant_power",
+    "frequency",
+    "energy_exported",
+    "energy_imported",
+    "instant_total_current",
+    "instant_average_voltage",
+)
+_BATTERY_FIELDS = (
+    "energy_remaining",
+    "capacity",
+    "energy_charged",
+    "energy_discharged",
+    "p_out",
+    "q_out",
+    "v_out",
+    "f_out",
+    "i_out",
+)
+
+_METER_TYPES = tuple(MeterType)
+_GRID_STATUSES = tuple(GridStatus)
+_OPERATION_MODES = tuple(OperationMode)
+_GRID_STATES = tuple(GridState)
+_METER_CODES = {meter: code for code, meter in enumerate(_METER_TYPES)}
+_GRID_STATUS_CODES = {status: code for code, status in enumerate(_GRID_STATUSES)}
+_OPERATION_MODE_CODES = {mode: code for code, mode in enumerate(_OPERATION_MODES)}
+_GRID_STATE_CODES = {state: code for code, state in enumerate(_GRID_STATES)}
+
+_STRUCTS: Dict[Tuple[int, int], struct.Struct] = {}
+
+
+def _layout(meter_count: int, battery_count: int) -> struct.Struct:
+    layout = _STRUCTS.get((meter_count, battery_count))
+    if layout is None:
+        layout = _STRUCTS[(meter_count, battery_count)] = struct.Struct(
+            "<" + _HEADER + _METER * meter_count + _BATTERY * battery_count
+        )
+    return layout
+
+
+def _encode_string(value: str, size: int, name: str) -> bytes:
+    encoded = value.encode()
+    if len(encoded) > size:
+        raise ValueError("{} is longer than {} bytes".format(name, size))
+    return encoded
+
+
+def _decode_string(value: bytes) -> str:
+    return value.rstrip(b"\0").decode()
+
+
+def _tail(snapshot: TelemetrySnapshot) -> bytes:
+    tail = bytearray()
+    for battery in snapshot.batteries:
+        reasons = battery.disabled_reasons or []
+        tail.append(len(reasons))
+        for reason in reasons:
+            encoded = _encode_string(reason, 255, "disabled reason")
+            tail.append(len(encoded))
+            tail += encoded
+    return bytes(tail)
+
+
+def _values(snapshot: TelemetrySnapshot) -> List:
+    meters = snapshot.meters.meters
+    values = [
+        MAGIC,
+        VERSION,
+        len(meters),
+        len(snapshot.batteries),
+        snapshot.timestamp,
+        snapshot.soe,
+        _GRID_STATUS_CODES[snapshot.grid_status],
+        -1
+        if snapshot.operation_mode is None
+        else _OPERATION_MODE_CODES[snapshot.operation_mode],
+    ]
+    for meter, response in meters.items():
+        values.append(_METER_CODES[meter])
+        values.append(
+            _encode_string(
+                response.last_communication_time, 40, "last_communication_time"
+            )
+        )
+        values.extend([getattr(response, field) for field in _METER_FIELDS])
+    for battery in snapshot.batteries:
+        values.append(_encode_string(battery.part_number, 32, "part_number"))
+        values.append(_encode_string(battery.serial_number, 32, "serial_number"))
+        values.append(bool(battery.wobble_detected))
+        values.append(_GRID_STATE_CODES[battery.grid_state])
+        mask = 0
+        numbers = []
+        for bit, field in enumerate(_BATTERY_FIELDS):
+            value = getattr(battery, field)
+            if value is None:
+                numbers.append(math.nan)
+            else:
+                mask |= 1 << bit
+                numbers.append(value)
+        values.append(mask)
+        values.extend(numbers)
+    return values
+
+
+def packed_size(snapshot: TelemetrySnapshot) -> int:
+    layout = _layout(len(snapshot.meters.meters), len(snapshot.batteries))
+    return layout.size + len(_tail(snapshot))
+
+
+def pack_snapshot(snapshot: TelemetrySnapshot) -> bytes:
+    layout = _layout(len(snapshot.meters.meters), len(snapshot.batteries))
+    return layout.pack(*_values(snapshot)) + _tail(snapshot)
+
+
+def pack_snapshot_into(
+    snapshot: TelemetrySnapshot, buffer: memoryview, offset: int = 0
+) -> int:
+    """Packs snapshot into a writable buffer and returns the number of bytes"""
+    layout = _layout(len(snapshot.meters.meters), len(snapshot.batteries))
+    tail = _tail(snapshot)
+    size = layout.size + len(tail)
+    if offset + size > len(buffer):
+        raise ValueError(
+            "Snapshot needs {} bytes, but the buffer only has {}".format(
+                size, len(buffer) - offset
+            )
+        )
+    layout.pack_into(buffer, offset, *_values(snapshot))
+    buffer[offset + layout.size : offset + size] = tail
+    return size
+
+
+def unpack_snapshot(buffer: bytes, offset: int = 0) -> TelemetrySnapshot:
+    try:
+        header = _HEADER_STRUCT.unpack_from(buffer, offset)
+    except struct.error:
+        raise SnapshotDecodeError("truncated header") from None
+    magic, version, meter_count, battery_count = header[:4]
+    if magic != MAGIC:
+        raise SnapshotDecodeError("not a binary snapshot")
+    if version != VERSION:
+        raise SnapshotDecodeError("unsupported version {}".format(version))
+
+    layout = _layout(meter_count, battery_count)
+    try:
+        values = layout.unpack_from(buffer, offset)
+        return _build(values, meter_count, battery_count, buffer, offset + layout.size)
+    except (struct.error, IndexError, UnicodeDecodeError) as error:
+        raise SnapshotDecodeError(
+            "corrupted snapshot ({})".format(type(error).__name__)
+        ) from error
+
+
+def _build(
+    values: Tuple,
+    meter_count: int,
+    battery_count: int,
+    buffer: bytes,
+    tail: int,
+) -> TelemetrySnapshot:
+    # Skip the values of the header
+    index = 8
+    meters = {}
+    for _ in range(meter_count):
+        meter = _METER_TYPES[values[index]]
+        meters[meter] = MeterResponse(
+            _raw=None,
+            meter=meter,
+            instant_power=values[index + 2],
+            last_communication_time=_decode_string(values[index + 1]),
+            frequency=values[index + 3],
+            energy_exported=values[index + 4],
+            energy_imported=values[index + 5],
+            instant_total_current=values[index + 6],
+            instant_average_voltage=values[index + 7],
+        )
+        index += 8
+
+    batteries = []
+    for _ in range(battery_count):
+        mask = values[index + 4]
+        numbers = [
+            value if mask & (1 << bit) else None
+            for bit, value in enumerate(values[index + 5 : index + 14])
+        ]
+        reason_count = buffer[tail]
+        tail += 1
+        reasons = []
+        for _ in range(reason_count):
+            length = buffer[tail]
+            reasons.append(bytes(buffer[tail + 1 : tail + 1 + length]).decode())
+            tail += 1 + length
+        batteries.append(
+            BatteryResponse(
+                _raw=None,
+                part_number=_decode_string(values[index]),
+                serial_number=_decode_string(values[index + 1]),
+                wobble_detected=values[index + 2],
+                energy_remaining=numbers[0],
+                capacity=numbers[1],
+                energy_charged=numbers[2],
+                energy_discharged=numbers[3],
+                p_out=numbers[4],
+                q_out=numbers[5],
+                v_out=numbers[6],
+                f_out=numbers[7],
+                i_out=numbers[8],
+                grid_state=_GRID_STATES[values[index + 3]],
+                disabled_reasons=reasons,
+            )
+        )
+        index += 14
+
+    return TelemetrySnapshot(
+        timestamp=values[4],
+        meters=MetersAggregatesResponse(None, meters),
+        soe=values[5],
+        grid_status=_GRID_STATUSES[values[6]],
+        batteries=batteries,
+        operation_mode=None if values[7] < 0 else _OPERATION_MODES[values[7]],
+    )
@@ -0,0 +1,223 @@
+"""
+Shared-memory board with the latest TelemetrySnapshot of a gateway.
+
+One process (the poller) publishes snapshots with `SnapshotBoard.publish`,
+any number of local processes attach to the board by its name and read the
+latest snapshot without locks and without talking to the gateway.
+
+Consistency is guaranteed by a sequence lock: the writer increments the
+sequence number before and after every update, so it is odd while an update
+is in progress. A reader copies the data between two reads of the sequence
+number and retries if the sequence number was odd or changed in between.
+There must only be a single writer per board.
+
+Memory layout (little endian):
+
+    0   magic "PWBD", version (u8), 3 bytes padding
+    8   sequence number (u64)
+    16  summary: timestamp, soe, instant_power of site, solar, battery and
+        load (f64 each, NaN if missing), grid status (i8), 3 bytes padding,
+        size of the snapshot (u32)
+    72  snapshot in the encoding of `tesla_powerwall.binary`
+
+The summary can be read much faster than the whole snapshot, which makes it
+suitable for readers polling at high rates.
+"""
+
+import math
+import os
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import NamedTuple, Optional
+
+from .binary import pack_snapshot, unpack_snapshot
+from .const import GridStatus, MeterType
+from .error import PowerwallError
+from .snapshot import TelemetrySnapshot
+
+MAGIC = b"PWBD"
+VERSION = 1
+
+DEFAULT_BOARD_SIZE = 64 * 1024
+DEFAULT_READ_RETRIES = 10000
+# Failed reads are retried immediately this many times before yielding the
+# CPU, which lets a preempted writer finish its update on a busy machine
+_SPINS = 100
+
+_HEADER = struct.Struct("<4sB3x")
+_SEQUENCE = struct.Struct("<Q")
+_SUMMARY = struct.Struct("<6db3xI")
+_SEQUENCE_OFFSET = 8
+_SUMMARY_OFFSET = 16
+_DATA_OFFSET = _SUMMARY_OFFSET + _SUMMARY.size
+# Sequence number and summary are read with a single unpack
+_SEQUENCE_AND_SUMMARY = struct.Struct("<Q6db3xI")
+_unpack_sequence = _SEQUENCE.unpack_from
+_unpack_summary = _SEQUENCE_AND_SUMMARY.unpack_from
+_new_tuple = tuple.__new__
+
+_SUMMARY_METERS = (MeterType.SITE, MeterType.SOLAR, MeterType.BATTERY, MeterType.LOAD)
+_GRID_STATUSES = tuple(GridStatus)
+_GRID_STATUS_CODES = {status: code for code, status in enumerate(_GRID_STATUSES)}
+
+
+class BoardSummary(NamedTuple):
+    sequence: int
+    timestamp: float
+    soe: float
+    # instant_power of the meters, NaN if the meter is missing
+    site_power: float
+    solar_power: float
+    battery_power: float
+    load_power: float
+    grid_status: GridStatus
+
+
+def _tracked_name(memory: shared_memory.SharedMemory) -> str:
+    # The resource tracker knows POSIX segments by their name with the
+    # leading slash, which SharedMemory.name omits
+    return "/" + memory.name if os.name == "posix" else memory.name
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before Python 3.13 every process which attaches registers the segment
+    # with its resource tracker, which would remove it as soon as the first
+    # reader exits
+    memory = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(_tracked_name(memory), "shared_memory")
+    return memory
+
+
+class SnapshotBoard:
+    """
+    Latest-value board in shared memory. Create it in the publishing process
+    with `SnapshotBoard.create()` and attach readers with
+    `SnapshotBoard.attach(board.name)`.
+    """
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner: bool) -> None:
+        self._memory = memory
+        self._buffer = memory.buf
+        self._owner = owner
+
+    @staticmethod
+    def create(
+        name: Optional[str] = None, size: int = DEFAULT_BOARD_SIZE
+    ) -> "SnapshotBoard":
+        if size <= _DATA_OFFSET:
+            raise ValueError("size must be larger than {}".format(_DATA_OFFSET))
+        memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        memory.buf[:_DATA_OFFSET] = bytes(_DATA_OFFSET)
+        _HEADER.pack_into(memory.buf, 0, MAGIC, VERSION)
+        return SnapshotBoard(memory, owner=True)
+
+    @staticmethod
+    def attach(name: str) -> "SnapshotBoard":
+        memory = _attach(name)
+        magic, version = _HEADER.unpack_from(memory.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            memory.close()
+            raise PowerwallError(
+                "Shared memory {} is not a snapshot board of version {}".format(
+                    name, VERSION
+                )
+            )
+        return SnapshotBoard(memory, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    @property
+    def sequence(self) -> int:
+        """Even number of the last update, incremented by 2 per update"""
+        return _SEQUENCE.unpack_from(self._buffer, _SEQUENCE_OFFSET)[0]
+
+    def publish(self, snapshot: TelemetrySnapshot) -> None:
+        data = pack_snapshot(snapshot)
+        if _DATA_OFFSET + len(data) > len(self._buffer):
+            raise ValueError(
+                "Snapshot of {} bytes does not fit into the board".format(len(data))
+            )
+
+        meters = snapshot.meters.meters
+        power = [
+            meters[meter].instant_power if meter in meters else math.nan
+            for meter in _SUMMARY_METERS
+        ]
+
+        buffer = self._buffer
+        sequence = _SEQUENCE.unpack_from(buffer, _SEQUENCE_OFFSET)[0]
+        _SEQUENCE.pack_into(buffer, _SEQUENCE_OFFSET, sequence + 1)
+        _SUMMARY.pack_into(
+            buffer,
+            _SUMMARY_OFFSET,
+            snapshot.timestamp,
+            snapshot.soe,
+            *power,
+            _GRID_STATUS_CODES[snapshot.grid_status],
+            len(data),
+        )
+        buffer[_DATA_OFFSET : _DATA_OFFSET + len(data)] = data
+        _SEQUENCE.pack_into(buffer, _SEQUENCE_OFFSET, sequence + 2)
+
+    def read_summary(
+        self, retries: int = DEFAULT_READ_RETRIES
+    ) -> Optional[BoardSummary]:
+        """Returns the summary of the latest snapshot or None if none was published"""
+        buffer = self._buffer
+        for attempt in range(retries):
+            values = _unpack_summary(buffer, _SEQUENCE_OFFSET)
+            sequence = values[0]
+            if (
+                not sequence & 1
+                and _unpack_sequence(buffer, _SEQUENCE_OFFSET)[0] == sequence
+            ):
+                if sequence == 0:
+                    return None
+                # Skips the argument handling of BoardSummary.__new__
+                return _new_tuple(
+                    BoardSummary, values[:7] + (_GRID_STATUSES[values[7]],)
+                )
+            if attempt >= _SPINS:
+                time.sleep(0)
+        raise PowerwallError("Unable to read a consistent summary from the board")
+
+    def read_bytes(self, retries: int = DEFAULT_READ_RETRIES) -> Optional[bytes]:
+        """Returns a consistent copy of the latest encoded snapshot"""
+        buffer = self._buffer
+        for attempt in range(retries):
+            sequence = _SEQUENCE.unpack_from(buffer, _SEQUENCE_OFFSET)[0]
+            if not sequence & 1:
+                size = _SEQUENCE_AND_SUMMARY.unpack_from(buffer, _SEQUENCE_OFFSET)[8]
+                data = bytes(buffer[_DATA_OFFSET : _DATA_OFFSET + size])
+                if _SEQUENCE.unpack_from(buffer, _SEQUENCE_OFFSET)[0] == sequence:
+                    return data if sequence else None
+            if attempt >= _SPINS:
+                time.sleep(0)
+        raise PowerwallError("Unable to read a consistent snapshot from the board")
+
+    def read(self, retries: int = DEFAULT_READ_RETRIES) -> Optional[TelemetrySnapshot]:
+        """Returns the latest snapshot or None if none was published"""
+        data = self.read_bytes(retries)
+        return None if data is None else unpack_snapshot(data)
+
+    def close(self) -> None:
+        """Detaches from the board and removes it if this process created it"""
+        self._buffer.release()
+        self._memory.close()
+        if self._owner:
+            # Readers forked from this process share its resource tracker and
+            # might have unregistered the segment when attaching
+            resource_tracker.register(_tracked_name(self._memory), "shared_memory")
+            self._memory.unlink()
+
+    def __enter__(self) -> "SnapshotBoard":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
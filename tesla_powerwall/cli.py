@@ -0,0 +1,355 @@
+"""
+Command-line interface, run with `python -m tesla_powerwall`:
+
+    python -m tesla_powerwall --host <ip> --password <password> snapshot
+    python -m tesla_powerwall watch --interval 1 | jq .soe
+    python -m tesla_powerwall bench --requests 50
+    python -m tesla_powerwall record --interval 5 --output responses.jsonl
+    python -m tesla_powerwall discover 192.168.1.0/24 192.168.91.1
+
+The host and password default to the environment variables POWERWALL_IP and
+POWERWALL_PASSWORD. Every invocation uses a single session and logs in at
+most once. Results are written as JSON lines (one document per line, flushed
+after every line), so the output can be piped into other tools.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from dataclasses import asdict, fields
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import orjson
+
+from .error import PowerwallError
+from .snapshot import TelemetrySnapshot
+
+if TYPE_CHECKING:
+    from .powerwall import Powerwall
+
+ENV_HOST = "POWERWALL_IP"
+ENV_PASSWORD = "POWERWALL_PASSWORD"
+
+# The endpoints requested by Powerwall.get_snapshot
+TELEMETRY_ENDPOINTS = (
+    "meters/aggregates",
+    "system_status/soe",
+    "system_status/grid_status",
+    "system_status",
+    "operation",
+)
+BENCH_ENDPOINTS = TELEMETRY_ENDPOINTS + ("status", "sitemaster", "site_info")
+
+# orjson serializes enums by their value and datetimes as ISO 8601
+_JSON_OPTIONS = orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS
+
+_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+
+def _response_dict(response: Any) -> Dict[str, Any]:
+    names = _FIELDS.get(type(response))
+    if names is None:
+        names = _FIELDS[type(response)] = tuple(
+            f.name for f in fields(response) if f.name != "_raw"
+        )
+    return {name: getattr(response, name) for name in names}
+
+
+def snapshot_to_dict(snapshot: TelemetrySnapshot) -> Dict[str, Any]:
+    """Converts a snapshot into a dict which can be serialized by orjson"""
+    return {
+        "timestamp": snapshot.timestamp,
+        "soe": snapshot.soe,
+        "grid_status": snapshot.grid_status,
+        "operation_mode": snapshot.operation_mode,
+        "meters": {
+            meter.value: _response_dict(response)
+            for meter, response in snapshot.meters.meters.items()
+        },
+        "batteries": [_response_dict(battery) for battery in snapshot.batteries],
+    }
+
+
+class _Output:
+    def __init__(self, file: IO[bytes], indent: bool = False) -> None:
+        self._file = file
+        self._options = _JSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+
+    def write(self, value: Any) -> None:
+        self._file.write(orjson.dumps(value, option=self._options))
+        self._file.flush()
+
+
+def _error(message: Any) -> None:
+    print("error: {}".format(message), file=sys.stderr)
+
+
+async def _ticks(interval: float, count: Optional[int]) -> AsyncIterator[int]:
+    """
+    Yields at a fixed rate. If an iteration takes longer than interval, the
+    next one starts immediately instead of catching up with a burst.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time()
+    tick = 0
+    while True:
+        yield tick
+        tick += 1
+        if count is not None and tick >= count:
+            return
+        deadline += interval
+        delay = deadline - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            deadline = loop.time()
+
+
+async def _snapshot(powerwall: "Powerwall", args: argparse.Namespace, output: _Output):
+    output.write(snapshot_to_dict(await powerwall.get_snapshot()))
+
+
+async def _watch(powerwall: "Powerwall", args: argparse.Namespace, output: _Output):
+    async for _ in _ticks(args.interval, args.count):
+        try:
+            snapshot = await powerwall.get_snapshot()
+        except PowerwallError as error:
+            _error(error)
+            continue
+        output.write(snapshot_to_dict(snapshot))
+
+
+async def _record(powerwall: "Powerwall", args: argparse.Namespace, output: _Output):
+    api = powerwall.get_api()
+    endpoints = args.endpoint or TELEMETRY_ENDPOINTS
+    async for _ in _ticks(args.interval, args.count):
+        timestamp = time.time()
+        responses = await asyncio.gather(
+            *[api.get(endpoint) for endpoint in endpoints], return_exceptions=True
+        )
+        for endpoint, response in zip(endpoints, responses):
+            if isinstance(response, PowerwallError):
+                output.write(
+                    {
+                        "timestamp": timestamp,
+                        "endpoint": endpoint,
+                        "error": str(response),
+                    }
+                )
+            elif isinstance(response, BaseException):
+                raise response
+            else:
+                output.write(
+                    {"timestamp": timestamp, "endpoint": endpoint, "response": response}
+                )
+
+
+def _latency_statistics(latencies: List[float]) -> Dict[str, Optional[float]]:
+    if not latencies:
+        return {"min_ms": None, "median_ms": None, "p95_ms": None, "max_ms": None}
+    latencies = sorted(latency * 1000 for latency in latencies)
+    return {
+        "min_ms": latencies[0],
+        "median_ms": statistics.median(latencies),
+        # Nearest rank
+        "p95_ms": latencies[max(0, -(-len(latencies) * 95 // 100) - 1)],
+        "max_ms": latencies[-1],
+    }
+
+
+async def _bench(powerwall: "Powerwall", args: argparse.Namespace, output: _Output):
+    api = powerwall.get_api()
+    for endpoint in args.endpoint or BENCH_ENDPOINTS:
+        latencies = []
+        errors = 0
+        for request in range(args.warmup + args.requests):
+            start = time.perf_counter()
+            try:
+                await api.get(endpoint)
+            except PowerwallError:
+                # Failed warmup requests are not counted either
+                if request >= args.warmup:
+                    errors += 1
+                continue
+            if request >= args.warmup:
+                latencies.append(time.perf_counter() - start)
+        output.write(
+            {
+                "endpoint": endpoint,
+                "requests": args.requests,
+                "errors": errors,
+                **_latency_statistics(latencies),
+            }
+        )
+
+
+async def _discover(args: argparse.Namespace, output: _Output):
+    from .discovery import discover
+
+    async for gateway in discover(
+        args.targets,
+        concurrency=args.concurrency,
+        timeout=args.host_timeout,
+        verify_ssl=args.verify_ssl,
+    ):
+        output.write(asdict(gateway))
+
+
+def _positive(type_: type):
+    def parse(value: str):
+        parsed = type_(value)
+        if parsed <= 0:
+            raise argparse.ArgumentTypeError("must be positive")
+        return parsed
+
+    return parse
+
+
+def _target(value: str) -> str:
+    from .discovery import expand
+
+    try:
+        # Validates the target without expanding its addresses
+        expand([value])
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+    return value
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m tesla_powerwall",
+        description="Query a Tesla Powerwall gateway on the local network.",
+    )
+    parser.add_argument(
+        "--host",
+        default=os.environ.get(ENV_HOST),
+        help="IP or hostname of the gateway (default: ${})".format(ENV_HOST),
+    )
+    parser.add_argument(
+        "--password",
+        default=os.environ.get(ENV_PASSWORD),
+        help="password of the customer user (default: ${}); "
+        "no login is performed without a password".format(ENV_PASSWORD),
+    )
+    parser.add_argument("--email", default="")
+    parser.add_argument("--timeout", type=_positive(float), default=10.0)
+    parser.add_argument("--verify-ssl", action="store_true")
+    parser.add_argument(
+        "--output",
+        type=argparse.FileType("ab"),
+        default=sys.stdout.buffer,
+        help="file to append the output to (default: stdout)",
+    )
+    parser.set_defaults(indent=False)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = commands.add_parser(
+        "snapshot", help="print a snapshot of meters, SOE, grid status and batteries"
+    )
+    snapshot.add_argument("--indent", action="store_true")
+    snapshot.set_defaults(run=_snapshot)
+
+    watch = commands.add_parser("watch", help="print a snapshot every interval")
+    record = commands.add_parser(
+        "record", help="print the raw responses of endpoints every interval"
+    )
+    for command in (watch, record):
+        command.add_argument("--interval", type=_positive(float), default=1.0)
+        command.add_argument(
+            "--count", type=_positive(int), help="stop after count polls"
+        )
+    watch.set_defaults(run=_watch)
+    record.add_argument(
+        "--endpoint",
+        action="append",
+        help="endpoint to record, may be repeated (default: the telemetry endpoints)",
+    )
+    record.set_defaults(run=_record)
+
+    bench = commands.add_parser("bench", help="measure the latency per endpoint")
+    bench.add_argument("--requests", type=_positive(int), default=20)
+    bench.add_argument(
+        "--warmup",
+        type=int,
+        default=1,
+        help="requests per endpoint which are not measured",
+    )
+    bench.add_argument(
+        "--endpoint",
+        action="append",
+        help="endpoint to measure, may be repeated",
+    )
+    bench.set_defaults(run=_bench)
+
+    discover = commands.add_parser(
+        "discover",
+        help="find gateways by their status and print each as soon as it answers",
+    )
+    discover.add_argument(
+        "targets",
+        nargs="+",
+        type=_target,
+        metavar="target",
+        help="network (192.168.1.0/24), range (192.168.1.10-20) or address",
+    )
+    discover.add_argument("--concurrency", type=_positive(int), default=64)
+    discover.add_argument(
+        "--host-timeout",
+        type=_positive(float),
+        default=1.0,
+        help="seconds to wait for each host (default: 1)",
+    )
+    discover.set_defaults(run=_discover)
+
+    args = parser.parse_args(argv)
+    if args.host is None and args.command != "discover":
+        parser.error("--host or ${} is required".format(ENV_HOST))
+    return args
+
+
+async def run(args: argparse.Namespace) -> None:
+    # Imported here so that parsing the arguments does not load aiohttp
+    from .powerwall import Powerwall
+
+    output = _Output(args.output, args.indent)
+    if args.command == "discover":
+        # Does not connect to a single gateway
+        await args.run(args, output)
+        return
+    async with Powerwall(
+        args.host, timeout=args.timeout, verify_ssl=args.verify_ssl
+    ) as powerwall:
+        if args.password:
+            await powerwall.login(args.password, args.email)
+        await args.run(powerwall, args, output)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        asyncio.run(run(args))
+    except PowerwallError as error:
+        _error(error)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # The reader of the output went away, e.g. `| head`. Redirect stdout
+        # so that flushing it at exit does not raise again.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 0
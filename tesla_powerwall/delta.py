@@ -0,0 +1,399 @@
+"""
+Delta encoding of TelemetrySnapshots.
+
+Consecutive snapshots mostly repeat each other. `SnapshotEncoder` therefore
+emits a keyframe with all values every `keyframe_interval` frames (and
+whenever the meters or the number of battery packs change) and otherwise a
+delta which only contains the values that changed since the previous frame.
+`SnapshotDecoder` reconstructs the exact snapshots from the frames, which
+must be decoded in the order they were encoded.
+
+Frame layout (all integers are unsigned LEB128 varints unless noted):
+
+    magic "PWD", version (1 byte), kind ("K" or "D", 1 byte), sequence
+    keyframe: meter count, meter names, battery count, all values
+    delta:    bitmap of changed values (1 bit per value), changed values
+
+Values are tagged. Changed integers are stored as the zigzag encoded
+difference to the previous value and changed floats as the XOR of both IEEE
+754 bit patterns without its trailing zero bits, which is short for values
+which only differ in their low mantissa bits. Responses are reconstructed
+without their raw response.
+"""
+
+import struct
+from dataclasses import fields
+from typing import IO, Any, Iterable, Iterator, List, Optional, Tuple
+
+from .const import GridState, GridStatus, MeterType, OperationMode
+from .error import SnapshotDecodeError
+from .responses import BatteryResponse, MeterResponse, MetersAggregatesResponse
+from .schema import enum_table
+from .snapshot import TelemetrySnapshot
+
+MAGIC = b"PWD"
+VERSION = 1
+
+DEFAULT_KEYFRAME_INTERVAL = 60
+
+_KEYFRAME = ord("K")
+_DELTA = ord("D")
+
+# Tags of encoded values
+_NONE = 0
+_FALSE = 1
+_TRUE = 2
+_INT = 3
+_FLOAT = 4
+_STR = 5
+_LIST = 6
+# Tags of values which are encoded relative to the previous value
+_INT_DELTA = 7
+_FLOAT_XOR = 8
+
+_DOUBLE = struct.Struct("<d")
+_BITS = struct.Struct("<Q")
+
+# Fields of the responses in the order of their constructor arguments
+# The encoded fields of the responses, which are rebuilt by keyword
+_METER_FIELDS = tuple(
+    field.name for field in fields(MeterResponse) if field.name not in ("_raw", "meter")
+)
+_BATTERY_FIELDS = tuple(
+    field.name for field in fields(BatteryResponse) if field.name != "_raw"
+)
+_GRID_STATE_INDEX = _BATTERY_FIELDS.index("grid_state")
+
+_METER_TYPES = enum_table(MeterType)
+_GRID_STATUSES = enum_table(GridStatus)
+_OPERATION_MODES = enum_table(OperationMode)
+_GRID_STATES = enum_table(GridState)
+
+Layout = Tuple[Tuple[str, ...], int]
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+
+def _bits(value: float) -> int:
+    return _BITS.unpack(_DOUBLE.pack(value))[0]
+
+
+def _write_value(out: bytearray, value: Any) -> None:
+    if value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif type(value) is int:
+        out.append(_INT)
+        _write_varint(out, _zigzag(value))
+    elif type(value) is float:
+        out.append(_FLOAT)
+        out += _DOUBLE.pack(value)
+    elif type(value) is str:
+        encoded = value.encode()
+        out.append(_STR)
+        _write_varint(out, len(encoded))
+        out += encoded
+    elif type(value) is list:
+        out.append(_LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _write_value(out, item)
+    else:
+        raise TypeError("Cannot encode value of type {}".format(type(value).__name__))
+
+
+def _read_value(data: bytes, offset: int, previous: Any = None) -> Tuple[Any, int]:
+    tag = data[offset]
+    offset += 1
+    if tag == _NONE:
+        return None, offset
+    if tag == _TRUE:
+        return True, offset
+    if tag == _FALSE:
+        return False, offset
+    if tag == _INT:
+        value, offset = _read_varint(data, offset)
+        return _unzigzag(value), offset
+    if tag == _FLOAT:
+        return _DOUBLE.unpack_from(data, offset)[0], offset + 8
+    if tag == _STR:
+        length, offset = _read_varint(data, offset)
+        return bytes(data[offset : offset + length]).decode(), offset + length
+    if tag == _LIST:
+        count, offset = _read_varint(data, offset)
+        items = []
+        for _ in range(count):
+            item, offset = _read_value(data, offset)
+            items.append(item)
+        return items, offset
+    if tag == _INT_DELTA:
+        difference, offset = _read_varint(data, offset)
+        return previous + _unzigzag(difference), offset
+    if tag == _FLOAT_XOR:
+        trailing_zeros = data[offset]
+        xor, offset = _read_varint(data, offset + 1)
+        bits = _bits(previous) ^ (xor << trailing_zeros)
+        return _DOUBLE.unpack(_BITS.pack(bits))[0], offset
+    raise SnapshotDecodeError("unknown value tag {}".format(tag))
+
+
+def _same(previous: Any, value: Any) -> bool:
+    if type(previous) is not type(value):
+        return False
+    if type(value) is float:
+        # Compare bit patterns to tell apart 0.0 and -0.0 and to match NaNs
+        return _bits(previous) == _bits(value)
+    return previous == value
+
+
+def _write_change(out: bytearray, previous: Any, value: Any) -> None:
+    if type(value) is int and type(previous) is int:
+        out.append(_INT_DELTA)
+        _write_varint(out, _zigzag(value - previous))
+    elif type(value) is float and type(previous) is float:
+        xor = _bits(previous) ^ _bits(value)
+        trailing_zeros = (xor & -xor).bit_length() - 1
+        out.append(_FLOAT_XOR)
+        out.append(trailing_zeros)
+        _write_varint(out, xor >> trailing_zeros)
+    else:
+        _write_value(out, value)
+
+
+def _flatten(snapshot: TelemetrySnapshot) -> Tuple[Layout, List[Any]]:
+    values: List[Any] = [
+        snapshot.timestamp,
+        snapshot.soe,
+        snapshot.grid_status.value,
+        None if snapshot.operation_mode is None else snapshot.operation_mode.value,
+    ]
+    meters = snapshot.meters.meters
+    for response in meters.values():
+        values.extend([getattr(response, field) for field in _METER_FIELDS])
+    for battery in snapshot.batteries:
+        battery_values = [getattr(battery, field) for field in _BATTERY_FIELDS]
+        battery_values[_GRID_STATE_INDEX] = battery.grid_state.value
+        values.extend(battery_values)
+
+    layout = (tuple(meter.value for meter in meters), len(snapshot.batteries))
+    return layout, values
+
+
+def _unflatten(layout: Layout, values: List[Any]) -> TelemetrySnapshot:
+    meter_names, battery_count = layout
+    offset = 4
+    meters = {}
+    for name in meter_names:
+        meter = _METER_TYPES[name]
+        end = offset + len(_METER_FIELDS)
+        meters[meter] = MeterResponse(
+            _raw=None, meter=meter, **dict(zip(_METER_FIELDS, values[offset:end]))
+        )
+        offset = end
+
+    batteries = []
+    for _ in range(battery_count):
+        end = offset + len(_BATTERY_FIELDS)
+        battery_values = values[offset:end]
+        battery_values[_GRID_STATE_INDEX] = _GRID_STATES[
+            battery_values[_GRID_STATE_INDEX]
+        ]
+        batteries.append(
+            BatteryResponse(_raw=None, **dict(zip(_BATTERY_FIELDS, battery_values)))
+        )
+        offset = end
+
+    return TelemetrySnapshot(
+        timestamp=values[0],
+        meters=MetersAggregatesResponse(None, meters),
+        soe=values[1],
+        grid_status=_GRID_STATUSES[values[2]],
+        batteries=batteries,
+        operation_mode=None if values[3] is None else _OPERATION_MODES[values[3]],
+    )
+
+
+def _value_count(layout: Layout) -> int:
+    meter_names, battery_count = layout
+    return (
+        4 + len(meter_names) * len(_METER_FIELDS) + battery_count * len(_BATTERY_FIELDS)
+    )
+
+
+class SnapshotEncoder:
+    """Encodes TelemetrySnapshots into keyframes and deltas"""
+
+    def __init__(self, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL) -> None:
+        if keyframe_interval <= 0:
+            raise ValueError("keyframe_interval must be positive")
+        self.keyframe_interval = keyframe_interval
+        self._layout: Optional[Layout] = None
+        self._values: List[Any] = []
+        self._sequence = 0
+        self._since_keyframe = 0
+
+    def reset(self) -> None:
+        """Makes the next frame a keyframe"""
+        self._layout = None
+
+    def encode(self, snapshot: TelemetrySnapshot) -> bytes:
+        layout, values = _flatten(snapshot)
+        out = bytearray(MAGIC)
+        out.append(VERSION)
+
+        if layout != self._layout or self._since_keyframe >= self.keyframe_interval:
+            out.append(_KEYFRAME)
+            _write_varint(out, self._sequence)
+            meter_names, battery_count = layout
+            _write_varint(out, len(meter_names))
+            for name in meter_names:
+                _write_value(out, name)
+            _write_varint(out, battery_count)
+            for value in values:
+                _write_value(out, value)
+            self._since_keyframe = 1
+        else:
+            out.append(_DELTA)
+            _write_varint(out, self._sequence)
+            bitmap = bytearray((len(values) + 7) // 8)
+            changes = bytearray()
+            for index, (previous, value) in enumerate(zip(self._values, values)):
+                if not _same(previous, value):
+                    bitmap[index >> 3] |= 1 << (index & 7)
+                    _write_change(changes, previous, value)
+            out += bitmap
+            out += changes
+            self._since_keyframe += 1
+
+        self._layout = layout
+        self._values = values
+        self._sequence += 1
+        return bytes(out)
+
+
+class SnapshotDecoder:
+    """Reconstructs TelemetrySnapshots from the frames of a SnapshotEncoder"""
+
+    def __init__(self) -> None:
+        self._layout: Optional[Layout] = None
+        self._values: List[Any] = []
+        self._sequence: Optional[int] = None
+
+    def decode(self, frame: bytes) -> TelemetrySnapshot:
+        if frame[:3] != MAGIC:
+            raise SnapshotDecodeError("not a delta encoded snapshot")
+        if len(frame) < 5 or frame[3] != VERSION:
+            raise SnapshotDecodeError("unsupported version")
+        try:
+            return self._decode(frame)
+        except (IndexError, struct.error, UnicodeDecodeError, KeyError) as error:
+            raise SnapshotDecodeError(
+                "corrupted frame ({})".format(type(error).__name__)
+            ) from error
+
+    def _decode(self, frame: bytes) -> TelemetrySnapshot:
+        kind = frame[4]
+        sequence, offset = _read_varint(frame, 5)
+
+        if kind == _KEYFRAME:
+            meter_count, offset = _read_varint(frame, offset)
+            meter_names = []
+            for _ in range(meter_count):
+                name, offset = _read_value(frame, offset)
+                meter_names.append(name)
+            battery_count, offset = _read_varint(frame, offset)
+            layout = (tuple(meter_names), battery_count)
+            values = []
+            for _ in range(_value_count(layout)):
+                value, offset = _read_value(frame, offset)
+                values.append(value)
+        elif kind == _DELTA:
+            if self._layout is None or self._sequence is None:
+                raise SnapshotDecodeError("delta frame without a preceding keyframe")
+            if sequence != self._sequence + 1:
+                raise SnapshotDecodeError(
+                    "expected frame {}, got {}".format(self._sequence + 1, sequence)
+                )
+            layout = self._layout
+            values = list(self._values)
+            bitmap_end = offset + (len(values) + 7) // 8
+            bitmap = frame[offset:bitmap_end]
+            offset = bitmap_end
+            for index in range(len(values)):
+                if bitmap[index >> 3] & (1 << (index & 7)):
+                    values[index], offset = _read_value(frame, offset, values[index])
+        else:
+            raise SnapshotDecodeError("unknown frame kind {}".format(kind))
+
+        if offset != len(frame):
+            raise SnapshotDecodeError("unexpected trailing data")
+
+        self._layout = layout
+        self._values = values
+        self._sequence = sequence
+        return _unflatten(layout, values)
+
+
+def dump_snapshots(
+    snapshots: Iterable[TelemetrySnapshot],
+    file: IO[bytes],
+    keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+) -> None:
+    """Writes length prefixed frames of snapshots to a binary file"""
+    encoder = SnapshotEncoder(keyframe_interval)
+    for snapshot in snapshots:
+        frame = encoder.encode(snapshot)
+        prefix = bytearray()
+        _write_varint(prefix, len(frame))
+        file.write(prefix)
+        file.write(frame)
+
+
+def load_snapshots(file: IO[bytes]) -> Iterator[TelemetrySnapshot]:
+    """Reads the snapshots written by `dump_snapshots`"""
+    decoder = SnapshotDecoder()
+    while True:
+        length = 0
+        shift = 0
+        while True:
+            byte = file.read(1)
+            if not byte:
+                if shift:
+                    raise SnapshotDecodeError("truncated frame length")
+                return
+            length |= (byte[0] & 0x7F) << shift
+            if byte[0] < 0x80:
+                break
+            shift += 7
+        frame = file.read(length)
+        if len(frame) != length:
+            raise SnapshotDecodeError("truncated frame")
+        yield decoder.decode(frame)
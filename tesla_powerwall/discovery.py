@@ -0,0 +1,176 @@
+"""
+Discovery of gateways on the local network.
+
+`discover` requests the unauthenticated `status` endpoint of every host in
+the given networks and ranges concurrently and yields each gateway as soon
+as it answered, identified by its device type, version and DIN:
+
+    async for gateway in discover(["192.168.1.0/24"]):
+        print(gateway.address, gateway.din)
+
+The number of hosts requested at once is limited by concurrency and each
+host gets at most timeout seconds, so a /24 takes about
+254 / concurrency * timeout seconds if no host answers.
+"""
+
+import asyncio
+import ipaddress
+import itertools
+import re
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Iterator, List, Optional
+
+import aiohttp
+
+from .api import API
+from .error import PowerwallError
+
+DEFAULT_CONCURRENCY = 64
+DEFAULT_DISCOVERY_TIMEOUT = 1.0
+
+
+@dataclass
+class DiscoveredGateway:
+    address: str
+    # As returned by "device_type", see DeviceType for the known values
+    device_type: str
+    version: str
+    # Only returned by newer firmware versions
+    din: Optional[str]
+    # Seconds until the status was received
+    latency: float
+
+
+# A hostname of dot-separated labels of letters, digits and inner hyphens
+_HOSTNAME = re.compile(
+    r"^(?!-)[a-z0-9-]{1,63}(?<!-)(\.(?!-)[a-z0-9-]{1,63}(?<!-))*\.?$", re.IGNORECASE
+)
+
+
+def _is_address(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _addresses(target: str) -> Iterator[str]:
+    # Validates target right away, but yields its addresses lazily
+    if "/" in target:
+        network = ipaddress.ip_network(target, strict=False)
+        # hosts() of a /32 or /128 is empty in older Python versions
+        return map(str, network.hosts() if network.num_addresses > 1 else network)
+    if "-" in target and _is_address(target.partition("-")[0]):
+        first, _, last = target.partition("-")
+        start = ipaddress.ip_address(first)
+        if start.version == 4 and "." not in last:
+            # Only the last octet of the end is given
+            last = "{}.{}".format(first.rpartition(".")[0], last)
+        end = ipaddress.ip_address(last)
+        if end.version != start.version or int(end) < int(start):
+            raise ValueError("Invalid address range: {}".format(target))
+        return (
+            str(ipaddress.ip_address(value))
+            for value in range(int(start), int(end) + 1)
+        )
+    if not _is_address(target) and (len(target) > 253 or not _HOSTNAME.match(target)):
+        raise ValueError("Invalid address or hostname: {}".format(target))
+    return iter([target])
+
+
+def expand(targets: Iterable[str]) -> Iterator[str]:
+    """
+    Yields the addresses of targets, which are networks ("192.168.1.0/24"),
+    ranges ("192.168.1.10-192.168.1.20" or "192.168.1.10-20") or single
+    addresses and hostnames. Raises ValueError for an invalid target before
+    any address is yielded.
+    """
+    return itertools.chain.from_iterable([_addresses(target) for target in targets])
+
+
+def identify(
+    address: str, status: object, latency: float
+) -> Optional[DiscoveredGateway]:
+    """Returns the gateway if status is the response of a gateway"""
+    if not isinstance(status, dict):
+        return None
+    device_type = status.get("device_type")
+    version = status.get("version")
+    if not isinstance(device_type, str) or not isinstance(version, str):
+        return None
+    din = status.get("din")
+    return DiscoveredGateway(
+        address, device_type, version, din if isinstance(din, str) else None, latency
+    )
+
+
+async def _probe(
+    session: aiohttp.ClientSession, address: str, timeout: float, verify_ssl: bool
+) -> Optional[DiscoveredGateway]:
+    # IPv6 addresses must be enclosed in brackets in the URL
+    endpoint = "[{}]".format(address) if ":" in address else address
+    api = API(endpoint, timeout=timeout, http_session=session, verify_ssl=verify_ssl)
+    start = time.monotonic()
+    try:
+        status = await api.get_status()
+    except (PowerwallError, aiohttp.ClientError):
+        # Not reachable or not a gateway
+        return None
+    return identify(address, status, time.monotonic() - start)
+
+
+async def discover(
+    targets: Iterable[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_DISCOVERY_TIMEOUT,
+    verify_ssl: bool = False,
+) -> AsyncIterator[DiscoveredGateway]:
+    """
+    Yields the gateways among the addresses of targets (see `expand`) in the
+    order in which they answer. At most concurrency hosts are requested at
+    once, each for at most timeout seconds. Closing the iterator early
+    (`aclose()`) cancels the outstanding requests. Invalid targets raise a
+    ValueError before any host is requested.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    addresses = expand(targets)
+    # None marks that a worker is done
+    found: "asyncio.Queue[Optional[DiscoveredGateway]]" = asyncio.Queue()
+
+    async def worker() -> None:
+        try:
+            # The workers share the iterator, so only concurrency addresses
+            # are in flight and a large range is never held in memory
+            for address in addresses:
+                gateway = await _probe(session, address, timeout, verify_ssl)
+                if gateway is not None:
+                    found.put_nowait(gateway)
+        finally:
+            found.put_nowait(None)
+
+    # Every host is requested once, so connections are not kept alive
+    connector = aiohttp.TCPConnector(limit=concurrency, force_close=True)
+    async with aiohttp.ClientSession(
+        connector=connector, cookie_jar=aiohttp.DummyCookieJar()
+    ) as session:
+        workers: List[asyncio.Task] = [
+            asyncio.ensure_future(worker()) for _ in range(concurrency)
+        ]
+        try:
+            running = len(workers)
+            while running:
+                gateway = await found.get()
+                if gateway is None:
+                    running -= 1
+                else:
+                    yield gateway
+            for task in workers:
+                # Raises an unexpected error of a worker
+                task.result()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
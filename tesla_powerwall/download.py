@@ -0,0 +1,162 @@
+"""
+Streaming download of large responses like `getlogs`.
+
+The body is written to the destination chunk by chunk as it is received, so
+the memory needed does not depend on the size of the response. The
+destination is either a path or a sink with a `write(data)` method, which may
+be a coroutine function. Use `API.download` or `API.download_logs`.
+"""
+
+import asyncio
+import inspect
+import os
+import time
+import zlib
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Callable, Optional, Protocol, Union
+
+import aiohttp
+
+from .error import PowerwallUnreachableError, ResponseTooLargeError
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+COMPRESSIONS = ("gzip",)
+
+
+class Sink(Protocol):
+    """A destination other than a path, e.g. a file opened in binary mode"""
+
+    # May return an awaitable, which is awaited before the next write
+    def write(self, __data: bytes) -> Any: ...
+
+
+Destination = Union[str, "os.PathLike[str]", Sink]
+
+
+@dataclass
+class DownloadResult:
+    # Bytes of the body received by this download
+    bytes_received: int
+    # Bytes written to the destination, which differs if compressed
+    bytes_written: int
+    # Offset at which a resumed download continued, 0 otherwise
+    resumed_from: int
+    # Seconds since the response was received
+    elapsed: float
+    complete: bool
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_received / self.elapsed if self.elapsed > 0 else 0.0
+
+
+ProgressCallback = Callable[[DownloadResult], None]
+
+
+def resume_offset(destination: Destination) -> int:
+    """Returns the number of bytes already downloaded to destination"""
+    if not isinstance(destination, (str, os.PathLike)):
+        raise ValueError("Only downloads to a path can be resumed")
+    try:
+        return os.path.getsize(destination)
+    except FileNotFoundError:
+        return 0
+
+
+class _ExecutorFile:
+    """Sink which writes to a file in an executor"""
+
+    def __init__(self, file: BinaryIO, executor: Optional[Executor]) -> None:
+        self.file = file
+        self.executor = executor
+
+    async def write(self, data: bytes) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.file.write, data)
+
+
+async def _write(sink: Sink, data: bytes) -> None:
+    result = sink.write(data)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def write_response(
+    response: aiohttp.ClientResponse,
+    destination: Destination,
+    resumed_from: int = 0,
+    compression: Optional[str] = None,
+    max_size: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+    executor: Optional[Executor] = None,
+) -> DownloadResult:
+    """
+    Writes the body of response to destination. If resumed_from is not 0,
+    the body is appended to the file at destination.
+
+    A file at a path is opened, written and closed in executor (the default
+    executor of the loop if None) with `loop.run_in_executor`, so that disk
+    I/O does not block the event loop. The `write` method of a sink is called
+    on the event loop; sinks which block should have a coroutine `write`.
+
+    Raises ResponseTooLargeError once more than max_size bytes (including
+    the bytes of a resumed download) would be written. The data received up
+    to then stays at the destination, which also applies if the download is
+    aborted by cancelling it.
+    """
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError("Unsupported compression: {}".format(compression))
+    if (
+        max_size is not None
+        and response.content_length is not None
+        and resumed_from + response.content_length > max_size
+    ):
+        raise ResponseTooLargeError(max_size)
+
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(wbits=31) if compression == "gzip" else None
+    # Files opened for a path are closed again
+    file: Optional[BinaryIO] = None
+    sink: Sink
+    loop = asyncio.get_running_loop()
+    if isinstance(destination, (str, os.PathLike)):
+        opened: BinaryIO = await loop.run_in_executor(
+            executor, open, destination, "ab" if resumed_from else "wb"
+        )
+        sink = _ExecutorFile(opened, executor)
+        file = opened
+    else:
+        sink = destination
+    result = DownloadResult(0, 0, resumed_from, 0.0, False)
+    start = time.perf_counter()
+    try:
+        async for chunk in response.content.iter_chunked(chunk_size):
+            if max_size is not None and (
+                resumed_from + result.bytes_received + len(chunk) > max_size
+            ):
+                raise ResponseTooLargeError(max_size)
+            result.bytes_received += len(chunk)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                await _write(sink, chunk)
+                result.bytes_written += len(chunk)
+            if progress is not None:
+                result.elapsed = time.perf_counter() - start
+                progress(result)
+        result.complete = True
+    except aiohttp.ClientError as error:
+        raise PowerwallUnreachableError(str(error))
+    finally:
+        # Finish the compressed stream, so that the data received until
+        # an error or cancellation can be decompressed
+        if compressor is not None:
+            tail = compressor.flush()
+            await _write(sink, tail)
+            result.bytes_written += len(tail)
+        if file is not None:
+            await loop.run_in_executor(executor, file.close)
+        result.elapsed = time.perf_counter() - start
+    return result
@@ -0,0 +1,547 @@
+"""
+Integration of instant power samples into energy per interval.
+
+The cumulative `energy_imported`/`energy_exported` counters of the meters are
+coarse and might reset, e.g. after a firmware update. The integrators in this
+module compute the energy from `instant_power` instead (trapezoidal rule, in
+Wh) and report the counter deltas for the same interval next to it, so both
+can be reconciled.
+
+Positive power is counted as imported and negative power as exported energy.
+The meters do not agree on the sign of `instant_power`: site and load report
+positive power for energy their `energy_imported` counter counts, solar and
+battery report positive power while producing or discharging, which their
+`energy_exported` counter counts. The power of each meter is therefore
+multiplied by its sign in `METER_POWER_SIGNS` first. If power changes its sign
+between two samples, the segment is split at the zero crossing. Samples whose
+power is NaN, e.g. of a meter missing from a `MeterHistory` sample, are
+skipped.
+
+`integrate_power` and `total_energy` integrate whole series at once. If numpy
+is installed (`pip install tesla_powerwall[numpy]`), they are vectorized,
+otherwise the samples are added to a PowerIntegrator one by one.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .const import MeterType
+from .responses import MeterResponse, MetersAggregatesResponse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+DEFAULT_ENERGY_INTERVAL = 3600.0
+DEFAULT_MAX_GAP = 300.0
+DEFAULT_RESET_TOLERANCE = 1.0
+
+# Factor by which the instant power of a meter is multiplied, so that positive
+# power is the energy counted by its energy_imported counter. Meters which are
+# not listed are not inverted.
+METER_POWER_SIGNS: Dict[MeterType, float] = {
+    MeterType.SITE: 1.0,
+    MeterType.LOAD: 1.0,
+    MeterType.SOLAR: -1.0,
+    MeterType.BATTERY: -1.0,
+}
+
+
+@dataclass
+class EnergyInterval:
+    start: float
+    end: float
+    # Energy integrated from instant power in Wh
+    imported: float = 0.0
+    exported: float = 0.0
+    # Seconds of the interval covered by samples, i.e. excluding gaps
+    covered: float = 0.0
+    # Deltas of the cumulative counters in Wh, None if no counters were given
+    counter_imported: Optional[float] = None
+    counter_exported: Optional[float] = None
+    counter_resets: int = 0
+
+    @property
+    def imported_difference(self) -> Optional[float]:
+        """Integrated minus counted imported energy"""
+        if self.counter_imported is None:
+            return None
+        return self.imported - self.counter_imported
+
+    @property
+    def exported_difference(self) -> Optional[float]:
+        """Integrated minus counted exported energy"""
+        if self.counter_exported is None:
+            return None
+        return self.exported - self.counter_exported
+
+
+def _trapezoid(
+    start: float, start_power: float, end: float, end_power: float
+) -> Tuple[float, float]:
+    # Returns the (imported, exported) energy in Wh between two samples
+    hours = (end - start) / 3600
+    if start_power >= 0 and end_power >= 0:
+        return (start_power + end_power) / 2 * hours, 0.0
+    if start_power <= 0 and end_power <= 0:
+        return 0.0, -(start_power + end_power) / 2 * hours
+
+    # The power crosses zero at this fraction of the segment
+    fraction = start_power / (start_power - end_power)
+    first = start_power / 2 * fraction * hours
+    second = end_power / 2 * (1 - fraction) * hours
+    if first > 0:
+        return first, -second
+    return second, -first
+
+
+class CounterTracker:
+    """
+    Computes deltas of a cumulative energy counter and detects resets.
+
+    A reading lower than the previous one by more than `tolerance` Wh is
+    considered a reset; the counter is then assumed to have restarted at zero.
+    """
+
+    def __init__(self, tolerance: float = DEFAULT_RESET_TOLERANCE) -> None:
+        self.tolerance = tolerance
+        self.resets = 0
+        self._last: Optional[float] = None
+
+    def add(self, value: float) -> Tuple[float, bool]:
+        """Returns the delta to the previous reading and whether it was a reset"""
+        last = self._last
+        self._last = value
+        if last is None:
+            return 0.0, False
+        delta = value - last
+        if delta < -self.tolerance:
+            self.resets += 1
+            return value, True
+        # Small negative deltas are jitter of the counter
+        return max(delta, 0.0), False
+
+
+class PowerIntegrator:
+    """
+    Incrementally integrates the power of one meter into intervals of
+    `interval` seconds aligned to multiples of interval.
+
+    Segments between samples that are further apart than `max_gap` seconds
+    are treated as gaps and not integrated. Samples must be added in
+    chronological order. The power is multiplied by sign before it is
+    integrated, see `METER_POWER_SIGNS`.
+    """
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_ENERGY_INTERVAL,
+        max_gap: float = DEFAULT_MAX_GAP,
+        reset_tolerance: float = DEFAULT_RESET_TOLERANCE,
+        sign: float = 1.0,
+    ) -> None:
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.interval = interval
+        self.max_gap = max_gap
+        self.sign = sign
+        self._imported = CounterTracker(reset_tolerance)
+        self._exported = CounterTracker(reset_tolerance)
+        self._last: Optional[Tuple[float, float]] = None
+        self._current: Optional[EnergyInterval] = None
+
+    def _start(self, timestamp: float) -> EnergyInterval:
+        start = timestamp - timestamp % self.interval
+        return EnergyInterval(start, start + self.interval)
+
+    def add(
+        self,
+        timestamp: float,
+        power: float,
+        energy_imported: Optional[float] = None,
+        energy_exported: Optional[float] = None,
+    ) -> List[EnergyInterval]:
+        """
+        Adds a sample and returns the intervals completed by it. The counters
+        are optional; if given, their deltas are added to the interval of the
+        sample. Samples with NaN power are skipped, including their counters.
+        """
+        if math.isnan(power):
+            return []
+        power *= self.sign
+        completed: List[EnergyInterval] = []
+        current = self._current
+        if current is None:
+            current = self._current = self._start(timestamp)
+
+        last = self._last
+        if last is not None:
+            last_timestamp, last_power = last
+            duration = timestamp - last_timestamp
+            if duration < 0:
+                raise ValueError("Samples must be added in chronological order")
+            integrate = duration <= self.max_gap
+
+            segment_start, segment_power = last_timestamp, last_power
+            while timestamp >= current.end:
+                if integrate:
+                    boundary = current.end
+                    boundary_power = last_power + (power - last_power) * (
+                        (boundary - last_timestamp) / duration
+                    )
+                    self._accumulate(
+                        current, segment_start, segment_power, boundary, boundary_power
+                    )
+                    segment_start, segment_power = boundary, boundary_power
+                if current.covered > 0 or current.counter_imported is not None:
+                    completed.append(current)
+                current = self._current = self._start(current.end)
+                if not integrate and timestamp >= current.end:
+                    # Skip intervals which are entirely within the gap
+                    current = self._current = self._start(timestamp)
+
+            if integrate:
+                self._accumulate(
+                    current, segment_start, segment_power, timestamp, power
+                )
+
+        self._last = (timestamp, power)
+
+        if energy_imported is not None:
+            delta, reset = self._imported.add(energy_imported)
+            current.counter_imported = (current.counter_imported or 0.0) + delta
+            current.counter_resets += reset
+        if energy_exported is not None:
+            delta, reset = self._exported.add(energy_exported)
+            current.counter_exported = (current.counter_exported or 0.0) + delta
+            current.counter_resets += reset
+
+        return completed
+
+    @staticmethod
+    def _accumulate(
+        interval: EnergyInterval,
+        start: float,
+        start_power: float,
+        end: float,
+        end_power: float,
+    ) -> None:
+        imported, exported = _trapezoid(start, start_power, end, end_power)
+        interval.imported += imported
+        interval.exported += exported
+        interval.covered += end - start
+
+    @property
+    def current(self) -> Optional[EnergyInterval]:
+        """The interval which is still being integrated"""
+        return self._current
+
+    def flush(self) -> Optional[EnergyInterval]:
+        """Returns the incomplete current interval and starts a new one"""
+        current = self._current
+        self._current = None
+        self._last = None
+        return current
+
+
+class EnergyIntegrator:
+    """Runs a PowerIntegrator for every meter of MetersAggregatesResponses"""
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_ENERGY_INTERVAL,
+        max_gap: float = DEFAULT_MAX_GAP,
+        reset_tolerance: float = DEFAULT_RESET_TOLERANCE,
+    ) -> None:
+        self._interval = interval
+        self._max_gap = max_gap
+        self._reset_tolerance = reset_tolerance
+        self._integrators: Dict[MeterType, PowerIntegrator] = {}
+
+    def integrator(self, meter: MeterType) -> PowerIntegrator:
+        integrator = self._integrators.get(meter)
+        if integrator is None:
+            integrator = self._integrators[meter] = PowerIntegrator(
+                self._interval,
+                self._max_gap,
+                self._reset_tolerance,
+                METER_POWER_SIGNS.get(meter, 1.0),
+            )
+        return integrator
+
+    def add_meter(self, meter: MeterResponse, timestamp: float) -> List[EnergyInterval]:
+        return self.integrator(meter.meter).add(
+            timestamp,
+            meter.instant_power,
+            meter.energy_imported,
+            meter.energy_exported,
+        )
+
+    def add_meters(
+        self, meters: MetersAggregatesResponse, timestamp: float
+    ) -> Dict[MeterType, List[EnergyInterval]]:
+        """Adds all meters and returns the completed intervals per meter"""
+        return {
+            meter: self.add_meter(response, timestamp)
+            for meter, response in meters.meters.items()
+        }
+
+
+def integrate_power(
+    timestamps: Sequence[float],
+    power: Sequence[float],
+    interval: float = DEFAULT_ENERGY_INTERVAL,
+    max_gap: float = DEFAULT_MAX_GAP,
+    energy_imported: Optional[Sequence[float]] = None,
+    energy_exported: Optional[Sequence[float]] = None,
+    sign: float = 1.0,
+) -> List[EnergyInterval]:
+    """
+    Integrates a whole power series (e.g. columns of a MeterHistory) and
+    returns every interval including the last, incomplete one. sign is
+    the sign of the meter in `METER_POWER_SIGNS`.
+    """
+    if len(timestamps) != len(power):
+        raise ValueError("timestamps and power must have the same length")
+
+    if energy_imported is not None and len(energy_imported) != len(power):
+        raise ValueError("energy_imported and power must have the same length")
+    if energy_exported is not None and len(energy_exported) != len(power):
+        raise ValueError("energy_exported and power must have the same length")
+    if np is not None:
+        return _integrate_power_numpy(
+            timestamps,
+            power,
+            interval,
+            max_gap,
+            energy_imported,
+            energy_exported,
+            sign,
+        )
+
+    integrator = PowerIntegrator(interval, max_gap, sign=sign)
+    no_counters: List[Optional[float]] = [None] * len(power)
+    imported: Iterable[Optional[float]] = (
+        energy_imported if energy_imported is not None else no_counters
+    )
+    exported: Iterable[Optional[float]] = (
+        energy_exported if energy_exported is not None else no_counters
+    )
+    intervals: List[EnergyInterval] = []
+    for sample in zip(timestamps, power, imported, exported):
+        intervals.extend(integrator.add(*sample))
+    last = integrator.flush()
+    if last is not None and (last.covered > 0 or last.counter_imported is not None):
+        intervals.append(last)
+    return intervals
+
+
+def _trapezoid_numpy(
+    start: "np.ndarray",
+    start_power: "np.ndarray",
+    end: "np.ndarray",
+    end_power: "np.ndarray",
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    # Vectorized _trapezoid of many segments
+    hours = (end - start) / 3600
+    mean = (start_power + end_power) / 2 * hours
+    positive = (start_power >= 0) & (end_power >= 0)
+    negative = ~positive & (start_power <= 0) & (end_power <= 0)
+    # Only used for the segments crossing zero, whose powers differ
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = start_power / (start_power - end_power)
+        first = start_power / 2 * fraction * hours
+        second = end_power / 2 * (1 - fraction) * hours
+    imported = np.where(
+        positive, mean, np.where(negative, 0.0, np.where(first > 0, first, second))
+    )
+    exported = np.where(
+        positive, 0.0, np.where(negative, -mean, np.where(first > 0, -second, -first))
+    )
+    return imported, exported
+
+
+def _counter_deltas(
+    values: "np.ndarray", tolerance: float
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    # Vectorized CounterTracker: the deltas and resets of every reading
+    difference = np.diff(values, prepend=values[:1])
+    resets = difference < -tolerance
+    return np.where(resets, values, np.maximum(difference, 0.0)), resets
+
+
+def _integrate_power_numpy(
+    timestamps: Sequence[float],
+    power: Sequence[float],
+    interval: float,
+    max_gap: float,
+    energy_imported: Optional[Sequence[float]],
+    energy_exported: Optional[Sequence[float]],
+    sign: float,
+) -> List[EnergyInterval]:
+    # Computes the same intervals as adding every sample to a PowerIntegrator
+    if interval <= 0:
+        raise ValueError("interval must be positive")
+    times = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(power, dtype=np.float64) * sign
+    valid = ~np.isnan(values)
+    times = times[valid]
+    values = values[valid]
+    if not len(times):
+        return []
+    durations = np.diff(times)
+    if (durations < 0).any():
+        raise ValueError("Samples must be added in chronological order")
+
+    # Index of the interval of every sample
+    sample_keys = np.floor_divide(times, interval).astype(np.int64)
+    integrated = np.flatnonzero(durations <= max_gap)
+
+    # Integrated segments are split into one piece per interval they touch
+    pieces = sample_keys[integrated + 1] - sample_keys[integrated] + 1
+    segment = np.repeat(integrated, pieces)
+    first_piece = np.repeat(np.cumsum(pieces) - pieces, pieces)
+    piece = np.arange(len(segment)) - first_piece
+    last_piece = piece == np.repeat(pieces, pieces) - 1
+    keys = sample_keys[segment] + piece
+
+    segment_start = times[segment]
+    segment_power = values[segment]
+    segment_end = times[segment + 1]
+    segment_end_power = values[segment + 1]
+    duration = durations[segment]
+
+    def boundary_power(boundary: "np.ndarray") -> "np.ndarray":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return segment_power + (segment_end_power - segment_power) * (
+                (boundary - segment_start) / duration
+            )
+
+    start_boundary = keys * interval
+    end_boundary = (keys + 1) * interval
+    start = np.where(piece == 0, segment_start, start_boundary)
+    start_power = np.where(piece == 0, segment_power, boundary_power(start_boundary))
+    end = np.where(last_piece, segment_end, end_boundary)
+    end_power = np.where(last_piece, segment_end_power, boundary_power(end_boundary))
+    imported, exported = _trapezoid_numpy(start, start_power, end, end_power)
+
+    intervals, inverse = np.unique(
+        np.concatenate([keys, sample_keys]), return_inverse=True
+    )
+    size = len(intervals)
+    piece_index = inverse[: len(keys)]
+    sample_index = inverse[len(keys) :]
+    imported = np.bincount(piece_index, imported, size)
+    exported = np.bincount(piece_index, exported, size)
+    covered = np.bincount(piece_index, end - start, size)
+    has_sample = np.bincount(sample_index, minlength=size) > 0
+
+    # The counter deltas are added to the interval of their sample
+    counters: List[Optional["np.ndarray"]] = []
+    resets = np.zeros(size, dtype=np.int64)
+    for readings in (energy_imported, energy_exported):
+        if readings is None:
+            counters.append(None)
+            continue
+        deltas, reset = _counter_deltas(
+            np.asarray(readings, dtype=np.float64)[valid], DEFAULT_RESET_TOLERANCE
+        )
+        counters.append(np.bincount(sample_index, deltas, size))
+        resets += np.bincount(sample_index, minlength=size, weights=reset).astype(
+            np.int64
+        )
+
+    # PowerIntegrator only returns the intervals which are covered or, if
+    # energy_imported is given, have a sample
+    keep = covered > 0
+    if energy_imported is not None:
+        keep |= has_sample
+
+    def counter_value(counter: Optional["np.ndarray"], index: int) -> Optional[float]:
+        if counter is None or not has_sample[index]:
+            return None
+        return float(counter[index])
+
+    result = []
+    for index in np.flatnonzero(keep).tolist():
+        interval_start = float(intervals[index] * interval)
+        result.append(
+            EnergyInterval(
+                interval_start,
+                interval_start + interval,
+                float(imported[index]),
+                float(exported[index]),
+                float(covered[index]),
+                counter_value(counters[0], index),
+                counter_value(counters[1], index),
+                int(resets[index]),
+            )
+        )
+    return result
+
+
+def _total_energy_numpy(
+    timestamps: Sequence[float], power: Sequence[float], max_gap: float, sign: float
+) -> Tuple[float, float]:
+    times = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(power, dtype=np.float64) * sign
+    valid = ~np.isnan(values)
+    times = times[valid]
+    values = values[valid]
+    durations = np.diff(times)
+    if (durations < 0).any():
+        raise ValueError("timestamps must be in chronological order")
+    segments = np.flatnonzero(durations <= max_gap)
+    imported, exported = _trapezoid_numpy(
+        times[segments], values[segments], times[segments + 1], values[segments + 1]
+    )
+    return float(imported.sum()), float(exported.sum())
+
+
+def total_energy(
+    timestamps: Sequence[float],
+    power: Sequence[float],
+    max_gap: float = math.inf,
+    sign: float = 1.0,
+) -> Tuple[float, float]:
+    """
+    Returns the total (imported, exported) energy in Wh of a power series.
+    sign is the sign of the meter in `METER_POWER_SIGNS`.
+    """
+    if len(timestamps) != len(power):
+        raise ValueError("timestamps and power must have the same length")
+    if np is not None:
+        return _total_energy_numpy(timestamps, power, max_gap, sign)
+
+    imported = []
+    exported = []
+    samples = (
+        (timestamp, value * sign)
+        for timestamp, value in zip(timestamps, power)
+        if not math.isnan(value)
+    )
+    previous = next(samples, None)
+    if previous is None:
+        return 0.0, 0.0
+    for current in samples:
+        if 0 <= current[0] - previous[0] <= max_gap:
+            segment = _trapezoid(previous[0], previous[1], current[0], current[1])
+            imported.append(segment[0])
+            exported.append(segment[1])
+        elif current[0] < previous[0]:
+            raise ValueError("timestamps must be in chronological order")
+        previous = current
+    return math.fsum(imported), math.fsum(exported)
+
+
+def detect_counter_resets(
+    values: Sequence[float], tolerance: float = DEFAULT_RESET_TOLERANCE
+) -> List[int]:
+    """Returns the indices of values at which a cumulative counter was reset"""
+    return [
+        index
+        for index in range(1, len(values))
+        if values[index] < values[index - 1] - tolerance
+    ]
@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import Dict, List, Union
 
 from .const import MeterType
 
@@ -32,6 +32,34 @@ class MissingAttributeError(ApiError):
             )
 
 
+class InvalidResponseError(ApiError):
+    def __init__(
+        self,
+        response_type: str,
+        missing: Union[List[str], None] = None,
+        invalid: Union[Dict[str, str], None] = None,
+    ):
+        self.response_type: str = response_type
+        self.missing: List[str] = missing or []
+        self.invalid: Dict[str, str] = invalid or {}
+
+        problems = []
+        if self.missing:
+            problems.append("missing attributes: {}".format(", ".join(self.missing)))
+        if self.invalid:
+            problems.append(
+                "invalid attributes: {}".format(
+                    ", ".join(
+                        "{} ({})".format(attribute, reason)
+                        for attribute, reason in self.invalid.items()
+                    )
+                )
+            )
+        super().__init__(
+            "Unable to decode {}: {}".format(response_type, "; ".join(problems))
+        )
+
+
 class PowerwallUnreachableError(PowerwallError):
     def __init__(self, reason: Union[str, None] = None):
         msg = "Powerwall is unreachable"
@@ -41,6 +69,13 @@ class PowerwallUnreachableError(PowerwallError):
         super().__init__(msg)
 
 
+class RequestTimeoutError(PowerwallUnreachableError, TimeoutError):
+    def __init__(self, path: str, timeout: float):
+        self.path: str = path
+        self.timeout: float = timeout
+        super().__init__("request to {} timed out after {:.3g} s".format(path, timeout))
+
+
 class AccessDeniedError(PowerwallError):
     def __init__(
         self,
@@ -68,3 +103,46 @@ class MeterNotAvailableError(PowerwallError):
             "Meter {} is not available at your powerwall. \
              Following meters are available: {} ".format(meter.value, available_meters)
         )
+
+
+class SnapshotDecodeError(PowerwallError):
+    def __init__(self, reason: str):
+        super().__init__("Unable to decode snapshot: {}".format(reason))
+
+
+class ResponseTooLargeError(ApiError):
+    def __init__(self, max_size: int):
+        self.max_size: int = max_size
+        super().__init__(
+            "The response exceeds the maximum size of {} bytes".format(max_size)
+        )
+
+
+class ApiStatusError(ApiError):
+    def __init__(
+        self,
+        status: int,
+        reason: Union[str, None] = None,
+        body: Union[str, None] = None,
+        body_size: Union[int, None] = None,
+        truncated: bool = False,
+    ):
+        self.status: int = status
+        self.reason: Union[str, None] = reason
+        # At most the configured number of bytes of the body
+        self.body: Union[str, None] = body
+        # Size of the whole body or None if it is unknown
+        self.body_size: Union[int, None] = body_size
+        self.truncated: bool = truncated
+
+        if body:
+            msg = "API returned status code '{}: {}' with body: {}".format(
+                status, reason, body
+            )
+            if truncated:
+                msg += " [truncated, {} bytes]".format(
+                    "unknown number of" if body_size is None else body_size
+                )
+        else:
+            msg = "API returned status code '{}: {}' ".format(status, reason)
+        super().__init__(msg)
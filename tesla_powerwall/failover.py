@@ -0,0 +1,292 @@
+"""
+Failover between several addresses of one gateway.
+
+A gateway is often reachable at more than one address, e.g. at its LAN
+address and at 192.168.91.1 on its own network. `FailoverAPI` keeps an
+`API` per address, each with its own session and therefore its own cookies,
+and routes every request to the address which answered the last probe of
+the unauthenticated `status` endpoint the fastest. An address whose probe
+fails for any reason, e.g. an error status of a proxy in front of it, is
+marked as failed. If a request fails with a PowerwallUnreachableError, the
+address is marked as failed as well and the request is sent to the next
+address. Failed addresses are tried last until a probe succeeds again.
+
+    api = FailoverAPI(["192.168.1.20", "192.168.91.1"])
+    powerwall = Powerwall(["192.168.1.20", "192.168.91.1"])
+"""
+
+import asyncio
+import contextvars
+import copy
+import time
+from types import TracebackType
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type, Union
+
+import aiohttp
+from yarl import URL
+
+from .api import API
+from .download import (
+    DEFAULT_CHUNK_SIZE,
+    Destination,
+    DownloadResult,
+    ProgressCallback,
+)
+from .error import (
+    ApiError,
+    PowerwallError,
+    PowerwallUnreachableError,
+    RequestTimeoutError,
+)
+from .timeouts import TimeoutPolicy, deadline, remaining
+
+DEFAULT_PROBE_INTERVAL = 60.0
+DEFAULT_PROBE_TIMEOUT = 2.0
+
+
+class _Address:
+    def __init__(self, endpoint: str, api: API) -> None:
+        self.endpoint = endpoint
+        self.api = api
+        # Latency of the last successful probe in seconds
+        self.latency: Optional[float] = None
+        # Monotonic time of the last failure, None while healthy
+        self.failed_at: Optional[float] = None
+
+    def rank(self) -> Tuple[bool, float]:
+        # Healthy addresses by latency, then failed addresses by the time
+        # of their failure, so that the oldest failure is retried first
+        if self.failed_at is None:
+            latency = self.latency
+            return False, latency if latency is not None else float("inf")
+        return True, self.failed_at
+
+
+def _retrieve_exception(task: "asyncio.Future[Any]") -> None:
+    # Marks the exception as retrieved, which is otherwise logged when the
+    # task is garbage collected
+    if not task.cancelled():
+        task.exception()
+
+
+class FailoverAPI(API):
+    """
+    API which sends each request to the fastest healthy one of several
+    addresses of the same gateway, see `tesla_powerwall.failover`.
+
+    The addresses are probed before the first request and again in the
+    background every probe_interval seconds. The arguments of API apply to
+    every address. Each address uses a copy of the timeout policies, so an
+    AdaptiveTimeout tracks the latencies of each address separately. There
+    is no http_session argument, because each address needs its own session
+    to keep its own cookies.
+
+    After login, the credentials are kept to log in at the other addresses
+    once requests are routed to them. POST requests are only sent to the
+    next address if the gateway could not be reached, not if they timed out
+    after they may have been received.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[str],
+        timeout: Optional[Union[float, TimeoutPolicy]] = 10,
+        verify_ssl: bool = False,
+        endpoint_timeouts: Optional[
+            Dict[str, Optional[Union[float, TimeoutPolicy]]]
+        ] = None,
+        probe_interval: float = DEFAULT_PROBE_INTERVAL,
+        probe_timeout: float = DEFAULT_PROBE_TIMEOUT,
+        **kwargs: Any,
+    ) -> None:
+        if isinstance(endpoints, str) or not endpoints:
+            raise ValueError("endpoints must be a non-empty sequence of addresses")
+        self._addresses = [
+            _Address(
+                endpoint,
+                API(
+                    endpoint,
+                    timeout=copy.deepcopy(timeout),
+                    verify_ssl=verify_ssl,
+                    endpoint_timeouts=copy.deepcopy(endpoint_timeouts),
+                    **kwargs,
+                ),
+            )
+            for endpoint in endpoints
+        ]
+        # Requests are sent by the API of the selected address. The state of
+        # the base class is the one of the first address, so that methods of
+        # API which are not routed still find everything they expect.
+        super().__init__(
+            endpoints[0],
+            timeout=timeout,
+            http_session=self._addresses[0].api._http_session,
+            verify_ssl=verify_ssl,
+            endpoint_timeouts=endpoint_timeouts,
+            **kwargs,
+        )
+        self._probe_interval = probe_interval
+        self._probe_timeout = probe_timeout
+        self._probed_at: Optional[float] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        # (username, email, password, force_sm_off) of the last login
+        self._credentials: Optional[Tuple[str, str, str, bool]] = None
+
+    @property
+    def endpoints(self) -> List[str]:
+        return [address.endpoint for address in self._addresses]
+
+    def latencies(self) -> Dict[str, Optional[float]]:
+        """Returns the latency of the last probe of each address in seconds"""
+        return {address.endpoint: address.latency for address in self._addresses}
+
+    async def _probe(self, address: _Address) -> None:
+        start = time.monotonic()
+        try:
+            with deadline(self._probe_timeout):
+                await address.api.get("status")
+        except (PowerwallError, aiohttp.ClientError):
+            # Not only unreachable addresses fail, e.g. a proxy in front of
+            # the gateway might answer with an error status
+            address.latency = None
+            address.failed_at = time.monotonic()
+        else:
+            address.latency = time.monotonic() - start
+            address.failed_at = None
+
+    async def probe(self) -> Dict[str, Optional[float]]:
+        """
+        Measures the latency of every address concurrently and returns the
+        latencies, which are None for unreachable addresses
+        """
+        await asyncio.gather(*[self._probe(address) for address in self._addresses])
+        self._probed_at = time.monotonic()
+        return self.latencies()
+
+    async def _ranked(self) -> List[_Address]:
+        if (
+            self._probed_at is None
+            or time.monotonic() - self._probed_at >= self._probe_interval
+        ):
+            if self._probe_task is None or self._probe_task.done():
+                # Created in an empty context, so the probe is not limited by
+                # the deadline of the request which happens to start it
+                self._probe_task = contextvars.Context().run(
+                    asyncio.ensure_future, self.probe()
+                )
+                # A background probe is not awaited by anyone
+                self._probe_task.add_done_callback(_retrieve_exception)
+            if self._probed_at is None:
+                # Nothing is known about the addresses before the first probe.
+                # Shielded so that cancelling one request does not cancel the
+                # probe awaited by concurrent requests.
+                await asyncio.shield(self._probe_task)
+        return sorted(self._addresses, key=_Address.rank)
+
+    def _current(self) -> _Address:
+        return min(self._addresses, key=_Address.rank)
+
+    async def _request(self, method: str, path: str, **kwargs: Any) -> Any:
+        error: Optional[PowerwallUnreachableError] = None
+        for address in await self._ranked():
+            try:
+                if self._credentials and not address.api.is_authenticated():
+                    await address.api.login(*self._credentials)
+                result = await address.api._request(method, path, **kwargs)
+            except PowerwallUnreachableError as e:
+                left = remaining()
+                if left is not None and left <= 0:
+                    # The deadline is over, which is not the fault of the address
+                    raise
+                address.failed_at = time.monotonic()
+                if method != "GET" and isinstance(e, RequestTimeoutError):
+                    raise
+                error = e
+                continue
+            address.failed_at = None
+            return result
+        assert error is not None
+        raise error
+
+    def url(self, path: str) -> URL:
+        return self._current().api.url(path)
+
+    def timeout_policy(self, path: str) -> TimeoutPolicy:
+        return self._current().api.timeout_policy(path)
+
+    async def download(
+        self,
+        path: str,
+        destination: Destination,
+        compression: Optional[str] = None,
+        max_size: Optional[int] = None,
+        resume: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        progress: Optional[ProgressCallback] = None,
+    ) -> DownloadResult:
+        """
+        Downloads from the fastest healthy address, see `API.download`. A
+        failed download is not repeated at another address, but the address
+        is marked as failed, so it can be resumed at the next address.
+        """
+        address = (await self._ranked())[0]
+        try:
+            return await address.api.download(
+                path,
+                destination,
+                compression=compression,
+                max_size=max_size,
+                resume=resume,
+                chunk_size=chunk_size,
+                progress=progress,
+            )
+        except PowerwallUnreachableError:
+            address.failed_at = time.monotonic()
+            raise
+
+    def is_authenticated(self) -> bool:
+        return any(address.api.is_authenticated() for address in self._addresses)
+
+    async def login(
+        self,
+        username: str,
+        email: str,
+        password: str,
+        force_sm_off: bool = False,
+    ) -> dict:
+        # Addresses only log in once requests are routed to them, so the
+        # credentials of a previous login must not be used for this one
+        self._credentials = None
+        response = await super().login(username, email, password, force_sm_off)
+        self._credentials = (username, email, password, force_sm_off)
+        return response
+
+    async def logout(self) -> None:
+        authenticated = [
+            address.api for address in self._addresses if address.api.is_authenticated()
+        ]
+        if not authenticated:
+            raise ApiError("Must be logged in to log out")
+        self._credentials = None
+        results = await asyncio.gather(
+            *[api.logout() for api in authenticated], return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def close(self) -> None:
+        if self._probe_task is not None and not self._probe_task.done():
+            self._probe_task.cancel()
+        await asyncio.gather(*[address.api.close() for address in self._addresses])
+
+    async def __aenter__(self) -> "FailoverAPI":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        await self.close()
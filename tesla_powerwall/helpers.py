@@ -1,7 +1,24 @@
-from typing import Union
+from array import array
+from typing import Any, Iterable, NamedTuple, Sequence, Union
 
+from .const import DEFAULT_KW_ROUND_PERSICION, MeterType
 from .error import MissingAttributeError
 
+# numpy is imported on first use instead of at import time, because helpers
+# is imported together with Powerwall. None if numpy is not installed.
+_np: Any = ...
+
+
+def _numpy() -> Any:
+    global _np
+    if _np is ...:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None  # type: ignore[assignment]
+        _np = numpy
+    return _np
+
 
 def convert_to_kw(value: float, precision: int = 1) -> float:
     """Converts watt to kilowatt and rounds to precision"""
@@ -12,6 +29,107 @@ def convert_to_kw(value: float, precision: int = 1) -> float:
         return round(value / 1000, precision)
 
 
+def convert_to_kw_many(values: Iterable[float], precision: int = 1) -> array:
+    """
+    Converts many watt values to kilowatt like `convert_to_kw`. If numpy is
+    installed, the values are converted as one array.
+    """
+    np = _numpy()
+    if np is not None:
+        result = array("d")
+        result.frombytes(_convert_to_kw_numpy(np, values, precision).tobytes())
+        return result
+    if precision == -1:
+        return array("d", [value / 1000 for value in values])
+    return array("d", [round(value / 1000, precision) for value in values])
+
+
+def _convert_to_kw_numpy(np: Any, values: Iterable[float], precision: int) -> Any:
+    if not isinstance(values, Sequence) and not isinstance(values, np.ndarray):
+        values = list(values)
+    kilowatt = np.asarray(values, dtype=np.float64) / 1000
+    if precision == -1:
+        return kilowatt
+    rounded = np.round(kilowatt, precision)
+    # np.round scales the value before rounding, which rounds values close to
+    # a tie differently than round does with their exact decimal value
+    scaled = np.abs(kilowatt) * 10**precision
+    ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for index in ties.tolist():
+        rounded[index] = round(float(kilowatt[index]), precision)
+    return rounded
+
+
+class PowerFlows(NamedTuple):
+    # Power in kW, rounded to the requested precision
+    power: array
+    # Masks with one byte per meter matching the methods of MeterResponse
+    active: bytearray
+    drawing_from: bytearray
+    sending_to: bytearray
+
+
+def classify_power_flows(
+    instant_power: Iterable[float],
+    meters: Union[MeterType, Sequence[MeterType]],
+    precision: int = DEFAULT_KW_ROUND_PERSICION,
+) -> PowerFlows:
+    """
+    Classifies the power flow of many meters at once.
+
+    The result matches `MeterResponse.get_power`, `is_active`,
+    `is_drawing_from` and `is_sending_to` for every meter, but each value is
+    converted and rounded only once. meters is either the type of every meter
+    or a single MeterType shared by all of them.
+    """
+    np = _numpy()
+    if np is not None:
+        return _classify_power_flows_numpy(np, instant_power, meters, precision)
+
+    power = convert_to_kw_many(instant_power, precision)
+    if isinstance(meters, MeterType):
+        meters = [meters] * len(power)
+    elif len(meters) != len(power):
+        raise ValueError("instant_power and meters must have the same length")
+
+    load = [meter is MeterType.LOAD for meter in meters]
+    return PowerFlows(
+        power,
+        bytearray([value != 0 for value in power]),
+        bytearray([value > 0 and not is_load for value, is_load in zip(power, load)]),
+        bytearray(
+            [value > 0 if is_load else value < 0 for value, is_load in zip(power, load)]
+        ),
+    )
+
+
+def _classify_power_flows_numpy(
+    np: Any,
+    instant_power: Iterable[float],
+    meters: Union[MeterType, Sequence[MeterType]],
+    precision: int,
+) -> PowerFlows:
+    power = _convert_to_kw_numpy(np, instant_power, precision)
+    if isinstance(meters, MeterType):
+        load: Any = np.bool_(meters is MeterType.LOAD)
+    elif len(meters) != len(power):
+        raise ValueError("instant_power and meters must have the same length")
+    else:
+        load = np.fromiter(
+            (meter is MeterType.LOAD for meter in meters), dtype=bool, count=len(power)
+        )
+
+    positive = power > 0
+    result = array("d")
+    result.frombytes(power.tobytes())
+    return PowerFlows(
+        result,
+        bytearray((power != 0).tobytes()),
+        bytearray((positive & ~load).tobytes()),
+        bytearray(np.where(load, positive, power < 0).tobytes()),
+    )
+
+
 def assert_attribute(response: dict, attr: str, url: Union[str, None] = None):
     value = response.get(attr)
     if value is None:
@@ -0,0 +1,188 @@
+import math
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .const import MeterType
+from .responses import MetersAggregatesResponse
+
+METER_HISTORY_FIELDS = (
+    "instant_power",
+    "frequency",
+    "instant_average_voltage",
+    "energy_imported",
+    "energy_exported",
+)
+
+DEFAULT_HISTORY_METERS = (
+    MeterType.SITE,
+    MeterType.SOLAR,
+    MeterType.BATTERY,
+    MeterType.LOAD,
+)
+
+
+class MeterHistory:
+    """
+    Fixed-capacity ring buffer of meter readings, as returned by
+    `Powerwall.get_meters()`.
+
+    Every field of every meter is stored in its own typed `array`, next to a
+    column of timestamps. Once the buffer is full the oldest sample is
+    overwritten. Values of meters missing from a sample are stored as NaN.
+
+    Timestamps are expected to be non-decreasing, which allows time range
+    queries to use a binary search.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        meters: Iterable[MeterType] = DEFAULT_HISTORY_METERS,
+        typecode: str = "d",
+    ) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if typecode not in ("d", "f"):
+            raise ValueError("typecode must be either 'd' or 'f'")
+
+        self._capacity = capacity
+        # Index of the oldest sample and number of samples stored
+        self._start = 0
+        self._size = 0
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._columns: Dict[MeterType, Dict[str, array]] = {
+            meter: {
+                field: array(typecode, [math.nan]) * capacity
+                for field in METER_HISTORY_FIELDS
+            }
+            for meter in meters
+        }
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def meters(self) -> List[MeterType]:
+        return list(self._columns.keys())
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(
+        self, meters: MetersAggregatesResponse, timestamp: Optional[float] = None
+    ) -> None:
+        """Adds a sample; timestamp defaults to the current time"""
+        if timestamp is None:
+            timestamp = time.time()
+        if self._size > 0 and timestamp < self._timestamps[self._physical(-1)]:
+            raise ValueError("Samples must be appended in chronological order")
+
+        index = (self._start + self._size) % self._capacity
+        if self._size == self._capacity:
+            self._start = (self._start + 1) % self._capacity
+        else:
+            self._size += 1
+
+        self._timestamps[index] = timestamp
+        for meter, columns in self._columns.items():
+            response = meters.meters.get(meter)
+            for field, column in columns.items():
+                column[index] = (
+                    math.nan if response is None else getattr(response, field)
+                )
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
+
+    def _physical(self, logical: int) -> int:
+        if logical < 0:
+            logical += self._size
+        return (self._start + logical) % self._capacity
+
+    def _column(self, meter: MeterType, field: str) -> array:
+        try:
+            columns = self._columns[meter]
+        except KeyError:
+            raise KeyError("Meter {} is not recorded".format(meter.value)) from None
+        try:
+            return columns[field]
+        except KeyError:
+            raise KeyError("Field {} is not recorded".format(field)) from None
+
+    def _segments(self, start: int, stop: int) -> Tuple[slice, ...]:
+        # Physical slices of the columns covering the logical range [start, stop)
+        if start >= stop:
+            return ()
+        first = self._physical(start)
+        last = first + (stop - start)
+        if last <= self._capacity:
+            return (slice(first, last),)
+        return (slice(first, self._capacity), slice(0, last - self._capacity))
+
+    def _copy(self, column: array, start: int, stop: int) -> array:
+        result = array(column.typecode)
+        for segment in self._segments(start, stop):
+            result.extend(column[segment])
+        return result
+
+    def _bisect(self, timestamp: float) -> int:
+        # Logical index of the first sample with a timestamp >= timestamp
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if self._timestamps[self._physical(middle)] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def timestamps(self) -> array:
+        """Returns a copy of all timestamps from oldest to newest"""
+        return self._copy(self._timestamps, 0, self._size)
+
+    def values(self, meter: MeterType, field: str) -> array:
+        """Returns a copy of all values of field from oldest to newest"""
+        return self._copy(self._column(meter, field), 0, self._size)
+
+    def last(self, n: int, meter: MeterType, field: str) -> Tuple[array, array]:
+        """Returns the timestamps and values of the newest n samples"""
+        start = max(self._size - n, 0)
+        return (
+            self._copy(self._timestamps, start, self._size),
+            self._copy(self._column(meter, field), start, self._size),
+        )
+
+    def between(
+        self, start: float, end: float, meter: MeterType, field: str
+    ) -> Tuple[array, array]:
+        """Returns the timestamps and values of all samples in [start, end)"""
+        first = self._bisect(start)
+        stop = self._bisect(end)
+        return (
+            self._copy(self._timestamps, first, stop),
+            self._copy(self._column(meter, field), first, stop),
+        )
+
+    def views(
+        self, meter: Optional[MeterType] = None, field: Optional[str] = None
+    ) -> Tuple[memoryview, ...]:
+        """
+        Returns zero-copy views of the stored samples from oldest to newest.
+
+        As the samples wrap around the end of the buffer, the result consists of
+        up to two memoryviews which have to be read in order. Without a meter
+        and field, views of the timestamps are returned. The views are only
+        valid until the next call to `append`.
+        """
+        if meter is None:
+            column = self._timestamps
+        elif field is None:
+            raise ValueError("field is required if a meter is given")
+        else:
+            column = self._column(meter, field)
+
+        view = memoryview(column)
+        return tuple(view[segment] for segment in self._segments(0, self._size))
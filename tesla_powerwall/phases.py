@@ -0,0 +1,232 @@
+"""
+Per-phase analytics of three-phase meters.
+
+`MeterDetailsReadings` (as returned by `Powerwall.get_meter_site()` and
+`Powerwall.get_meter_solar()`) exposes the real power, current and voltage of
+each phase as separate optional attributes. `PhaseReadings` packs them into a
+single array with a mask of the present values and `PhaseMonitor` derives the
+phase imbalance, apparent power and voltage deviation of every sample and
+keeps rolling aggregates of them.
+"""
+
+import math
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from .const import MeterType
+from .responses import MeterDetailsReadings, MeterDetailsResponse
+from .rollups import RollingWindow
+
+# Attributes of MeterDetailsReadings in the order of PhaseReadings.values
+PHASE_ATTRIBUTES = (
+    "real_power_a",
+    "real_power_b",
+    "real_power_c",
+    "i_a_current",
+    "i_b_current",
+    "i_c_current",
+    "v_l1n",
+    "v_l2n",
+    "v_l3n",
+)
+
+PHASE_METRICS = (
+    "power_imbalance",
+    "current_imbalance",
+    "voltage_imbalance",
+    "apparent_power",
+    "voltage_deviation",
+)
+
+DEFAULT_NOMINAL_VOLTAGE = 230.0
+# Phases with a lower voltage are considered not connected
+DEFAULT_MIN_VOLTAGE = 10.0
+
+
+class PhaseReadings:
+    """
+    Real power, current and voltage of all three phases.
+
+    The values are stored in one array of nine doubles (real power a-c,
+    current a-c, voltage a-c), missing values as NaN with their mask unset.
+    """
+
+    __slots__ = ("values", "mask")
+
+    def __init__(self, values: array, mask: bytearray) -> None:
+        self.values = values
+        self.mask = mask
+
+    @staticmethod
+    def from_readings(readings: MeterDetailsReadings) -> "PhaseReadings":
+        values = array("d", bytes(8 * len(PHASE_ATTRIBUTES)))
+        mask = bytearray(len(PHASE_ATTRIBUTES))
+        for index, attribute in enumerate(PHASE_ATTRIBUTES):
+            value = getattr(readings, attribute)
+            if value is None:
+                values[index] = math.nan
+            else:
+                values[index] = value
+                mask[index] = 1
+        return PhaseReadings(values, mask)
+
+    @property
+    def real_power(self) -> array:
+        return self.values[0:3]
+
+    @property
+    def current(self) -> array:
+        return self.values[3:6]
+
+    @property
+    def voltage(self) -> array:
+        return self.values[6:9]
+
+    def __repr__(self) -> str:
+        return "PhaseReadings(real_power={}, current={}, voltage={})".format(
+            list(self.real_power), list(self.current), list(self.voltage)
+        )
+
+
+class PhaseMetrics(NamedTuple):
+    # Maximum deviation from the mean of the phases in percent of the mean
+    power_imbalance: float
+    current_imbalance: float
+    voltage_imbalance: float
+    # Sum of voltage times current of all phases in VA
+    apparent_power: float
+    # Maximum deviation of a phase voltage from the nominal voltage in percent
+    voltage_deviation: float
+
+
+def imbalance(values: Sequence[float]) -> float:
+    """
+    Maximum deviation of values from their mean in percent of the mean
+    (NEMA definition). NaN if less than two values are given or the mean is 0.
+    """
+    if len(values) < 2:
+        return math.nan
+    mean = math.fsum(values) / len(values)
+    if mean == 0:
+        return math.nan
+    return max(abs(value - mean) for value in values) / abs(mean) * 100
+
+
+def phase_metrics(
+    readings: PhaseReadings,
+    nominal_voltage: float = DEFAULT_NOMINAL_VOLTAGE,
+    min_voltage: float = DEFAULT_MIN_VOLTAGE,
+) -> PhaseMetrics:
+    """Computes the metrics of the connected phases of a single sample"""
+    values = readings.values
+    mask = readings.mask
+    connected = [
+        phase
+        for phase in range(3)
+        if mask[6 + phase] and values[6 + phase] >= min_voltage
+    ]
+
+    power = [abs(values[phase]) for phase in connected if mask[phase]]
+    current = [abs(values[3 + phase]) for phase in connected if mask[3 + phase]]
+    voltage = [values[6 + phase] for phase in connected]
+    apparent = [
+        values[6 + phase] * abs(values[3 + phase])
+        for phase in connected
+        if mask[3 + phase]
+    ]
+
+    return PhaseMetrics(
+        power_imbalance=imbalance(power),
+        current_imbalance=imbalance(current),
+        voltage_imbalance=imbalance(voltage),
+        apparent_power=math.fsum(apparent) if apparent else math.nan,
+        voltage_deviation=max(
+            (abs(value - nominal_voltage) / nominal_voltage * 100 for value in voltage),
+            default=math.nan,
+        ),
+    )
+
+
+class PhaseMonitor:
+    """
+    Computes the PhaseMetrics of every sample of one meter and keeps a rolling
+    window of `window` seconds for each metric. Samples must be added in
+    chronological order. NaN metrics are not added to the windows.
+    """
+
+    def __init__(
+        self,
+        window: float = 60.0,
+        nominal_voltage: float = DEFAULT_NOMINAL_VOLTAGE,
+        min_voltage: float = DEFAULT_MIN_VOLTAGE,
+        relative_accuracy: float = 0.01,
+    ) -> None:
+        self.nominal_voltage = nominal_voltage
+        self.min_voltage = min_voltage
+        self.last: Optional[PhaseMetrics] = None
+        self._windows: Dict[str, RollingWindow] = {
+            metric: RollingWindow(window, relative_accuracy) for metric in PHASE_METRICS
+        }
+
+    def add(self, readings: MeterDetailsReadings, timestamp: float) -> PhaseMetrics:
+        metrics = phase_metrics(
+            PhaseReadings.from_readings(readings),
+            self.nominal_voltage,
+            self.min_voltage,
+        )
+        for metric, value in zip(PHASE_METRICS, metrics):
+            window = self._windows[metric]
+            if math.isnan(value):
+                window.expire(timestamp)
+            else:
+                window.add(timestamp, value)
+        self.last = metrics
+        return metrics
+
+    def window(self, metric: str, now: Optional[float] = None) -> RollingWindow:
+        """Returns the rolling window of metric, expiring samples relative to now"""
+        try:
+            window = self._windows[metric]
+        except KeyError:
+            raise KeyError("Metric {} is not computed".format(metric)) from None
+        if now is not None:
+            window.expire(now)
+        return window
+
+
+class PhaseAnalytics:
+    """
+    Runs a PhaseMonitor for every meter location of the MeterDetailsResponses
+    returned by `Powerwall.get_meter_site()` and `Powerwall.get_meter_solar()`.
+    """
+
+    def __init__(
+        self,
+        window: float = 60.0,
+        nominal_voltage: float = DEFAULT_NOMINAL_VOLTAGE,
+        min_voltage: float = DEFAULT_MIN_VOLTAGE,
+        relative_accuracy: float = 0.01,
+    ) -> None:
+        self._window = window
+        self._nominal_voltage = nominal_voltage
+        self._min_voltage = min_voltage
+        self._relative_accuracy = relative_accuracy
+        self._monitors: Dict[MeterType, PhaseMonitor] = {}
+
+    @property
+    def locations(self) -> List[MeterType]:
+        return list(self._monitors.keys())
+
+    def monitor(self, location: MeterType) -> PhaseMonitor:
+        monitor = self._monitors.get(location)
+        if monitor is None:
+            monitor = self._monitors[location] = PhaseMonitor(
+                self._window,
+                self._nominal_voltage,
+                self._min_voltage,
+                self._relative_accuracy,
+            )
+        return monitor
+
+    def add(self, details: MeterDetailsResponse, timestamp: float) -> PhaseMetrics:
+        return self.monitor(details.location).add(details.readings, timestamp)
@@ -1,11 +1,15 @@
+import asyncio
+import time
+from contextlib import nullcontext
 from types import TracebackType
-from typing import List, Optional, Type, Union
+from typing import Dict, List, Optional, Sequence, Type, Union
 
 import aiohttp
 
 from .api import API
 from .const import DeviceType, GridStatus, IslandMode, OperationMode, User
 from .error import ApiError
+from .failover import FailoverAPI
 from .helpers import assert_attribute
 from .responses import (
     BatteryResponse,
@@ -16,23 +20,45 @@ from .responses import (
     SiteInfoResponse,
     SiteMasterResponse,
     SolarResponse,
+    SystemStatusResponse,
 )
+from .snapshot import TelemetrySnapshot
+from .timeouts import TimeoutPolicy, deadline
 
 
 class Powerwall:
     def __init__(
         self,
-        endpoint: str,
-        timeout: int = 10,
+        endpoint: Union[str, Sequence[str]],
+        timeout: Optional[Union[float, TimeoutPolicy]] = 10,
         http_session: Union[aiohttp.ClientSession, None] = None,
         verify_ssl: bool = False,
+        lazy_responses: bool = False,
+        endpoint_timeouts: Optional[
+            Dict[str, Optional[Union[float, TimeoutPolicy]]]
+        ] = None,
     ) -> None:
-        self._api = API(
-            endpoint=endpoint,
-            timeout=timeout,
-            http_session=http_session,
-            verify_ssl=verify_ssl,
-        )
+        # Lazy responses decode their fields on first access instead of
+        # validating the whole response up front
+        self._lazy_responses = lazy_responses
+        if isinstance(endpoint, str):
+            self._api = API(
+                endpoint=endpoint,
+                timeout=timeout,
+                http_session=http_session,
+                verify_ssl=verify_ssl,
+                endpoint_timeouts=endpoint_timeouts,
+            )
+        else:
+            # Several addresses of the same gateway, see FailoverAPI
+            if http_session is not None:
+                raise ValueError("http_session can not be used with several endpoints")
+            self._api = FailoverAPI(
+                endpoint,
+                timeout=timeout,
+                verify_ssl=verify_ssl,
+                endpoint_timeouts=endpoint_timeouts,
+            )
 
     async def login_as(
         self,
@@ -72,19 +98,32 @@ class Powerwall:
             await self._api.get_system_status_soe(), "percentage", "soe"
         )
 
-    async def get_energy(self) -> int:
-        return assert_attribute(
-            await self._api.get_system_status(),
-            "nominal_energy_remaining",
-            "system_status",
+    async def get_system_status(self) -> SystemStatusResponse:
+        """
+        Returns the system status, which can be passed to get_energy,
+        get_capacity and get_batteries to avoid fetching it for each of them.
+        """
+        return SystemStatusResponse.from_dict(
+            await self._api.get_system_status(), lazy=self._lazy_responses
         )
 
+    async def get_energy(
+        self, system_status: Optional[SystemStatusResponse] = None
+    ) -> int:
+        if system_status is None:
+            return assert_attribute(
+                await self._api.get_system_status(),
+                "nominal_energy_remaining",
+                "system_status",
+            )
+        return system_status.energy_remaining
+
     async def get_sitemaster(self) -> SiteMasterResponse:
         return SiteMasterResponse.from_dict(await self._api.get_sitemaster())
 
     async def get_meters(self) -> MetersAggregatesResponse:
         return MetersAggregatesResponse.from_dict(
-            await self._api.get_meters_aggregates()
+            await self._api.get_meters_aggregates(), lazy=self._lazy_responses
         )
 
     async def get_meter_site(self) -> MeterDetailsResponse:
@@ -92,14 +131,18 @@ class Powerwall:
         if meter_response is None or len(meter_response) == 0:
             raise ApiError("The powerwall returned no values for the site meter")
 
-        return MeterDetailsResponse.from_dict(meter_response[0])
+        return MeterDetailsResponse.from_dict(
+            meter_response[0], lazy=self._lazy_responses
+        )
 
     async def get_meter_solar(self) -> MeterDetailsResponse:
         meter_response = await self._api.get_meters_solar()
         if meter_response is None or len(meter_response) == 0:
             raise ApiError("The powerwall returned no values for the solar meter")
 
-        return MeterDetailsResponse.from_dict(meter_response[0])
+        return MeterDetailsResponse.from_dict(
+            meter_response[0], lazy=self._lazy_responses
+        )
 
     async def get_grid_status(self) -> GridStatus:
         """Returns the current grid status."""
@@ -111,18 +154,32 @@ class Powerwall:
 
         return GridStatus(status)
 
-    async def get_capacity(self) -> float:
-        return assert_attribute(
-            await self._api.get_system_status(),
-            "nominal_full_pack_energy",
-            "system_status",
-        )
-
-    async def get_batteries(self) -> List[BatteryResponse]:
-        batteries = assert_attribute(
-            await self._api.get_system_status(), "battery_blocks", "system_status"
-        )
-        return [BatteryResponse.from_dict(battery) for battery in batteries]
+    async def get_capacity(
+        self, system_status: Optional[SystemStatusResponse] = None
+    ) -> float:
+        if system_status is None:
+            return assert_attribute(
+                await self._api.get_system_status(),
+                "nominal_full_pack_energy",
+                "system_status",
+            )
+        return system_status.capacity
+
+    async def get_batteries(
+        self, system_status: Optional[SystemStatusResponse] = None
+    ) -> List[BatteryResponse]:
+        if system_status is None:
+            # Only the battery blocks are decoded, the rest of the system
+            # status is not needed
+            return [
+                BatteryResponse.from_dict(battery, lazy=self._lazy_responses)
+                for battery in assert_attribute(
+                    await self._api.get_system_status(),
+                    "battery_blocks",
+                    "system_status",
+                )
+            ]
+        return system_status.batteries
 
     async def is_grid_services_active(self) -> bool:
         return assert_attribute(
@@ -139,7 +196,9 @@ class Powerwall:
         return await self._api.post_site_info_site_name({"site_name": site_name})
 
     async def get_status(self) -> PowerwallStatusResponse:
-        return PowerwallStatusResponse.from_dict(await self._api.get_status())
+        return PowerwallStatusResponse.from_dict(
+            await self._api.get_status(), lazy=self._lazy_responses
+        )
 
     async def get_device_type(self) -> DeviceType:
         """Returns the device type of the powerwall"""
@@ -187,6 +246,35 @@ class Powerwall:
             )
         )
 
+    async def get_snapshot(self, timeout: Optional[float] = None) -> TelemetrySnapshot:
+        """
+        Fetches meters, charge, grid status, batteries and operation mode.
+        All requests together must finish within timeout seconds if given.
+        """
+        timestamp = time.time()
+        with deadline(timeout) if timeout is not None else nullcontext():
+            (
+                meters,
+                soe,
+                grid_status,
+                batteries,
+                operation_mode,
+            ) = await asyncio.gather(
+                self.get_meters(),
+                self.get_charge(),
+                self.get_grid_status(),
+                self.get_batteries(),
+                self.get_operation_mode(),
+            )
+        return TelemetrySnapshot(
+            timestamp=timestamp,
+            meters=meters,
+            soe=soe,
+            grid_status=grid_status,
+            batteries=batteries,
+            operation_mode=operation_mode,
+        )
+
     async def get_version(self) -> str:
         version_str = assert_attribute(
             await self._api.get_status(), "version", "status"
@@ -1,29 +1,114 @@
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar
 
 from .const import (
     DEFAULT_KW_ROUND_PERSICION,
     DeviceType,
     GridState,
+    GridStatus,
     MeterType,
     Roles,
 )
-from .error import MeterNotAvailableError
+from .error import InvalidResponseError, MeterNotAvailableError
 from .helpers import convert_to_kw
+from .schema import (
+    Field,
+    Schema,
+    checked_field_decoder,
+    compile_decoder,
+    enum_table,
+)
+
+_METER_ATTRIBUTES = enum_table(MeterType)
 
 
 @dataclass
 class ResponseBase:
-    _raw: dict
+    # Responses are kept in large numbers when recording history, so every
+    # model declares __slots__ to avoid a per-instance __dict__.
+    __slots__ = ("_raw",)
+
+    # The raw response is only retained if requested with keep_raw=True
+    _raw: Optional[dict]
 
     def __repr__(self) -> str:
+        if self._raw is None:
+            return "{}({})".format(
+                type(self).__name__,
+                ", ".join(
+                    "{}={!r}".format(f.name, getattr(self, f.name))
+                    for f in fields(self)
+                    if f.name != "_raw"
+                ),
+            )
         return str(self._raw)
 
 
+class _LazyField:
+    """
+    Descriptor used by lazy responses: decodes a field from the raw response on
+    first access and caches the result in the slot of the field.
+    """
+
+    __slots__ = ("_slot", "_decode")
+
+    def __init__(self, slot: Any, decode: Callable[[dict], Any]) -> None:
+        self._slot = slot
+        self._decode = decode
+
+    def __get__(self, instance: Any, owner: Optional[type] = None) -> Any:
+        if instance is None:
+            return self
+        try:
+            return self._slot.__get__(instance, owner)
+        except AttributeError:
+            value = self._decode(instance._raw)
+            self._slot.__set__(instance, value)
+            return value
+
+    def __set__(self, instance: Any, value: Any) -> None:
+        self._slot.__set__(instance, value)
+
+
+_T = TypeVar("_T", bound=ResponseBase)
+
+
+def _lazy_class(cls: Type[_T], schema: Schema) -> Type[_T]:
+    """Creates a subclass of cls which decodes the fields of schema on first access"""
+    namespace: Dict[str, Any] = {"__slots__": ()}
+    for field in schema:
+        namespace[field.name] = _LazyField(
+            getattr(cls, field.name), checked_field_decoder(cls, field)
+        )
+    # Named like the module attribute it is assigned to, so that instances
+    # can be pickled
+    name = "_Lazy{}".format(cls.__name__)
+    namespace["__qualname__"] = name
+    return type(name, (cls,), namespace)
+
+
+def _new_lazy(lazy_cls: Type[_T], src: dict) -> _T:
+    # Bypass __init__ so that the lazily decoded slots stay unset
+    response = lazy_cls.__new__(lazy_cls)
+    response._raw = src
+    return response
+
+
 @dataclass
 class MeterResponse(ResponseBase):
+    __slots__ = (
+        "meter",
+        "instant_power",
+        "last_communication_time",
+        "frequency",
+        "energy_exported",
+        "energy_imported",
+        "instant_total_current",
+        "instant_average_voltage",
+    )
+
     meter: MeterType
     instant_power: float
     last_communication_time: str
@@ -34,18 +119,15 @@ class MeterResponse(ResponseBase):
     instant_average_voltage: float
 
     @staticmethod
-    def from_dict(meter: MeterType, src: dict) -> "MeterResponse":
-        return MeterResponse(
-            src,
-            meter=meter,
-            instant_power=src["instant_power"],
-            last_communication_time=src["last_communication_time"],
-            frequency=src["frequency"],
-            energy_exported=src["energy_exported"],
-            energy_imported=src["energy_imported"],
-            instant_total_current=src["instant_total_current"],
-            instant_average_voltage=src["instant_average_voltage"],
-        )
+    def from_dict(
+        meter: MeterType, src: dict, keep_raw: bool = True, lazy: bool = False
+    ) -> "MeterResponse":
+        if lazy:
+            lazy_response = _new_lazy(_LazyMeterResponse, src)
+            lazy_response.meter = meter
+            return lazy_response
+
+        return _decode_meter_response(meter, src, keep_raw)
 
     def get_energy_exported(self, precision=DEFAULT_KW_ROUND_PERSICION) -> float:
         return convert_to_kw(self.energy_exported, precision)
@@ -79,6 +161,18 @@ class MeterResponse(ResponseBase):
 
 @dataclass
 class MeterDetailsReadings(MeterResponse):
+    __slots__ = (
+        "real_power_a",
+        "real_power_b",
+        "real_power_c",
+        "i_a_current",
+        "i_b_current",
+        "i_c_current",
+        "v_l1n",
+        "v_l2n",
+        "v_l3n",
+    )
+
     real_power_a: Optional[float]
     real_power_b: Optional[float]
     real_power_c: Optional[float]
@@ -92,57 +186,119 @@ class MeterDetailsReadings(MeterResponse):
     v_l3n: Optional[float]
 
     @staticmethod
-    def from_dict(meter: MeterType, src: dict) -> "MeterDetailsReadings":
-        meter_response = MeterResponse.from_dict(meter, src)
-        return MeterDetailsReadings(
-            real_power_a=src.get("real_power_a"),
-            real_power_b=src.get("real_power_b"),
-            real_power_c=src.get("real_power_c"),
-            i_a_current=src.get("i_a_current"),
-            i_b_current=src.get("i_b_current"),
-            i_c_current=src.get("i_c_current"),
-            v_l1n=src.get("v_l1n"),
-            v_l2n=src.get("v_l2n"),
-            v_l3n=src.get("v_l3n"),
-            # Populate with the values from the base class
-            **meter_response.__dict__,
-        )
+    def from_dict(
+        meter: MeterType, src: dict, keep_raw: bool = True, lazy: bool = False
+    ) -> "MeterDetailsReadings":
+        if lazy:
+            lazy_readings = _new_lazy(_LazyMeterDetailsReadings, src)
+            lazy_readings.meter = meter
+            return lazy_readings
+
+        return _decode_meter_details_readings(meter, src, keep_raw)
+
+
+_METER_SCHEMA: Schema = (
+    Field("instant_power"),
+    Field("last_communication_time"),
+    Field("frequency"),
+    Field("energy_exported"),
+    Field("energy_imported"),
+    Field("instant_total_current"),
+    Field("instant_average_voltage"),
+)
+_METER_DETAILS_SCHEMA: Schema = _METER_SCHEMA + (
+    Field("real_power_a", optional=True),
+    Field("real_power_b", optional=True),
+    Field("real_power_c", optional=True),
+    Field("i_a_current", optional=True),
+    Field("i_b_current", optional=True),
+    Field("i_c_current", optional=True),
+    Field("v_l1n", optional=True),
+    Field("v_l2n", optional=True),
+    Field("v_l3n", optional=True),
+)
+_decode_meter_response = compile_decoder(
+    MeterResponse, _METER_SCHEMA, context=("meter",)
+)
+_decode_meter_details_readings = compile_decoder(
+    MeterDetailsReadings, _METER_DETAILS_SCHEMA, context=("meter",)
+)
+_LazyMeterResponse = _lazy_class(MeterResponse, _METER_SCHEMA)
+_LazyMeterDetailsReadings = _lazy_class(MeterDetailsReadings, _METER_DETAILS_SCHEMA)
+
+
+def _meter_type(key: Any, response_type: str) -> MeterType:
+    try:
+        return _METER_ATTRIBUTES[key]
+    except (KeyError, TypeError):
+        raise InvalidResponseError(
+            response_type, invalid={key: "not a valid MeterType"}
+        ) from None
 
 
 @dataclass
 class MeterDetailsResponse(ResponseBase):
+    __slots__ = ("location", "readings")
+
     location: MeterType
     readings: MeterDetailsReadings
 
     @staticmethod
-    def from_dict(src: dict) -> "MeterDetailsResponse":
-        location = MeterType(src["location"])
-        readings = MeterDetailsReadings.from_dict(location, src["Cached_readings"])
-        return MeterDetailsResponse(src, location=location, readings=readings)
+    def from_dict(
+        src: dict, keep_raw: bool = True, lazy: bool = False
+    ) -> "MeterDetailsResponse":
+        missing = [key for key in ("location", "Cached_readings") if key not in src]
+        if missing:
+            raise InvalidResponseError("MeterDetailsResponse", missing)
+
+        location = _meter_type(src["location"], "MeterDetailsResponse")
+        readings = MeterDetailsReadings.from_dict(
+            location, src["Cached_readings"], keep_raw, lazy
+        )
+        return MeterDetailsResponse(
+            src if keep_raw or lazy else None, location=location, readings=readings
+        )
 
 
 class MetersAggregatesResponse(ResponseBase):
+    # Every meter is exposed as an attribute named after its MeterType value
+    # (e.g. `meters.site`). The attributes are stored in slots which are only
+    # filled for the meters present in the response, so accessing a meter is a
+    # plain slot lookup and only a missing meter falls through to __getattr__.
+    __slots__ = ("meters",) + tuple(meter.value for meter in MeterType)
+
     @staticmethod
-    def from_dict(src: dict) -> "MetersAggregatesResponse":
-        meters = {
-            MeterType(key): MeterResponse.from_dict(MeterType(key), value)
-            for key, value in src.items()
-        }
-        return MetersAggregatesResponse(src, meters)
-
-    def __init__(self, response: dict, meters: Dict[MeterType, MeterResponse]) -> None:
+    def from_dict(
+        src: dict, keep_raw: bool = True, lazy: bool = False
+    ) -> "MetersAggregatesResponse":
+        meters = {}
+        for key, value in src.items():
+            meter = _meter_type(key, "MetersAggregatesResponse")
+            meters[meter] = MeterResponse.from_dict(meter, value, keep_raw, lazy)
+        return MetersAggregatesResponse(src if keep_raw or lazy else None, meters)
+
+    def __init__(
+        self, response: Optional[dict], meters: Dict[MeterType, MeterResponse]
+    ) -> None:
         self._raw = response
         self.meters = meters
-
-    def __getattribute__(self, attr) -> Any:
-        if attr.upper() in MeterType.__dict__:
-            m = MeterType(attr)
-            if m in self.meters:
-                return self.meters[m]
-            else:
-                raise MeterNotAvailableError(m, list(self.meters.keys()))
-        else:
-            return object.__getattribute__(self, attr)
+        for meter, meter_response in meters.items():
+            setattr(self, meter.value, meter_response)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # The meter slots are derived from `meters` and must not be pickled
+        # directly, as unset slots raise MeterNotAvailableError
+        return (MetersAggregatesResponse, (self._raw, self.meters))
+
+    def __getattr__(self, attr: str) -> Any:
+        # Only called if the regular lookup failed, i.e. the slot of a meter
+        # that is not available at this powerwall was never set
+        if attr in _METER_ATTRIBUTES:
+            meter = _METER_ATTRIBUTES[attr]
+            raise MeterNotAvailableError(meter, list(self.meters.keys()))
+        raise AttributeError(
+            "'{}' object has no attribute '{}'".format(type(self).__name__, attr)
+        )
 
     def get_meter(self, meter: MeterType) -> Optional[MeterResponse]:
         return self.meters.get(meter)
@@ -150,42 +306,76 @@ class MetersAggregatesResponse(ResponseBase):
 
 @dataclass
 class SiteMasterResponse(ResponseBase):
+    __slots__ = (
+        "status",
+        "is_running",
+        "is_connected_to_tesla",
+        "is_power_supply_mode",
+    )
+
     status: str
     is_running: bool
     is_connected_to_tesla: bool
     is_power_supply_mode: bool
 
     @staticmethod
-    def from_dict(src: dict) -> "SiteMasterResponse":
-        return SiteMasterResponse(
-            src,
-            status=src["status"],
-            is_running=src["running"],
-            is_connected_to_tesla=src["connected_to_tesla"],
-            is_power_supply_mode=src["power_supply_mode"],
-        )
+    def from_dict(src: dict, keep_raw: bool = True) -> "SiteMasterResponse":
+        return _decode_site_master_response(src, keep_raw)
+
+
+_decode_site_master_response = compile_decoder(
+    SiteMasterResponse,
+    (
+        Field("status"),
+        Field("is_running", "running"),
+        Field("is_connected_to_tesla", "connected_to_tesla"),
+        Field("is_power_supply_mode", "power_supply_mode"),
+    ),
+)
 
 
 @dataclass
 class SiteInfoResponse(ResponseBase):
+    __slots__ = (
+        "nominal_system_energy",
+        "nominal_system_power",
+        "site_name",
+        "timezone",
+    )
+
     nominal_system_energy: int
     nominal_system_power: int
     site_name: str
     timezone: str
 
     @staticmethod
-    def from_dict(src: dict) -> "SiteInfoResponse":
-        return SiteInfoResponse(
-            src,
-            nominal_system_energy=src["nominal_system_energy_kWh"],
-            nominal_system_power=src["nominal_system_power_kW"],
-            site_name=src["site_name"],
-            timezone=src["timezone"],
-        )
+    def from_dict(src: dict, keep_raw: bool = True) -> "SiteInfoResponse":
+        return _decode_site_info_response(src, keep_raw)
+
+
+_decode_site_info_response = compile_decoder(
+    SiteInfoResponse,
+    (
+        Field("nominal_system_energy", "nominal_system_energy_kWh"),
+        Field("nominal_system_power", "nominal_system_power_kW"),
+        Field("site_name"),
+        Field("timezone"),
+    ),
+)
 
 
 @dataclass
 class PowerwallStatusResponse(ResponseBase):
+    __slots__ = (
+        "start_time",
+        "up_time_seconds",
+        "version",
+        "device_type",
+        "commission_count",
+        "sync_type",
+        "git_hash",
+    )
+
     start_time: datetime
     up_time_seconds: timedelta
     version: str
@@ -215,27 +405,40 @@ class PowerwallStatusResponse(ResponseBase):
         return timedelta(**time_params)
 
     @staticmethod
-    def from_dict(src: dict) -> "PowerwallStatusResponse":
-        start_time = datetime.strptime(
-            src["start_time"], PowerwallStatusResponse._START_TIME_FORMAT
-        )
-        up_time_seconds = PowerwallStatusResponse._parse_uptime_seconds(
-            src["up_time_seconds"]
-        )
-        return PowerwallStatusResponse(
-            src,
-            start_time=start_time,
-            up_time_seconds=up_time_seconds,
-            version=src["version"],
-            device_type=DeviceType(src["device_type"]),
-            commission_count=src["commission_count"],
-            sync_type=src["sync_type"],
-            git_hash=src["git_hash"],
-        )
+    def _parse_start_time(start_time: str) -> datetime:
+        return datetime.strptime(start_time, PowerwallStatusResponse._START_TIME_FORMAT)
+
+    @staticmethod
+    def from_dict(
+        src: dict, keep_raw: bool = True, lazy: bool = False
+    ) -> "PowerwallStatusResponse":
+        if lazy:
+            return _new_lazy(_LazyPowerwallStatusResponse, src)
+
+        return _decode_powerwall_status_response(src, keep_raw)
+
+
+_POWERWALL_STATUS_SCHEMA: Schema = (
+    Field("start_time", parse=PowerwallStatusResponse._parse_start_time),
+    Field("up_time_seconds", parse=PowerwallStatusResponse._parse_uptime_seconds),
+    Field("version"),
+    Field("device_type", enum=DeviceType),
+    Field("commission_count"),
+    Field("sync_type"),
+    Field("git_hash"),
+)
+_decode_powerwall_status_response = compile_decoder(
+    PowerwallStatusResponse, _POWERWALL_STATUS_SCHEMA
+)
+_LazyPowerwallStatusResponse = _lazy_class(
+    PowerwallStatusResponse, _POWERWALL_STATUS_SCHEMA
+)
 
 
 @dataclass
 class LoginResponse(ResponseBase):
+    __slots__ = ("firstname", "lastname", "token", "roles", "login_time")
+
     firstname: str
     lastname: str
     token: str
@@ -243,31 +446,40 @@ class LoginResponse(ResponseBase):
     login_time: str
 
     @staticmethod
-    def from_dict(src: dict) -> "LoginResponse":
-        return LoginResponse(
-            src,
-            firstname=src["firstname"],
-            lastname=src["lastname"],
-            token=src["token"],
-            roles=[Roles(role) for role in src["roles"]],
-            login_time=src["loginTime"],
-        )
+    def from_dict(src: dict, keep_raw: bool = True) -> "LoginResponse":
+        return _decode_login_response(src, keep_raw)
+
+
+_ROLES = enum_table(Roles)
+_decode_login_response = compile_decoder(
+    LoginResponse,
+    (
+        Field("firstname"),
+        Field("lastname"),
+        Field("token"),
+        Field("roles", parse=lambda roles: [_ROLES[role] for role in roles]),
+        Field("login_time", "loginTime"),
+    ),
+)
 
 
 @dataclass
 class SolarResponse(ResponseBase):
+    __slots__ = ("brand", "model", "power_rating_watts")
+
     brand: str
     model: str
     power_rating_watts: int
 
     @staticmethod
-    def from_dict(src: dict) -> "SolarResponse":
-        return SolarResponse(
-            src,
-            brand=src["brand"],
-            model=src["model"],
-            power_rating_watts=src["power_rating_watts"],
-        )
+    def from_dict(src: dict, keep_raw: bool = True) -> "SolarResponse":
+        return _decode_solar_response(src, keep_raw)
+
+
+_decode_solar_response = compile_decoder(
+    SolarResponse,
+    (Field("brand"), Field("model"), Field("power_rating_watts")),
+)
 
 
 @dataclass
@@ -276,6 +488,23 @@ class BatteryResponse(ResponseBase):
     A battery pack as part of the system_status response.
     """
 
+    __slots__ = (
+        "part_number",
+        "serial_number",
+        "wobble_detected",
+        "energy_remaining",
+        "capacity",
+        "energy_charged",
+        "energy_discharged",
+        "p_out",
+        "q_out",
+        "v_out",
+        "f_out",
+        "i_out",
+        "grid_state",
+        "disabled_reasons",
+    )
+
     part_number: str
     serial_number: str
     wobble_detected: bool
@@ -293,31 +522,130 @@ class BatteryResponse(ResponseBase):
     disabled_reasons: List[str]
 
     @staticmethod
-    def from_dict(src: dict) -> "BatteryResponse":
+    def _parse_grid_state(src: dict) -> GridState:
         # Check if the battery is disabled. A battery is considered disabled if:
         # - there is at least one disabled reason present in the response,
         # - or the pinv_grid_state is empty
-        disabled_reasons = src["disabled_reasons"]
         raw_grid_state = src["pinv_grid_state"]
-        grid_state = (
-            GridState.DISABLED
-            if len(disabled_reasons) > 0 or len(raw_grid_state) == 0
-            else GridState(raw_grid_state)
-        )
-        return BatteryResponse(
-            src,
-            part_number=src["PackagePartNumber"],
-            serial_number=src["PackageSerialNumber"],
-            energy_charged=src["energy_charged"],
-            energy_discharged=src["energy_discharged"],
-            energy_remaining=src["nominal_energy_remaining"],
-            capacity=src["nominal_full_pack_energy"],
-            wobble_detected=src["wobble_detected"],
-            p_out=src["p_out"],
-            q_out=src["q_out"],
-            v_out=src["v_out"],
-            f_out=src["f_out"],
-            i_out=src["i_out"],
-            grid_state=grid_state,
-            disabled_reasons=disabled_reasons,
+        if len(src["disabled_reasons"]) > 0 or len(raw_grid_state) == 0:
+            return GridState.DISABLED
+        try:
+            return _GRID_STATES[raw_grid_state]
+        except KeyError:
+            raise ValueError(
+                "{!r} is not a valid GridState".format(raw_grid_state)
+            ) from None
+
+    @staticmethod
+    def from_dict(
+        src: dict, keep_raw: bool = True, lazy: bool = False
+    ) -> "BatteryResponse":
+        if lazy:
+            return _new_lazy(_LazyBatteryResponse, src)
+
+        return _decode_battery_response(src, keep_raw)
+
+
+_GRID_STATES = enum_table(GridState)
+_BATTERY_SCHEMA: Schema = (
+    Field("part_number", "PackagePartNumber"),
+    Field("serial_number", "PackageSerialNumber"),
+    Field("wobble_detected"),
+    Field("energy_remaining", "nominal_energy_remaining"),
+    Field("capacity", "nominal_full_pack_energy"),
+    Field("energy_charged"),
+    Field("energy_discharged"),
+    Field("p_out"),
+    Field("q_out"),
+    Field("v_out"),
+    Field("f_out"),
+    Field("i_out"),
+    Field(
+        "grid_state",
+        source=BatteryResponse._parse_grid_state,
+        requires=("pinv_grid_state", "disabled_reasons"),
+    ),
+    Field("disabled_reasons"),
+)
+_decode_battery_response = compile_decoder(BatteryResponse, _BATTERY_SCHEMA)
+_LazyBatteryResponse = _lazy_class(BatteryResponse, _BATTERY_SCHEMA)
+
+
+@dataclass
+class SystemStatusResponse(ResponseBase):
+    """
+    The system_status response, which covers the whole battery system
+    including every battery pack.
+    """
+
+    __slots__ = (
+        "energy_remaining",
+        "capacity",
+        "batteries",
+        "available_blocks",
+        "battery_target_power",
+        "max_charge_power",
+        "max_discharge_power",
+        "instantaneous_max_charge_power",
+        "instantaneous_max_discharge_power",
+        "system_island_state",
+    )
+
+    energy_remaining: int
+    capacity: int
+    batteries: List[BatteryResponse]
+    # The following values are not reported by every firmware and might be None
+    available_blocks: Optional[int]
+    battery_target_power: Optional[float]
+    max_charge_power: Optional[float]
+    max_discharge_power: Optional[float]
+    instantaneous_max_charge_power: Optional[float]
+    instantaneous_max_discharge_power: Optional[float]
+    system_island_state: Optional[GridStatus]
+
+    @staticmethod
+    def from_dict(
+        src: dict, keep_raw: bool = True, lazy: bool = False
+    ) -> "SystemStatusResponse":
+        if lazy:
+            return _new_lazy(_LazySystemStatusResponse, src)
+
+        return _decode_system_status_response(src, keep_raw)
+
+
+def _parse_battery_blocks(
+    battery_blocks: List[dict], keep_raw: bool
+) -> List[BatteryResponse]:
+    return [_decode_battery_response(block, keep_raw) for block in battery_blocks]
+
+
+_SYSTEM_STATUS_SCHEMA: Schema = (
+    Field("energy_remaining", "nominal_energy_remaining"),
+    Field("capacity", "nominal_full_pack_energy"),
+    Field("batteries", "battery_blocks", parse=_parse_battery_blocks, nested=True),
+    Field("available_blocks", optional=True),
+    Field("battery_target_power", optional=True),
+    Field("max_charge_power", optional=True),
+    Field("max_discharge_power", optional=True),
+    Field("instantaneous_max_charge_power", optional=True),
+    Field("instantaneous_max_discharge_power", optional=True),
+    Field("system_island_state", optional=True, enum=GridStatus),
+)
+_decode_system_status_response = compile_decoder(
+    SystemStatusResponse, _SYSTEM_STATUS_SCHEMA
+)
+# Lazy system status responses also decode their battery packs lazily
+_LazySystemStatusResponse = _lazy_class(
+    SystemStatusResponse,
+    tuple(
+        field._replace(
+            parse=lambda blocks: [
+                _new_lazy(_LazyBatteryResponse, block) for block in blocks
+            ],
+            nested=False,
         )
+        if field.name == "batteries"
+        else field
+        for field in _SYSTEM_STATUS_SCHEMA
+    ),
+)
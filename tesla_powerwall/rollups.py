@@ -0,0 +1,311 @@
+import math
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from .const import MeterType
+from .responses import MetersAggregatesResponse
+
+DEFAULT_ROLLUP_WIDTHS = (60.0, 900.0, 3600.0)
+
+DEFAULT_ROLLUP_METERS = (
+    MeterType.SITE,
+    MeterType.SOLAR,
+    MeterType.BATTERY,
+    MeterType.LOAD,
+)
+
+SOE_METRIC = "soe"
+
+
+class QuantileSketch:
+    """
+    Approximate quantiles with a bounded relative error (DDSketch).
+
+    Values are counted in logarithmically sized buckets, so adding and removing
+    a value are O(1) and the memory depends on the range of the values instead
+    of their number. Every quantile is within `relative_accuracy` of the exact
+    value.
+    """
+
+    __slots__ = ("_gamma", "_log_gamma", "_positive", "_negative", "_zero", "count")
+
+    # Values closer to zero than this are counted as zero
+    _MIN_VALUE = 1e-9
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self._zero = 0
+        self.count = 0
+
+    def _store(self, value: float) -> Tuple[Optional[Dict[int, int]], int]:
+        if value > self._MIN_VALUE:
+            return self._positive, math.ceil(math.log(value) / self._log_gamma)
+        if value < -self._MIN_VALUE:
+            return self._negative, math.ceil(math.log(-value) / self._log_gamma)
+        return None, 0
+
+    def add(self, value: float) -> None:
+        store, index = self._store(value)
+        if store is None:
+            self._zero += 1
+        else:
+            store[index] = store.get(index, 0) + 1
+        self.count += 1
+
+    def remove(self, value: float) -> None:
+        """Removes a value which was previously added"""
+        store, index = self._store(value)
+        if store is None:
+            self._zero -= 1
+        else:
+            remaining = store[index] - 1
+            if remaining:
+                store[index] = remaining
+            else:
+                del store[index]
+        self.count -= 1
+
+    def _value(self, index: int) -> float:
+        return 2 * self._gamma**index / (self._gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        """Returns the approximate q-quantile (0 <= q <= 1) or NaN if empty"""
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        if self.count == 0:
+            return math.nan
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self._negative, reverse=True):
+            seen += self._negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self._zero
+        if seen > rank:
+            return 0.0
+        for index in sorted(self._positive):
+            seen += self._positive[index]
+            if seen > rank:
+                return self._value(index)
+        return math.nan
+
+
+class Bucket:
+    """Aggregate of all samples within [start, start + width)"""
+
+    __slots__ = ("start", "width", "count", "total", "minimum", "maximum", "sketch")
+
+    def __init__(self, start: float, width: float, relative_accuracy: float) -> None:
+        self.start = start
+        self.width = width
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.nan
+        self.maximum = math.nan
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    @property
+    def end(self) -> float:
+        return self.start + self.width
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    def percentile(self, q: float) -> float:
+        return self.sketch.quantile(q / 100)
+
+    def add(self, value: float) -> None:
+        if self.count == 0:
+            self.minimum = self.maximum = value
+        elif value < self.minimum:
+            self.minimum = value
+        elif value > self.maximum:
+            self.maximum = value
+        self.count += 1
+        self.total += value
+        self.sketch.add(value)
+
+    def __repr__(self) -> str:
+        return "Bucket(start={}, count={}, mean={}, minimum={}, maximum={})".format(
+            self.start, self.count, self.mean, self.minimum, self.maximum
+        )
+
+
+class RollingWindow:
+    """
+    Aggregate over the samples of the last `duration` seconds.
+
+    Samples must be added in chronological order. Each update is amortized O(1):
+    the sum is kept as a running total, minimum and maximum are tracked with
+    monotonic queues and percentiles with a `QuantileSketch`.
+    """
+
+    def __init__(self, duration: float, relative_accuracy: float = 0.01) -> None:
+        if duration <= 0:
+            raise ValueError("duration must be positive")
+        self.duration = duration
+        self._samples: Deque[Tuple[float, float]] = deque()
+        self._minimums: Deque[Tuple[float, float]] = deque()
+        self._maximums: Deque[Tuple[float, float]] = deque()
+        self._total = 0.0
+        self._sketch = QuantileSketch(relative_accuracy)
+        # Newest timestamp seen by add or expire
+        self._now = -math.inf
+
+    def add(self, timestamp: float, value: float) -> None:
+        if timestamp < self._now:
+            raise ValueError("Samples must be added in chronological order")
+
+        self._samples.append((timestamp, value))
+        self._total += value
+        self._sketch.add(value)
+        while self._minimums and self._minimums[-1][1] >= value:
+            self._minimums.pop()
+        self._minimums.append((timestamp, value))
+        while self._maximums and self._maximums[-1][1] <= value:
+            self._maximums.pop()
+        self._maximums.append((timestamp, value))
+        self.expire(timestamp)
+
+    def expire(self, now: float) -> None:
+        """Drops all samples which are older than duration relative to now"""
+        self._now = max(self._now, now)
+        cutoff = self._now - self.duration
+        samples = self._samples
+        while samples and samples[0][0] <= cutoff:
+            _, value = samples.popleft()
+            self._total -= value
+            self._sketch.remove(value)
+        while self._minimums and self._minimums[0][0] <= cutoff:
+            self._minimums.popleft()
+        while self._maximums and self._maximums[0][0] <= cutoff:
+            self._maximums.popleft()
+        if not samples:
+            # Avoid accumulating floating point errors over time
+            self._total = 0.0
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    @property
+    def mean(self) -> float:
+        return self._total / len(self._samples) if self._samples else math.nan
+
+    @property
+    def minimum(self) -> float:
+        return self._minimums[0][1] if self._minimums else math.nan
+
+    @property
+    def maximum(self) -> float:
+        return self._maximums[0][1] if self._maximums else math.nan
+
+    def percentile(self, q: float) -> float:
+        return self._sketch.quantile(q / 100)
+
+
+class TumblingWindow:
+    """
+    Consecutive, non-overlapping buckets of `width` seconds aligned to
+    multiples of width. Only the newest `retention` buckets are kept.
+    """
+
+    def __init__(
+        self, width: float, retention: int = 24, relative_accuracy: float = 0.01
+    ) -> None:
+        if width <= 0:
+            raise ValueError("width must be positive")
+        self.width = width
+        self._relative_accuracy = relative_accuracy
+        self._buckets: Deque[Bucket] = deque(maxlen=retention)
+
+    def add(self, timestamp: float, value: float) -> None:
+        start = timestamp - timestamp % self.width
+        buckets = self._buckets
+        if not buckets or buckets[-1].start < start:
+            buckets.append(Bucket(start, self.width, self._relative_accuracy))
+        elif buckets[-1].start > start:
+            raise ValueError("Samples must be added in chronological order")
+        buckets[-1].add(value)
+
+    @property
+    def current(self) -> Optional[Bucket]:
+        return self._buckets[-1] if self._buckets else None
+
+    def buckets(self) -> List[Bucket]:
+        """Returns the retained buckets from oldest to newest"""
+        return list(self._buckets)
+
+
+class TelemetryRollups:
+    """
+    Incrementally maintained aggregates of the power of the meters and the SOE.
+
+    For every metric a rolling window and a series of tumbling buckets is kept
+    for each of `widths` (in seconds). Metrics are named after the value of
+    their MeterType (e.g. "site") or `SOE_METRIC` for the state of energy. All
+    aggregates can be queried at any time without rescanning samples.
+    """
+
+    def __init__(
+        self,
+        widths: Iterable[float] = DEFAULT_ROLLUP_WIDTHS,
+        meters: Iterable[MeterType] = DEFAULT_ROLLUP_METERS,
+        retention: int = 24,
+        relative_accuracy: float = 0.01,
+    ) -> None:
+        self._widths = tuple(widths)
+        self._meters = tuple(meters)
+        self._windows: Dict[str, Dict[float, RollingWindow]] = {}
+        self._tumbling: Dict[str, Dict[float, TumblingWindow]] = {}
+        for metric in [meter.value for meter in self._meters] + [SOE_METRIC]:
+            self._windows[metric] = {
+                width: RollingWindow(width, relative_accuracy) for width in self._widths
+            }
+            self._tumbling[metric] = {
+                width: TumblingWindow(width, retention, relative_accuracy)
+                for width in self._widths
+            }
+
+    @property
+    def metrics(self) -> List[str]:
+        return list(self._windows.keys())
+
+    def add(self, metric: str, timestamp: float, value: float) -> None:
+        try:
+            windows = self._windows[metric]
+        except KeyError:
+            raise KeyError("Metric {} is not aggregated".format(metric)) from None
+        for window in windows.values():
+            window.add(timestamp, value)
+        for tumbling in self._tumbling[metric].values():
+            tumbling.add(timestamp, value)
+
+    def add_meters(self, meters: MetersAggregatesResponse, timestamp: float) -> None:
+        """Adds the instant power of every aggregated meter present in meters"""
+        for meter in self._meters:
+            response = meters.meters.get(meter)
+            if response is not None:
+                self.add(meter.value, timestamp, response.instant_power)
+
+    def add_soe(self, percentage: float, timestamp: float) -> None:
+        self.add(SOE_METRIC, timestamp, percentage)
+
+    def window(
+        self, metric: str, width: float, now: Optional[float] = None
+    ) -> RollingWindow:
+        """Returns the rolling window, expiring samples relative to now if given"""
+        window = self._windows[metric][width]
+        if now is not None:
+            window.expire(now)
+        return window
+
+    def buckets(self, metric: str, width: float) -> List[Bucket]:
+        return self._tumbling[metric][width].buckets()
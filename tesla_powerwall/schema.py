@@ -0,0 +1,240 @@
+"""
+Declarative schemas for the response models.
+
+Every response model describes how its fields are read from the json response
+as a tuple of `Field`s. `compile_decoder` turns such a schema into a decoder
+function specialised for that model, which builds the model with a single
+constructor call. Enums are mapped through precomputed lookup tables instead of
+`Enum.__call__`.
+
+The compiled decoders only validate what is needed to build the model. If
+building the model fails, the response is checked field by field and all
+missing or invalid attributes are reported in one `InvalidResponseError`.
+"""
+
+from dataclasses import fields
+from enum import Enum
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Type
+
+from .error import InvalidResponseError
+
+
+class Field(NamedTuple):
+    # Name of the attribute of the response model
+    name: str
+    # Key in the json response, defaults to the name of the attribute
+    key: Optional[str] = None
+    # Optional attributes are None if they are missing or null in the response
+    optional: bool = False
+    # Map the value to a member of this enum. Values of optional attributes
+    # which are not in the enum, e.g. added by newer firmware, are None.
+    enum: Optional[Type[Enum]] = None
+    # Convert the value with this function
+    parse: Optional[Callable[..., Any]] = None
+    # Compute the value from the whole response instead of a single key
+    source: Optional[Callable[[dict], Any]] = None
+    # Keys of the response read by source
+    requires: Tuple[str, ...] = ()
+    # parse decodes nested responses and is called as parse(value, keep_raw)
+    nested: bool = False
+
+
+Schema = Tuple[Field, ...]
+
+_ENUM_TABLES: Dict[Type[Enum], Dict[Any, Any]] = {}
+
+
+def enum_table(enum: Type[Enum]) -> Dict[Any, Any]:
+    """Returns a mapping from the values of enum to its members"""
+    table = _ENUM_TABLES.get(enum)
+    if table is None:
+        table = _ENUM_TABLES[enum] = {member.value: member for member in enum}
+    return table
+
+
+def optional_member(table: Dict[Any, Any], value: Any) -> Any:
+    """Returns the enum member of value in table or None if there is none"""
+    try:
+        return table.get(value)
+    except TypeError:
+        # Unhashable values are not in the table either
+        return None
+
+
+def field_decoder(field: Field) -> Callable[[dict], Any]:
+    """Returns a function which decodes a single field from a response"""
+    if field.source is not None:
+        return field.source
+
+    key = field.key or field.name
+    enum = field.enum
+    table = enum_table(enum) if enum is not None else None
+    enum_name = enum.__name__ if enum is not None else None
+    parse = field.parse
+    if parse is not None and field.nested:
+        parse_nested = parse
+
+        def parse(value: Any) -> Any:
+            return parse_nested(value, True)
+
+    optional = field.optional
+
+    def decode(src: dict) -> Any:
+        value = src.get(key) if optional else src[key]
+        if value is None and optional:
+            return None
+        if table is not None and optional:
+            value = optional_member(table, value)
+            if value is None:
+                return None
+        elif table is not None:
+            try:
+                value = table[value]
+            except (KeyError, TypeError):
+                raise ValueError(
+                    "{!r} is not a valid {}".format(value, enum_name)
+                ) from None
+        if parse is not None:
+            value = parse(value)
+        return value
+
+    return decode
+
+
+def diagnose(cls: type, schema: Schema, src: Any) -> Optional[InvalidResponseError]:
+    """Checks every field of schema and collects all problems into one error"""
+    if not isinstance(src, dict):
+        return InvalidResponseError(
+            cls.__name__,
+            invalid={"": "expected an object, got {}".format(type(src).__name__)},
+        )
+
+    missing: List[str] = []
+    invalid: Dict[str, str] = {}
+    for field in schema:
+        if field.source is None:
+            key = field.key or field.name
+            if key not in src:
+                # May already be missing for a field with a source
+                if not field.optional and key not in missing:
+                    missing.append(key)
+                continue
+        else:
+            key = field.name
+            absent = [required for required in field.requires if required not in src]
+            if absent:
+                missing.extend(
+                    required for required in absent if required not in missing
+                )
+                continue
+
+        # All keys read by the field are present, so every error, including
+        # a KeyError of a parse function, is caused by an invalid value
+        try:
+            field_decoder(field)(src)
+        except KeyError as error:
+            invalid[key] = "invalid value {}".format(error)
+        except Exception as error:
+            invalid[key] = str(error) or type(error).__name__
+
+    if missing or invalid:
+        return InvalidResponseError(cls.__name__, missing, invalid)
+    return None
+
+
+def checked_field_decoder(cls: type, field: Field) -> Callable[[dict], Any]:
+    """Like `field_decoder`, but raises InvalidResponseError for bad values"""
+    decode = field_decoder(field)
+    schema = (field,)
+
+    def decode_checked(src: dict) -> Any:
+        try:
+            return decode(src)
+        except Exception:
+            error = diagnose(cls, schema, src)
+            if error is None:
+                raise
+            raise error from None
+
+    return decode_checked
+
+
+def _expression(field: Field, index: int, namespace: Dict[str, Any]) -> str:
+    if field.source is not None:
+        namespace["_source{}".format(index)] = field.source
+        return "_source{}(src)".format(index)
+
+    key = field.key or field.name
+    if field.optional and field.enum is None and field.parse is None:
+        return "src.get({!r})".format(key)
+
+    if field.optional and field.enum is not None:
+        namespace["_enum{}".format(index)] = enum_table(field.enum)
+        namespace["_optional_member"] = optional_member
+        expression = "_optional_member(_enum{}, src.get({!r}))".format(index, key)
+        if field.parse is None:
+            return expression
+        namespace["_parse{}".format(index)] = field.parse
+        return "(_parse{0}(_member{0}{1}) if (_member{0} := {2}) is not None else None)".format(
+            index, ", keep_raw" if field.nested else "", expression
+        )
+
+    expression = "src[{!r}]".format(key)
+    if field.enum is not None:
+        namespace["_enum{}".format(index)] = enum_table(field.enum)
+        expression = "_enum{}[{}]".format(index, expression)
+    if field.parse is not None:
+        namespace["_parse{}".format(index)] = field.parse
+        expression = "_parse{}({}{})".format(
+            index, expression, ", keep_raw" if field.nested else ""
+        )
+    if field.optional:
+        expression = "({} if src.get({!r}) is not None else None)".format(
+            expression, key
+        )
+    return expression
+
+
+def compile_decoder(
+    cls: type, schema: Schema, context: Tuple[str, ...] = ()
+) -> Callable[..., Any]:
+    """
+    Compiles schema into a function `decode(*context, src, keep_raw=True)`
+    which returns an instance of the response model cls.
+
+    context names constructor arguments which are not read from the response
+    but passed in by the caller, e.g. the meter of a MeterResponse. They must
+    directly follow `_raw` in the fields of cls and are followed by the fields
+    of the schema in the same order.
+    """
+    names = [field.name for field in fields(cls)]
+    if names != ["_raw", *context, *(field.name for field in schema)]:
+        raise TypeError(
+            "Schema of {} does not match its fields {}".format(cls.__name__, names)
+        )
+
+    namespace: Dict[str, Any] = {
+        "_cls": cls,
+        "_schema": schema,
+        "_diagnose": diagnose,
+    }
+    arguments = ["src if keep_raw else None", *context]
+    arguments.extend(
+        _expression(field, index, namespace) for index, field in enumerate(schema)
+    )
+    parameters = ", ".join([*context, "src", "keep_raw=True"])
+    source = (
+        "def decode({parameters}):\n"
+        "    try:\n"
+        "        return _cls({arguments})\n"
+        "    except Exception:\n"
+        "        error = _diagnose(_cls, _schema, src)\n"
+        "        if error is None:\n"
+        "            raise\n"
+        "        raise error from None\n"
+    ).format(parameters=parameters, arguments=", ".join(arguments))
+
+    exec(source, namespace)
+    decode = namespace["decode"]
+    decode.__qualname__ = "decode_{}".format(cls.__name__)
+    return decode
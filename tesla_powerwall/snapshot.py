@@ -0,0 +1,23 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .const import GridStatus, OperationMode
+from .responses import BatteryResponse, MetersAggregatesResponse
+
+
+@dataclass
+class TelemetrySnapshot:
+    """
+    The telemetry of a gateway at one point in time, as returned by
+    `Powerwall.get_snapshot()`. This is the unit of recorded telemetry used by
+    the exporters.
+    """
+
+    # Unix time in seconds at which the snapshot was requested
+    timestamp: float
+    meters: MetersAggregatesResponse
+    # State of energy in percent
+    soe: float
+    grid_status: GridStatus
+    batteries: List[BatteryResponse]
+    operation_mode: Optional[OperationMode] = None
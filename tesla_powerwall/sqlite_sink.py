@@ -0,0 +1,380 @@
+"""
+Batched SQLite storage of telemetry.
+
+`SQLiteSink` buffers samples in memory and writes them on a background thread
+in batched transactions, so neither the event loop nor the polling thread
+waits for SQLite to commit. The database uses WAL mode, which lets readers
+query while samples are written.
+
+Every sample is a `(gateway, metric, timestamp, value)` tuple. Metrics are
+named after the recorded field, e.g. "site.instant_power", "soe" or
+"battery.<serial number>.p_out". Samples are stored in a table clustered by
+metric and timestamp, so time range queries of one metric of one gateway only
+read the matching rows. Samples whose value is not finite, e.g. NaN of a
+missing reading, are skipped, as SQLite stores NaN as NULL.
+"""
+
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .battery_table import BATTERY_BLOCK_FIELDS
+from .error import PowerwallError
+from .history import METER_HISTORY_FIELDS
+from .responses import BatteryResponse, MetersAggregatesResponse
+
+# What to do with new samples if max_queued samples are waiting
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP = "drop"
+
+SOE_METRIC = "soe"
+
+Sample = Tuple[str, str, float, float]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    id INTEGER PRIMARY KEY,
+    gateway TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (gateway, name)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    metric_id INTEGER NOT NULL REFERENCES metrics (id),
+    timestamp REAL NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (metric_id, timestamp)
+) WITHOUT ROWID;
+"""
+
+
+class SinkStatistics(NamedTuple):
+    # Samples waiting to be written
+    queued: int
+    written: int
+    dropped: int
+    # Samples which were not written because their value is not finite
+    skipped: int
+    batches: int
+    # Time spent writing batches in seconds
+    write_time: float
+
+    @property
+    def write_throughput(self) -> float:
+        """Written samples per second of write time"""
+        return self.written / self.write_time if self.write_time else 0.0
+
+
+def meter_samples(
+    gateway: str, meters: MetersAggregatesResponse, timestamp: float
+) -> List[Sample]:
+    return [
+        (
+            gateway,
+            "{}.{}".format(meter.value, field),
+            timestamp,
+            getattr(response, field),
+        )
+        for meter, response in meters.meters.items()
+        for field in METER_HISTORY_FIELDS
+    ]
+
+
+def charge_samples(gateway: str, percentage: float, timestamp: float) -> List[Sample]:
+    return [(gateway, SOE_METRIC, timestamp, percentage)]
+
+
+def battery_samples(
+    gateway: str, batteries: Iterable[BatteryResponse], timestamp: float
+) -> List[Sample]:
+    """Samples of all present fields; fields of disabled packs are skipped"""
+    samples = []
+    for battery in batteries:
+        for field in BATTERY_BLOCK_FIELDS:
+            value = getattr(battery, field)
+            if value is not None:
+                metric = "battery.{}.{}".format(battery.serial_number, field)
+                samples.append((gateway, metric, timestamp, value))
+    return samples
+
+
+class SQLiteSink:
+    """
+    Writes samples to the SQLite database at path on a background thread.
+
+    Samples are written in transactions of up to batch_size samples, at the
+    latest flush_interval seconds after they were queued. If max_queued
+    samples are waiting, `put` either blocks until there is room
+    (OVERFLOW_BLOCK) or drops the new samples (OVERFLOW_DROP).
+
+    The writer is started by `start()` or by entering the sink as a context
+    manager. `close()` writes all queued samples and stops the writer.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 1000,
+        flush_interval: float = 1.0,
+        max_queued: int = 100000,
+        overflow: str = OVERFLOW_BLOCK,
+    ) -> None:
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP):
+            raise ValueError(
+                "overflow must be either {!r} or {!r}".format(
+                    OVERFLOW_BLOCK, OVERFLOW_DROP
+                )
+            )
+        if batch_size <= 0 or max_queued <= 0:
+            raise ValueError("batch_size and max_queued must be positive")
+
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queued = max_queued
+        self.overflow = overflow
+
+        self._queue: Deque[Sample] = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._error: Optional[BaseException] = None
+
+        self._written = 0
+        self._dropped = 0
+        self._skipped = 0
+        self._batches = 0
+        self._write_time = 0.0
+
+        # Create the schema up front so that queries work before the first write
+        connection = self._connect()
+        connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only syncs at checkpoints and is still crash safe
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="SQLiteSink", daemon=True
+        )
+        self._thread.start()
+
+    def _enqueue(self, samples: List[Sample], timeout: Optional[float]) -> bool:
+        if self._error is not None:
+            raise PowerwallError("SQLiteSink failed") from self._error
+
+        with self._lock:
+            if self._closed:
+                raise PowerwallError("SQLiteSink is closed")
+            if len(samples) > self.max_queued:
+                raise ValueError("Cannot queue more than max_queued samples at once")
+
+            if len(self._queue) + len(samples) > self.max_queued:
+                if self.overflow == OVERFLOW_DROP:
+                    return False
+                if not self._not_full.wait_for(
+                    lambda: (
+                        self._closed
+                        or len(self._queue) + len(samples) <= self.max_queued
+                    ),
+                    timeout,
+                ):
+                    return False
+                if self._closed:
+                    raise PowerwallError("SQLiteSink is closed")
+
+            self._queue.extend(samples)
+            if len(self._queue) >= self.batch_size:
+                self._not_empty.notify()
+        return True
+
+    def _drop(self, samples: List[Sample]) -> None:
+        with self._lock:
+            self._dropped += len(samples)
+
+    def put(self, samples: Iterable[Sample], timeout: Optional[float] = None) -> bool:
+        """
+        Queues samples and returns whether they were accepted. With
+        OVERFLOW_BLOCK this waits up to timeout seconds (forever if None)
+        for room in the queue.
+        """
+        samples = list(samples)
+        accepted = self._enqueue(samples, timeout)
+        if not accepted:
+            self._drop(samples)
+        return accepted
+
+    async def put_async(self, samples: Iterable[Sample]) -> bool:
+        """Like `put`, but waits for room in the queue without blocking the loop"""
+        samples = list(samples)
+        if self._enqueue(samples, 0):
+            return True
+        if self.overflow == OVERFLOW_DROP:
+            self._drop(samples)
+            return False
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.put, samples)
+
+    async def add_meters(
+        self,
+        gateway: str,
+        meters: MetersAggregatesResponse,
+        timestamp: Optional[float] = None,
+    ) -> bool:
+        """Queues the readings of `Powerwall.get_meters()`"""
+        timestamp = time.time() if timestamp is None else timestamp
+        return await self.put_async(meter_samples(gateway, meters, timestamp))
+
+    async def add_charge(
+        self, gateway: str, percentage: float, timestamp: Optional[float] = None
+    ) -> bool:
+        """Queues the result of `Powerwall.get_charge()`"""
+        timestamp = time.time() if timestamp is None else timestamp
+        return await self.put_async(charge_samples(gateway, percentage, timestamp))
+
+    async def add_batteries(
+        self,
+        gateway: str,
+        batteries: Iterable[BatteryResponse],
+        timestamp: Optional[float] = None,
+    ) -> bool:
+        """Queues the result of `Powerwall.get_batteries()`"""
+        timestamp = time.time() if timestamp is None else timestamp
+        return await self.put_async(battery_samples(gateway, batteries, timestamp))
+
+    @property
+    def statistics(self) -> SinkStatistics:
+        with self._lock:
+            return SinkStatistics(
+                queued=len(self._queue),
+                written=self._written,
+                dropped=self._dropped,
+                skipped=self._skipped,
+                batches=self._batches,
+                write_time=self._write_time,
+            )
+
+    def _take(self) -> List[Sample]:
+        # Waits for a full batch, the flush interval or close
+        with self._lock:
+            if len(self._queue) < self.batch_size and not self._closed:
+                self._not_empty.wait(self.flush_interval)
+            count = min(len(self._queue), self.batch_size)
+            batch = [self._queue.popleft() for _ in range(count)]
+            self._not_full.notify_all()
+            return batch
+
+    def _run(self) -> None:
+        connection = self._connect()
+        metric_ids: Dict[Tuple[str, str], int] = {}
+        try:
+            while True:
+                batch = self._take()
+                if batch:
+                    self._write(connection, metric_ids, batch)
+                elif self._closed:
+                    return
+        except BaseException as error:
+            self._error = error
+            with self._lock:
+                self._closed = True
+                self._not_full.notify_all()
+        finally:
+            connection.close()
+
+    def _write(
+        self,
+        connection: sqlite3.Connection,
+        metric_ids: Dict[Tuple[str, str], int],
+        batch: List[Sample],
+    ) -> None:
+        start = time.perf_counter()
+        with connection:
+            rows = []
+            for gateway, metric, timestamp, value in batch:
+                if not math.isfinite(value):
+                    continue
+                key = (gateway, metric)
+                metric_id = metric_ids.get(key)
+                if metric_id is None:
+                    connection.execute(
+                        "INSERT OR IGNORE INTO metrics (gateway, name) VALUES (?, ?)",
+                        key,
+                    )
+                    metric_id = metric_ids[key] = connection.execute(
+                        "SELECT id FROM metrics WHERE gateway = ? AND name = ?", key
+                    ).fetchone()[0]
+                rows.append((metric_id, timestamp, value))
+            connection.executemany(
+                "INSERT OR REPLACE INTO samples (metric_id, timestamp, value) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+        duration = time.perf_counter() - start
+        with self._lock:
+            self._written += len(rows)
+            self._skipped += len(batch) - len(rows)
+            self._batches += 1
+            self._write_time += duration
+
+    def close(self) -> None:
+        """Writes all queued samples and stops the writer"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify()
+            self._not_full.notify_all()
+            pending = bool(self._queue)
+        if self._thread is None and pending:
+            self.start()
+        if self._thread is not None:
+            self._thread.join()
+        if self._error is not None:
+            raise PowerwallError("SQLiteSink failed") from self._error
+
+    def query(
+        self, gateway: str, metric: str, start: float, end: float
+    ) -> List[Tuple[float, float]]:
+        """Returns the (timestamp, value) samples of metric in [start, end)"""
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute(
+                "SELECT timestamp, value FROM samples "
+                "JOIN metrics ON metrics.id = samples.metric_id "
+                "WHERE gateway = ? AND name = ? AND timestamp >= ? AND timestamp < ? "
+                "ORDER BY timestamp",
+                (gateway, metric, start, end),
+            ).fetchall()
+        finally:
+            connection.close()
+
+    def metrics(self, gateway: str) -> List[str]:
+        connection = sqlite3.connect(self.path)
+        try:
+            return [
+                row[0]
+                for row in connection.execute(
+                    "SELECT name FROM metrics WHERE gateway = ? ORDER BY name",
+                    (gateway,),
+                )
+            ]
+        finally:
+            connection.close()
+
+    def __enter__(self) -> "SQLiteSink":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
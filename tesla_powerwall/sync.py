@@ -0,0 +1,242 @@
+"""
+Synchronous facade for Powerwall.
+
+`SyncPowerwall` runs a single event loop in a background thread for its
+whole lifetime. The underlying Powerwall, and with it the aiohttp session,
+its connection pool and its cookie jar, is created on that loop, so
+connections and the authentication are reused across calls. Calls are
+submitted with `asyncio.run_coroutine_threadsafe`, which makes a
+SyncPowerwall safe to share between threads.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from types import TracebackType
+from typing import Any, Coroutine, Dict, List, Optional, Sequence, Type, TypeVar, Union
+
+from .const import DeviceType, GridStatus, IslandMode, OperationMode, User
+from .powerwall import Powerwall
+from .responses import (
+    BatteryResponse,
+    LoginResponse,
+    MeterDetailsResponse,
+    MetersAggregatesResponse,
+    PowerwallStatusResponse,
+    SiteInfoResponse,
+    SiteMasterResponse,
+    SolarResponse,
+    SystemStatusResponse,
+)
+from .snapshot import TelemetrySnapshot
+from .timeouts import TimeoutPolicy
+
+T = TypeVar("T")
+
+
+class SyncPowerwall:
+    """
+    Blocking version of Powerwall. Every coroutine method of Powerwall is
+    available with the same arguments and returns its result directly, e.g.
+    `SyncPowerwall("<ip>").get_charge()`.
+
+    call_timeout limits the time a caller waits for a single call in seconds;
+    the request itself is limited by timeout like for Powerwall.
+    """
+
+    def __init__(
+        self,
+        endpoint: Union[str, Sequence[str]],
+        timeout: Optional[Union[float, TimeoutPolicy]] = 10,
+        verify_ssl: bool = False,
+        lazy_responses: bool = False,
+        call_timeout: Optional[float] = None,
+        endpoint_timeouts: Optional[
+            Dict[str, Optional[Union[float, TimeoutPolicy]]]
+        ] = None,
+    ) -> None:
+        self._call_timeout = call_timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="SyncPowerwall", daemon=True
+        )
+        self._thread.start()
+        self._closed = False
+        try:
+            self._powerwall = self._run(
+                self._create(
+                    endpoint, timeout, verify_ssl, lazy_responses, endpoint_timeouts
+                )
+            )
+        except BaseException:
+            self._stop()
+            raise
+
+    @staticmethod
+    async def _create(
+        endpoint: Union[str, Sequence[str]],
+        timeout: Optional[Union[float, TimeoutPolicy]],
+        verify_ssl: bool,
+        lazy_responses: bool,
+        endpoint_timeouts: Optional[Dict[str, Optional[Union[float, TimeoutPolicy]]]],
+    ) -> Powerwall:
+        # The ClientSession has to be created while the loop is running
+        return Powerwall(
+            endpoint,
+            timeout=timeout,
+            verify_ssl=verify_ssl,
+            lazy_responses=lazy_responses,
+            endpoint_timeouts=endpoint_timeouts,
+        )
+
+    def _run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        if self._closed:
+            coroutine.close()
+            raise RuntimeError("SyncPowerwall is closed")
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        try:
+            return future.result(self._call_timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def _stop(self) -> None:
+        self._closed = True
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    @property
+    def powerwall(self) -> Powerwall:
+        """The underlying Powerwall, which must only be used on its loop"""
+        return self._powerwall
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def is_authenticated(self) -> bool:
+        # The cookie jar must only be accessed from the loop
+        return self._run(self._is_authenticated())
+
+    async def _is_authenticated(self) -> bool:
+        return self._powerwall.is_authenticated()
+
+    def login_as(
+        self,
+        user: Union[User, str],
+        password: str,
+        email: str,
+        force_sm_off: bool = False,
+    ) -> LoginResponse:
+        return self._run(self._powerwall.login_as(user, password, email, force_sm_off))
+
+    def login(
+        self, password: str, email: str = "", force_sm_off: bool = False
+    ) -> LoginResponse:
+        return self._run(self._powerwall.login(password, email, force_sm_off))
+
+    def logout(self) -> None:
+        self._run(self._powerwall.logout())
+
+    def run(self) -> None:
+        self._run(self._powerwall.run())
+
+    def stop(self) -> None:
+        self._run(self._powerwall.stop())
+
+    def get_charge(self) -> Union[float, int]:
+        return self._run(self._powerwall.get_charge())
+
+    def get_system_status(self) -> SystemStatusResponse:
+        return self._run(self._powerwall.get_system_status())
+
+    def get_energy(self, system_status: Optional[SystemStatusResponse] = None) -> int:
+        return self._run(self._powerwall.get_energy(system_status))
+
+    def get_sitemaster(self) -> SiteMasterResponse:
+        return self._run(self._powerwall.get_sitemaster())
+
+    def get_meters(self) -> MetersAggregatesResponse:
+        return self._run(self._powerwall.get_meters())
+
+    def get_meter_site(self) -> MeterDetailsResponse:
+        return self._run(self._powerwall.get_meter_site())
+
+    def get_meter_solar(self) -> MeterDetailsResponse:
+        return self._run(self._powerwall.get_meter_solar())
+
+    def get_grid_status(self) -> GridStatus:
+        return self._run(self._powerwall.get_grid_status())
+
+    def get_capacity(
+        self, system_status: Optional[SystemStatusResponse] = None
+    ) -> float:
+        return self._run(self._powerwall.get_capacity(system_status))
+
+    def get_batteries(
+        self, system_status: Optional[SystemStatusResponse] = None
+    ) -> List[BatteryResponse]:
+        return self._run(self._powerwall.get_batteries(system_status))
+
+    def is_grid_services_active(self) -> bool:
+        return self._run(self._powerwall.is_grid_services_active())
+
+    def get_site_info(self) -> SiteInfoResponse:
+        return self._run(self._powerwall.get_site_info())
+
+    def set_site_name(self, site_name: str) -> dict:
+        return self._run(self._powerwall.set_site_name(site_name))
+
+    def get_status(self) -> PowerwallStatusResponse:
+        return self._run(self._powerwall.get_status())
+
+    def get_device_type(self) -> DeviceType:
+        return self._run(self._powerwall.get_device_type())
+
+    def get_serial_numbers(self) -> List[str]:
+        return self._run(self._powerwall.get_serial_numbers())
+
+    def get_gateway_din(self) -> str:
+        return self._run(self._powerwall.get_gateway_din())
+
+    def get_operation_mode(self) -> OperationMode:
+        return self._run(self._powerwall.get_operation_mode())
+
+    def get_backup_reserve_percentage(self) -> float:
+        return self._run(self._powerwall.get_backup_reserve_percentage())
+
+    def get_solars(self) -> List[SolarResponse]:
+        return self._run(self._powerwall.get_solars())
+
+    def get_vin(self) -> str:
+        return self._run(self._powerwall.get_vin())
+
+    def set_island_mode(self, mode: IslandMode) -> IslandMode:
+        return self._run(self._powerwall.set_island_mode(mode))
+
+    def get_snapshot(self, timeout: Optional[float] = None) -> TelemetrySnapshot:
+        return self._run(self._powerwall.get_snapshot(timeout))
+
+    def get_version(self) -> str:
+        return self._run(self._powerwall.get_version())
+
+    def close(self) -> None:
+        """Closes the session and stops the background loop"""
+        if self._closed:
+            return
+        try:
+            self._run(self._powerwall.close())
+        finally:
+            self._stop()
+
+    def __enter__(self) -> "SyncPowerwall":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
@@ -0,0 +1,139 @@
+"""
+Per-endpoint request timeouts and deadlines.
+
+The timeout of a request is decided by the TimeoutPolicy of its endpoint:
+`FixedTimeout` always uses the same timeout, `AdaptiveTimeout` derives it
+from a percentile of the recently observed latencies of the endpoint. A
+timeout of None, e.g. `FixedTimeout(None)` or `API(timeout=None)`, disables
+the client timeout.
+
+A `deadline` limits all requests made within it, including the requests of
+tasks created within it, like the concurrent requests of
+`Powerwall.get_snapshot`. Each request then uses the smaller of its timeout
+and the time left until the deadline:
+
+    with deadline(0.8):
+        snapshot = await powerwall.get_snapshot()
+"""
+
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Union
+
+from .rollups import RollingWindow
+
+DEFAULT_ADAPTIVE_WINDOW = 300.0
+
+# Monotonic time at which the current deadline ends
+_deadline: ContextVar[Optional[float]] = ContextVar(
+    "tesla_powerwall_deadline", default=None
+)
+
+
+class TimeoutPolicy(ABC):
+    """Decides the timeout of the requests to an endpoint"""
+
+    @abstractmethod
+    def timeout(self, path: str) -> Optional[float]:
+        """
+        Returns the timeout of the next request to path in seconds or None
+        if it has no timeout
+        """
+
+    def observe(self, path: str, latency: float) -> None:
+        """
+        Called with the latency of every completed request and of every
+        request which exceeded the timeout of this policy. Requests cut
+        short by a deadline are not observed.
+        """
+
+
+class FixedTimeout(TimeoutPolicy):
+    def __init__(self, seconds: Optional[float]) -> None:
+        if seconds is not None and seconds <= 0:
+            raise ValueError("seconds must be positive")
+        self.seconds = seconds
+
+    def timeout(self, path: str) -> Optional[float]:
+        return self.seconds
+
+    def __repr__(self) -> str:
+        return "FixedTimeout({})".format(self.seconds)
+
+
+class AdaptiveTimeout(TimeoutPolicy):
+    """
+    Sets the timeout of each endpoint to multiplier times the percentile of
+    its latencies within the last window seconds, limited to floor and
+    ceiling. The ceiling is used until min_samples latencies were observed.
+
+    Timed out requests are observed with the time they took, so the timeout
+    grows again if the gateway becomes slower.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 99.0,
+        multiplier: float = 2.0,
+        floor: float = 0.5,
+        ceiling: float = 10.0,
+        window: float = DEFAULT_ADAPTIVE_WINDOW,
+        min_samples: int = 10,
+    ) -> None:
+        if not 0 < percentile <= 100:
+            raise ValueError("percentile must be between 0 and 100")
+        if not 0 < floor <= ceiling:
+            raise ValueError("floor must be positive and at most ceiling")
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.floor = floor
+        self.ceiling = ceiling
+        self.window = window
+        self.min_samples = min_samples
+        self._latencies: Dict[str, RollingWindow] = {}
+
+    def timeout(self, path: str) -> float:
+        latencies = self._latencies.get(path)
+        if latencies is None:
+            return self.ceiling
+        latencies.expire(time.monotonic())
+        if latencies.count < self.min_samples:
+            return self.ceiling
+        timeout = self.multiplier * latencies.percentile(self.percentile)
+        return min(self.ceiling, max(self.floor, timeout))
+
+    def observe(self, path: str, latency: float) -> None:
+        latencies = self._latencies.get(path)
+        if latencies is None:
+            # The percentile only needs to be roughly accurate
+            latencies = self._latencies[path] = RollingWindow(self.window, 0.05)
+        latencies.add(time.monotonic(), latency)
+
+
+def as_policy(timeout: Optional[Union[float, TimeoutPolicy]]) -> TimeoutPolicy:
+    return timeout if isinstance(timeout, TimeoutPolicy) else FixedTimeout(timeout)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Requests made within the context must finish within seconds. A nested
+    deadline can only shorten the deadline of the outer context.
+    """
+    end = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        end = min(end, current)
+    token = _deadline.set(end)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Returns the seconds left until the current deadline or None"""
+    end = _deadline.get()
+    return None if end is None else end - time.monotonic()
@@ -0,0 +1,46 @@
+"""
+Measures packing and unpacking snapshots with the binary encoding.
+
+The time of a round trip is compared with pickling the same snapshot:
+
+    python -m tests.benchmarks.binary
+    python -m tests.benchmarks.binary --runs 100000
+"""
+
+import argparse
+import pickle
+import sys
+import time
+from typing import Callable, List
+
+from tesla_powerwall.binary import pack_snapshot, unpack_snapshot
+from tests.unit import snapshot
+
+
+def measure(round_trip: Callable[[], object], runs: int) -> float:
+    """Returns the time of one round trip in seconds"""
+    start = time.perf_counter()
+    for _ in range(runs):
+        round_trip()
+    return (time.perf_counter() - start) / runs
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    expected = snapshot(3)
+    for name, round_trip in (
+        ("binary", lambda: unpack_snapshot(pack_snapshot(expected))),
+        ("pickle", lambda: pickle.loads(pickle.dumps(expected))),
+    ):
+        print(
+            "{:<10} {:>8.1f} us per round trip".format(
+                name, measure(round_trip, args.runs) * 1e6
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
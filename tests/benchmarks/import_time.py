@@ -0,0 +1,59 @@
+"""
+Measures the import time of tesla_powerwall with `python -X importtime`.
+
+Every statement is run in a fresh interpreter several times and the median
+of the cumulative import time of the imported modules is reported:
+
+    python -m tests.benchmarks.import_time
+    python -m tests.benchmarks.import_time --runs 50 "import tesla_powerwall.const"
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+from typing import List
+
+DEFAULT_STATEMENTS = [
+    "import tesla_powerwall",
+    "import tesla_powerwall.const",
+    "from tesla_powerwall import GridStatus, MeterType",
+    "import tesla_powerwall.responses",
+    "from tesla_powerwall import Powerwall",
+]
+
+_LINE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \| (\S+)$")
+
+
+def measure(statement: str) -> float:
+    """Returns the import time of statement in microseconds"""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    # Only top level imports are unindented, their cumulative times add up
+    # to the total
+    total = 0
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match is not None:
+            total += int(match.group(1))
+    return total
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("statements", nargs="*", default=DEFAULT_STATEMENTS)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    for statement in args.statements:
+        times = [measure(statement) for _ in range(args.runs)]
+        print("{:<55} {:>8.1f} ms".format(statement, statistics.median(times) / 1000))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
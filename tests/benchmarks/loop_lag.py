@@ -0,0 +1,85 @@
+"""
+Measures how long decoding a large response blocks the event loop.
+
+A large body is requested repeatedly from a mock server while a task
+measures how late its 1 ms sleeps wake up. This is done with decoding on
+the event loop (offload_threshold=None) and in the default executor:
+
+    python -m tests.benchmarks.loop_lag
+    python -m tests.benchmarks.loop_lag --records 200000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import List, Optional
+
+import aresponses
+import orjson
+
+from tesla_powerwall import API
+from tesla_powerwall.api import DEFAULT_OFFLOAD_THRESHOLD
+from tests.unit import ENDPOINT, ENDPOINT_HOST, ENDPOINT_PATH
+
+
+async def _monitor(stop: asyncio.Event, lags: List[float]) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(0.001)
+        lags.append(loop.time() - start - 0.001)
+
+
+async def measure(body: bytes, offload_threshold: Optional[int], requests: int):
+    async with aresponses.ResponsesMockServer() as server:
+        server.add(
+            ENDPOINT_HOST,
+            f"{ENDPOINT_PATH}getlogs",
+            "GET",
+            server.Response(body=body),
+            repeat=server.INFINITY,
+        )
+        async with API(ENDPOINT, offload_threshold=offload_threshold) as api:
+            stop = asyncio.Event()
+            lags: List[float] = []
+            monitor = asyncio.create_task(_monitor(stop, lags))
+            start = time.perf_counter()
+            for _ in range(requests):
+                await api.get("getlogs")
+            elapsed = time.perf_counter() - start
+            stop.set()
+            await monitor
+
+    lags.sort()
+    return elapsed / requests, lags[len(lags) * 99 // 100], lags[-1]
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    body = orjson.dumps(
+        {
+            "logs": [
+                {"time": i, "level": "info", "message": "log message {}".format(i)}
+                for i in range(args.records)
+            ]
+        }
+    )
+    print("body of {:.1f} MB".format(len(body) / 1e6))
+    for name, threshold in (
+        ("inline", None),
+        ("executor", DEFAULT_OFFLOAD_THRESHOLD),
+    ):
+        request, p99, maximum = asyncio.run(measure(body, threshold, args.requests))
+        print(
+            "{:<10} {:>8.1f} ms per request, loop lag p99 {:>6.1f} ms, "
+            "max {:>6.1f} ms".format(name, request * 1e3, p99 * 1e3, maximum * 1e3)
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
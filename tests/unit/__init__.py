@@ -1,6 +1,14 @@
 import json
 from pathlib import Path
 
+from tesla_powerwall import (
+    GridStatus,
+    MetersAggregatesResponse,
+    OperationMode,
+    SystemStatusResponse,
+    TelemetrySnapshot,
+)
+
 ENDPOINT_SCHEME = "https://"
 ENDPOINT_HOST = "1.1.1.1"
 ENDPOINT_PATH = "/api/"
@@ -27,3 +35,27 @@ SITE_INFO_RESPONSE = load_fixture("site_info.json")
 SITEMASTER_RESPONSE = load_fixture("sitemaster.json")
 STATUS_RESPONSE = load_fixture("status.json")
 SYSTEM_STATUS_RESPONSE = load_fixture("system_status.json")
+
+
+def snapshot(i: int, meters=METERS_AGGREGATES_RESPONSE) -> TelemetrySnapshot:
+    """A snapshot of the fixtures whose values change with i"""
+    meters = {
+        key: {
+            **value,
+            "instant_power": value["instant_power"] + i * 0.5,
+            "energy_imported": value["energy_imported"] + i,
+        }
+        for key, value in meters.items()
+    }
+    system_status = SystemStatusResponse.from_dict(
+        SYSTEM_STATUS_RESPONSE, keep_raw=False
+    )
+    system_status.batteries[0].p_out = -1830 + i
+    return TelemetrySnapshot(
+        timestamp=1700000000.0 + i,
+        meters=MetersAggregatesResponse.from_dict(meters, keep_raw=False),
+        soe=50.0 + i / 7,
+        grid_status=GridStatus.CONNECTED,
+        batteries=system_status.batteries,
+        operation_mode=OperationMode.SELF_CONSUMPTION if i % 3 else None,
+    )
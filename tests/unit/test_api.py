@@ -1,11 +1,12 @@
 import json
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 import aiohttp
 import aresponses
 from yarl import URL
 
-from tesla_powerwall import API, AccessDeniedError, ApiError
+from tesla_powerwall import API, AccessDeniedError, ApiError, ApiStatusError
 from tesla_powerwall.const import User
 from tests.unit import ENDPOINT, ENDPOINT_HOST, ENDPOINT_PATH
 
@@ -80,6 +81,11 @@ class TestAPI(unittest.IsolatedAsyncioTestCase):
             with self.assertRaises(ApiError):
                 await self.api._process_response(response)
 
+        status = 200
+        text = " \n"
+        async with self.session.get(f"{ENDPOINT}test") as response:
+            self.assertEqual(await self.api._process_response(response), {})
+
         status = 200
         text = "{}"
         async with self.session.get(f"{ENDPOINT}test") as response:
@@ -92,6 +98,131 @@ class TestAPI(unittest.IsolatedAsyncioTestCase):
                 await self.api._process_response(response), {"response": "ok"}
             )
 
+    async def test_error_body_is_bounded(self):
+        page = "<html>" + "x" * 1000000 + "</html>"
+
+        async def chunked(request):
+            response = self.aresponses.Response(status=502)
+            response.enable_chunked_encoding()
+            await response.prepare(request)
+            await response.write(page.encode())
+            await response.write_eof()
+            return response
+
+        for handler in (
+            self.aresponses.Response(status=502, text=page),
+            chunked,
+            self.aresponses.Response(status=500, text="Internal error"),
+            self.aresponses.Response(status=502, text=page),
+            self.aresponses.Response(status=401, text=page),
+            self.aresponses.Response(
+                status=403,
+                text='{"error": "Forbidden", "message": "Denied"}',
+            ),
+            self.aresponses.Response(text='{"response": "ok"}'),
+        ):
+            self.aresponses.add(ENDPOINT_HOST, f"{ENDPOINT_PATH}test", "GET", handler)
+
+        api = API(ENDPOINT, http_session=self.session, max_error_body_size=100)
+        with self.assertRaises(ApiStatusError) as context:
+            await api.get("test")
+        error = context.exception
+        self.assertEqual(error.status, 502)
+        self.assertEqual(error.reason, "Bad Gateway")
+        self.assertEqual(error.body, page[:100])
+        self.assertTrue(error.truncated)
+        self.assertEqual(error.body_size, len(page))
+        self.assertLess(len(str(error)), 300)
+
+        # The size of chunked bodies is unknown
+        with self.assertRaises(ApiStatusError) as context:
+            await api.get("test")
+        self.assertTrue(context.exception.truncated)
+        self.assertIsNone(context.exception.body_size)
+        self.assertIn("unknown number of bytes", str(context.exception))
+
+        with self.assertRaises(ApiStatusError) as context:
+            await api.get("test")
+        self.assertEqual(context.exception.body, "Internal error")
+        self.assertFalse(context.exception.truncated)
+        self.assertEqual(context.exception.body_size, len("Internal error"))
+
+        api = API(ENDPOINT, http_session=self.session, read_error_body=False)
+        with self.assertRaises(ApiStatusError) as context:
+            await api.get("test")
+        self.assertEqual(context.exception.status, 502)
+        self.assertIsNone(context.exception.body)
+        with self.assertRaises(AccessDeniedError):
+            await api.get("test")
+
+        api = API(ENDPOINT, http_session=self.session, max_error_body_size=100)
+        with self.assertRaises(AccessDeniedError) as context:
+            await api.get("test")
+        self.assertEqual(context.exception.error, "Forbidden")
+        self.assertEqual(context.exception.message, "Denied")
+
+        self.assertEqual(await api.get("test"), {"response": "ok"})
+        self.aresponses.assert_plan_strictly_followed()
+
+    async def test_offload_large_responses(self):
+        class CountingExecutor(ThreadPoolExecutor):
+            submitted = 0
+
+            def submit(self, *args, **kwargs):
+                self.submitted += 1
+                return super().submit(*args, **kwargs)
+
+        large = {"logs": [{"line": i} for i in range(100)]}
+        self.aresponses.add(
+            ENDPOINT_HOST,
+            f"{ENDPOINT_PATH}large",
+            "GET",
+            self.aresponses.Response(text=json.dumps(large)),
+            repeat=3,
+        )
+        self.aresponses.add(
+            ENDPOINT_HOST,
+            f"{ENDPOINT_PATH}small",
+            "GET",
+            self.aresponses.Response(text='{"small": true}'),
+        )
+        self.aresponses.add(
+            ENDPOINT_HOST,
+            f"{ENDPOINT_PATH}invalid",
+            "GET",
+            self.aresponses.Response(text="[" * 100000),
+        )
+
+        with CountingExecutor(1) as executor:
+            api = API(
+                ENDPOINT,
+                http_session=self.session,
+                offload_threshold=100,
+                executor=executor,
+            )
+            self.assertEqual(await api.get("large"), large)
+            self.assertEqual(executor.submitted, 1)
+            self.assertEqual(await api.get("small"), {"small": True})
+            self.assertEqual(executor.submitted, 1)
+            with self.assertRaises(ApiError):
+                await api.get("invalid")
+            self.assertEqual(executor.submitted, 2)
+
+            api = API(
+                ENDPOINT,
+                http_session=self.session,
+                offload_threshold=None,
+                executor=executor,
+            )
+            self.assertEqual(await api.get("large"), large)
+            self.assertEqual(executor.submitted, 2)
+
+        # The default executor of the loop
+        api = API(ENDPOINT, http_session=self.session, offload_threshold=100)
+        self.assertEqual(await api.get("large"), large)
+        self.aresponses.assert_no_unused_routes()
+        self.aresponses.assert_all_requests_matched()
+
     async def test_get(self):
         self.aresponses.add(
             ENDPOINT_HOST,
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+
+from tesla_powerwall import (
+    GridState,
+    GridStatus,
+    MetersAggregatesResponse,
+    OperationMode,
+    SystemStatusResponse,
+    TelemetrySnapshot,
+)
+from tests.unit import METERS_AGGREGATES_RESPONSE, SYSTEM_STATUS_RESPONSE
+
+try:
+    import pyarrow.parquet as pq
+
+    from tesla_powerwall.arrow import ParquetExporter, TelemetryBatches, export_parquet
+except ImportError:
+    pq = None
+
+
+def snapshots(count: int):
+    meters = MetersAggregatesResponse.from_dict(METERS_AGGREGATES_RESPONSE)
+    batteries = SystemStatusResponse.from_dict(SYSTEM_STATUS_RESPONSE).batteries
+    for i in range(count):
+        yield TelemetrySnapshot(
+            timestamp=1700000000 + i,
+            meters=meters,
+            soe=50 + i,
+            grid_status=GridStatus.CONNECTED if i % 2 else GridStatus.ISLANDED,
+            batteries=batteries,
+            operation_mode=OperationMode.SELF_CONSUMPTION if i else None,
+        )
+
+
+@unittest.skipIf(pq is None, "pyarrow is not installed")
+class TestArrow(unittest.TestCase):
+    def test_batches(self):
+        batches = TelemetryBatches(chunk_size=4)
+        snapshot_batches = []
+        battery_batches = []
+        for snapshot in snapshots(5):
+            completed = batches.add(snapshot)
+            snapshot_batches.extend(completed[0])
+            battery_batches.extend(completed[1])
+
+        # 15 battery rows were added, of which 12 completed three batches
+        self.assertEqual([batch.num_rows for batch in snapshot_batches], [4])
+        self.assertEqual([batch.num_rows for batch in battery_batches], [4, 4, 4])
+        remaining = batches.flush()
+        self.assertEqual(remaining[0][0].num_rows, 1)
+        self.assertEqual(remaining[1][0].num_rows, 3)
+        self.assertEqual(batches.flush(), ([], []))
+
+        batches = TelemetryBatches(chunk_size=1, batteries=False)
+        completed = batches.add(next(snapshots(1)))
+        self.assertEqual(len(completed[0]), 1)
+        self.assertEqual(completed[1], [])
+
+        batch = snapshot_batches[0]
+        self.assertEqual(batch.schema.field("grid_status").type.index_type.bit_width, 8)
+        self.assertEqual(
+            batch.column("grid_status").to_pylist(),
+            ["SystemIslandedActive", "SystemGridConnected"] * 2,
+        )
+        self.assertEqual(
+            batch.column("operation_mode").to_pylist()[:2], [None, "self_consumption"]
+        )
+        self.assertEqual(
+            batch.column("site_instant_power")[0].as_py(),
+            METERS_AGGREGATES_RESPONSE["site"]["instant_power"],
+        )
+
+    def test_export_parquet(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "snapshots.parquet")
+            battery_path = os.path.join(directory, "batteries.parquet")
+            export_parquet(snapshots(25), path, battery_path, chunk_size=10)
+
+            table = pq.read_table(path)
+            self.assertEqual(table.num_rows, 25)
+            self.assertEqual(table.column("soe").to_pylist(), list(range(50, 75)))
+            self.assertEqual(
+                table.column("timestamp")[1].as_py().timestamp(), 1700000001
+            )
+
+            batteries = pq.read_table(battery_path)
+            self.assertEqual(batteries.num_rows, 75)
+            self.assertEqual(
+                batteries.column("grid_state").to_pylist()[2], GridState.DISABLED.value
+            )
+            self.assertIsNone(batteries.column("p_out")[2].as_py())
+
+    def test_export_parquet_without_batteries(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "snapshots.parquet")
+            with ParquetExporter(path, chunk_size=10) as exporter:
+                for snapshot in snapshots(25):
+                    exporter.write(snapshot)
+                # Battery rows are not buffered without a battery file
+                self.assertEqual(exporter._batches._batteries._rows, 0)
+            self.assertEqual(pq.read_table(path).num_rows, 25)
@@ -0,0 +1,183 @@
+import math
+import unittest
+from unittest import mock
+
+from tesla_powerwall import GridState, SystemStatusResponse, battery_table
+from tesla_powerwall.battery_table import BatteryBlockTable
+from tesla_powerwall.responses import BatteryResponse
+from tests.unit import SYSTEM_STATUS_RESPONSE
+
+
+def battery(serial_number: str, **values) -> BatteryResponse:
+    block = {
+        **SYSTEM_STATUS_RESPONSE["battery_blocks"][0],
+        "PackageSerialNumber": serial_number,
+        **values,
+    }
+    return BatteryResponse.from_dict(block)
+
+
+def disabled_battery(serial_number: str) -> BatteryResponse:
+    block = {
+        "PackagePartNumber": "XXX-G",
+        "PackageSerialNumber": serial_number,
+        "disabled_reasons": ["DisabledExcessiveVoltageDrop"],
+        "pinv_grid_state": "",
+        "wobble_detected": False,
+    }
+    for key in (
+        "energy_charged",
+        "energy_discharged",
+        "f_out",
+        "i_out",
+        "nominal_energy_remaining",
+        "nominal_full_pack_energy",
+        "p_out",
+        "q_out",
+        "v_out",
+    ):
+        block[key] = None
+    return BatteryResponse.from_dict(block)
+
+
+class TestBatteryBlockTable(unittest.TestCase):
+    def test_from_system_status(self):
+        status = SystemStatusResponse.from_dict(SYSTEM_STATUS_RESPONSE)
+        table = BatteryBlockTable.from_system_status(status, timestamp=1)
+
+        self.assertEqual(len(table), len(status.batteries))
+        self.assertEqual(
+            table.values("p_out"),
+            [b.p_out for b in status.batteries if b.p_out is not None],
+        )
+        self.assertEqual(
+            list(table.mask("p_out")),
+            [b.p_out is not None for b in status.batteries],
+        )
+        self.assertEqual(table.grid_state(0), GridState.COMPLIANT)
+        with self.assertRaises(KeyError):
+            table.column("grid_state")
+
+    def test_disabled_packs(self):
+        table = BatteryBlockTable.from_batteries(
+            [battery("A"), disabled_battery("B")], timestamp=1
+        )
+
+        self.assertEqual(list(table.disabled()), [0, 1])
+        self.assertEqual(list(table.mask("v_out")), [1, 0])
+        self.assertTrue(math.isnan(table.column("v_out")[1]))
+        self.assertEqual(table.values("v_out"), [table.column("v_out")[0]])
+        self.assertEqual(table.statistics("v_out").count, 1)
+        self.assertIsNone(table.statistics("v_out", rows=[1]))
+
+    def test_history_and_lookup(self):
+        table = BatteryBlockTable()
+        for t in range(3):
+            table.append(
+                [
+                    battery("A", p_out=100 * t, wobble_detected=t == 1),
+                    battery("B", p_out=-100 * t, wobble_detected=True),
+                ],
+                timestamp=t,
+            )
+
+        self.assertEqual(len(table), 6)
+        self.assertEqual(table.rows("A"), [0, 2, 4])
+        self.assertEqual(table.rows("C"), [])
+        self.assertEqual(table.latest_rows(), [4, 5])
+        self.assertEqual(table.values("p_out", table.rows("A")), [0, 100, 200])
+        self.assertEqual(table.wobble_counts(), {"A": 1, "B": 3})
+
+        stats = table.statistics("p_out", table.latest_rows())
+        self.assertEqual(stats.spread, 400)
+        self.assertEqual(stats.mean, 0)
+        self.assertEqual(stats.stdev, 200)
+
+    def test_imbalance_and_outliers(self):
+        table = BatteryBlockTable.from_batteries(
+            [
+                battery(
+                    str(i),
+                    nominal_energy_remaining=5000 + 100 * i,
+                    nominal_full_pack_energy=10000,
+                    f_out=50.0 if i < 9 else 51.0,
+                )
+                for i in range(10)
+            ]
+            + [disabled_battery("disabled")],
+            timestamp=1,
+        )
+
+        self.assertAlmostEqual(table.imbalance(), 9.0)
+        self.assertAlmostEqual(table.state_of_charge([9])[0], 59.0)
+        self.assertEqual(table.outliers("f_out", threshold=2), [9])
+        self.assertEqual(table.outliers("q_out"), [])
+
+    def test_outliers_small_site(self):
+        # With the mean and standard deviation, one of three packs can never
+        # deviate more than sqrt(2) standard deviations
+        table = BatteryBlockTable.from_batteries(
+            [
+                battery("A", v_out=230.1),
+                battery("B", v_out=230.3),
+                battery("C", v_out=190.0),
+                disabled_battery("D"),
+            ],
+            timestamp=1,
+        )
+        for np in (battery_table.np, None):
+            with mock.patch.object(battery_table, "np", np):
+                self.assertEqual(table.outliers("v_out"), [2])
+                self.assertEqual(table.outliers("v_out", rows=[0, 1]), [])
+                self.assertEqual(table.outliers("v_out", rows=[3]), [])
+
+
+@unittest.skipIf(battery_table.np is None, "numpy is not installed")
+class TestBatteryBlockTableNumpy(unittest.TestCase):
+    def test_same_results(self):
+        table = BatteryBlockTable()
+        for t in range(4):
+            table.append(
+                [
+                    battery(
+                        str(i),
+                        nominal_energy_remaining=5000 + 130 * i * t,
+                        nominal_full_pack_energy=0 if i == 3 else 10000 + i,
+                        p_out=-1000 + 700 * i - 10 * t,
+                    )
+                    for i in range(6)
+                ]
+                + [disabled_battery("disabled")],
+                timestamp=t,
+            )
+
+        for rows in (None, table.rows("2"), table.latest_rows(), []):
+            with mock.patch.object(battery_table, "np", None):
+                expected = (
+                    table.values("p_out", rows),
+                    table.statistics("p_out", rows),
+                    table.state_of_charge(rows),
+                    table.outliers("p_out", 1.0, rows),
+                    table.imbalance(rows),
+                )
+            actual = (
+                table.values("p_out", rows),
+                table.statistics("p_out", rows),
+                table.state_of_charge(rows),
+                table.outliers("p_out", 1.0, rows),
+                table.imbalance(rows),
+            )
+            self.assertEqual(actual[0], expected[0])
+            if expected[1] is None:
+                self.assertIsNone(actual[1])
+            else:
+                for name in ("count", "mean", "minimum", "maximum", "stdev"):
+                    self.assertAlmostEqual(
+                        getattr(actual[1], name), getattr(expected[1], name)
+                    )
+            self.assertEqual(
+                [None if math.isnan(x) else round(x, 9) for x in actual[2]],
+                [None if math.isnan(x) else round(x, 9) for x in expected[2]],
+            )
+            self.assertEqual(actual[3], expected[3])
+            self.assertAlmostEqual(actual[4], expected[4])
@@ -0,0 +1,59 @@
+import pickle
+import unittest
+
+from tesla_powerwall import SnapshotDecodeError
+from tesla_powerwall.binary import (
+    pack_snapshot,
+    pack_snapshot_into,
+    packed_size,
+    unpack_snapshot,
+)
+from tests.unit import snapshot
+
+
+class TestBinary(unittest.TestCase):
+    def test_round_trip(self):
+        expected = snapshot(1)
+        expected.batteries[1].disabled_reasons = ["DisabledExcessiveVoltageDrop"]
+        data = pack_snapshot(expected)
+        self.assertEqual(len(data), packed_size(expected))
+
+        decoded = unpack_snapshot(data)
+        self.assertEqual(decoded.timestamp, expected.timestamp)
+        self.assertEqual(decoded.soe, expected.soe)
+        self.assertEqual(decoded.grid_status, expected.grid_status)
+        self.assertEqual(decoded.operation_mode, expected.operation_mode)
+        self.assertEqual(decoded.meters.meters, expected.meters.meters)
+        self.assertEqual(decoded.meters.site, expected.meters.site)
+        self.assertEqual(decoded.batteries, expected.batteries)
+        self.assertIsNone(decoded.batteries[2].p_out)
+        self.assertIsNone(unpack_snapshot(pack_snapshot(snapshot(0))).operation_mode)
+
+        self.assertLess(len(data), len(pickle.dumps(expected)))
+
+    def test_pack_into(self):
+        expected = snapshot(2)
+        buffer = bytearray(4096)
+        size = pack_snapshot_into(expected, memoryview(buffer), 100)
+        self.assertEqual(bytes(buffer[100 : 100 + size]), pack_snapshot(expected))
+        self.assertEqual(
+            unpack_snapshot(buffer, 100).meters.meters, expected.meters.meters
+        )
+        with self.assertRaises(ValueError):
+            pack_snapshot_into(expected, memoryview(bytearray(size - 1)))
+
+    def test_invalid(self):
+        data = pack_snapshot(snapshot(0))
+        with self.assertRaises(SnapshotDecodeError):
+            unpack_snapshot(b"XXXX" + data[4:])
+        with self.assertRaises(SnapshotDecodeError):
+            unpack_snapshot(data[:4] + b"\x02" + data[5:])
+        with self.assertRaises(SnapshotDecodeError):
+            unpack_snapshot(data[:100])
+        with self.assertRaises(SnapshotDecodeError):
+            unpack_snapshot(data[:3])
+
+        long_serial = snapshot(0)
+        long_serial.batteries[0].serial_number = "X" * 33
+        with self.assertRaises(ValueError):
+            pack_snapshot(long_serial)
@@ -0,0 +1,62 @@
+import math
+import unittest
+
+from tesla_powerwall import GridStatus, PowerwallError
+from tesla_powerwall.board import SnapshotBoard
+from tests.unit import snapshot
+
+
+class TestSnapshotBoard(unittest.TestCase):
+    def setUp(self):
+        self.board = SnapshotBoard.create(size=8192)
+        self.reader = SnapshotBoard.attach(self.board.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.board.close()
+
+    def test_publish_and_read(self):
+        self.assertIsNone(self.reader.read())
+        self.assertIsNone(self.reader.read_summary())
+
+        for i in range(3):
+            expected = snapshot(i)
+            self.board.publish(expected)
+
+        self.assertEqual(self.reader.sequence, 6)
+        decoded = self.reader.read()
+        self.assertEqual(decoded.timestamp, expected.timestamp)
+        self.assertEqual(decoded.meters.meters, expected.meters.meters)
+        self.assertEqual(decoded.batteries, expected.batteries)
+
+        summary = self.reader.read_summary()
+        self.assertEqual(summary.sequence, 6)
+        self.assertEqual(summary.soe, expected.soe)
+        self.assertEqual(summary.site_power, expected.meters.site.instant_power)
+        self.assertEqual(summary.load_power, expected.meters.load.instant_power)
+        self.assertEqual(summary.grid_status, GridStatus.CONNECTED)
+
+    def test_missing_meter(self):
+        expected = snapshot(0)
+        del expected.meters.meters[expected.meters.solar.meter]
+        self.board.publish(expected)
+        self.assertTrue(math.isnan(self.reader.read_summary().solar_power))
+
+    def test_inconsistent(self):
+        self.board.publish(snapshot(0))
+        # Simulate a writer which stopped in the middle of an update
+        self.board._buffer[8] += 1
+        with self.assertRaises(PowerwallError):
+            self.reader.read(retries=10)
+        with self.assertRaises(PowerwallError):
+            self.reader.read_summary(retries=10)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            SnapshotBoard.create(size=16)
+        small = SnapshotBoard.create(size=256)
+        try:
+            with self.assertRaises(ValueError):
+                small.publish(snapshot(0))
+        finally:
+            small.close()
@@ -0,0 +1,185 @@
+import io
+import json
+import os
+import unittest
+from unittest import mock
+
+import aresponses
+import orjson
+
+from tesla_powerwall.cli import _latency_statistics, main, parse_args, run
+from tests.unit import (
+    ENDPOINT,
+    ENDPOINT_HOST,
+    ENDPOINT_PATH,
+    GRID_STATUS_RESPONSE,
+    METERS_AGGREGATES_RESPONSE,
+    OPERATION_RESPONSE,
+    STATUS_RESPONSE,
+    SYSTEM_STATUS_RESPONSE,
+)
+
+
+class TestCli(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.aresponses = aresponses.ResponsesMockServer()
+        await self.aresponses.__aenter__()
+
+    async def asyncTearDown(self):
+        await self.aresponses.__aexit__(None, None, None)
+
+    def add_response(self, path, body=None, method="GET", repeat=1, status=200):
+        self.aresponses.add(
+            ENDPOINT_HOST,
+            f"{ENDPOINT_PATH}{path}",
+            method,
+            self.aresponses.Response(
+                status=status,
+                headers={"Content-Type": "application/json"},
+                text=json.dumps(body),
+            ),
+            repeat=repeat,
+        )
+
+    def add_snapshot_responses(self, repeat=1):
+        self.add_response(
+            "meters/aggregates", METERS_AGGREGATES_RESPONSE, repeat=repeat
+        )
+        self.add_response("system_status/soe", {"percentage": 53.5}, repeat=repeat)
+        self.add_response(
+            "system_status/grid_status", GRID_STATUS_RESPONSE, repeat=repeat
+        )
+        self.add_response("system_status", SYSTEM_STATUS_RESPONSE, repeat=repeat)
+        self.add_response("operation", OPERATION_RESPONSE, repeat=repeat)
+
+    async def run_cli(self, *argv):
+        # Ignore the credentials of the integration tests
+        with mock.patch.dict(os.environ, clear=True):
+            args = parse_args(["--host", ENDPOINT, *argv])
+        args.output = io.BytesIO()
+        await run(args)
+        return [orjson.loads(line) for line in args.output.getvalue().splitlines()]
+
+    async def test_snapshot(self):
+        self.add_snapshot_responses()
+        (snapshot,) = await self.run_cli("snapshot")
+
+        self.assertEqual(snapshot["soe"], 53.5)
+        self.assertEqual(snapshot["grid_status"], "SystemGridConnected")
+        self.assertEqual(snapshot["operation_mode"], "self_consumption")
+        self.assertEqual(
+            snapshot["meters"]["site"]["instant_power"],
+            METERS_AGGREGATES_RESPONSE["site"]["instant_power"],
+        )
+        self.assertEqual(snapshot["meters"]["site"]["meter"], "site")
+        self.assertEqual(len(snapshot["batteries"]), 3)
+        self.assertNotIn("_raw", snapshot["batteries"][0])
+        self.aresponses.assert_plan_strictly_followed()
+
+    async def test_watch_logs_in_once(self):
+        logins = []
+
+        def login(request):
+            logins.append(request)
+            response = self.aresponses.Response(
+                headers={"Content-Type": "application/json"},
+                text=json.dumps(
+                    {
+                        "email": "",
+                        "firstname": "Tesla",
+                        "lastname": "Energy",
+                        "roles": ["Home_Owner"],
+                        "token": "x4jbH...XMP8w==",
+                        "provider": "Basic",
+                        "loginTime": "2023-03-25T13:10:48.9029581+01:00",
+                    }
+                ),
+            )
+            response.set_cookie("AuthCookie", "foo")
+            return response
+
+        self.aresponses.add(ENDPOINT_HOST, f"{ENDPOINT_PATH}login/Basic", "POST", login)
+        self.add_snapshot_responses(repeat=3)
+
+        snapshots = await self.run_cli(
+            "--password", "password", "watch", "--interval", "0.01", "--count", "3"
+        )
+
+        self.assertEqual(len(snapshots), 3)
+        self.assertEqual(len(logins), 1)
+        # The requests of a snapshot are sent concurrently in any order
+        self.aresponses.assert_no_unused_routes()
+        self.aresponses.assert_all_requests_matched()
+
+    async def test_record(self):
+        self.add_response("status", STATUS_RESPONSE, repeat=2)
+        self.add_response("unknown", status=404, repeat=2)
+
+        records = await self.run_cli(
+            "record",
+            "--interval",
+            "0.01",
+            "--count",
+            "2",
+            "--endpoint",
+            "status",
+            "--endpoint",
+            "unknown",
+        )
+
+        self.assertEqual(
+            [record["endpoint"] for record in records],
+            ["status", "unknown", "status", "unknown"],
+        )
+        self.assertEqual(records[0]["response"], STATUS_RESPONSE)
+        self.assertIn("404", records[1]["error"])
+        self.assertEqual(records[0]["timestamp"], records[1]["timestamp"])
+
+    async def test_bench(self):
+        # The failed warmup request is not counted as an error
+        self.add_response("status", status=502)
+        self.add_response("status", STATUS_RESPONSE, repeat=2)
+        self.add_response("status", status=502)
+
+        (result,) = await self.run_cli(
+            "bench", "--requests", "3", "--warmup", "1", "--endpoint", "status"
+        )
+
+        self.assertEqual(result["endpoint"], "status")
+        self.assertEqual(result["requests"], 3)
+        self.assertEqual(result["errors"], 1)
+        self.assertLessEqual(result["min_ms"], result["median_ms"])
+        self.assertLessEqual(result["median_ms"], result["p95_ms"])
+        self.assertLessEqual(result["p95_ms"], result["max_ms"])
+        self.aresponses.assert_plan_strictly_followed()
+
+
+class TestCliArguments(unittest.TestCase):
+    def test_host_from_environment(self):
+        with mock.patch.dict(os.environ, {"POWERWALL_IP": "1.2.3.4"}):
+            self.assertEqual(parse_args(["snapshot"]).host, "1.2.3.4")
+
+        with mock.patch.dict(os.environ, clear=True):
+            with mock.patch("sys.stderr", io.StringIO()):
+                with self.assertRaises(SystemExit):
+                    parse_args(["snapshot"])
+                with self.assertRaises(SystemExit):
+                    parse_args(["--host", "1.2.3.4", "watch", "--interval", "0"])
+
+        args = parse_args(["--host", "1.2.3.4", "--timeout", "2.5", "snapshot"])
+        self.assertEqual(args.timeout, 2.5)
+
+    def test_unreachable(self):
+        with mock.patch("sys.stderr", io.StringIO()) as stderr:
+            self.assertEqual(
+                main(["--host", "127.0.0.1:1", "--timeout", "1", "snapshot"]), 1
+            )
+        self.assertIn("unreachable", stderr.getvalue())
+
+    def test_latency_statistics(self):
+        statistics = _latency_statistics([i / 1000 for i in range(20, 0, -1)])
+        self.assertAlmostEqual(statistics["min_ms"], 1)
+        self.assertAlmostEqual(statistics["median_ms"], 10.5)
+        self.assertAlmostEqual(statistics["p95_ms"], 19)
+        self.assertAlmostEqual(statistics["max_ms"], 20)
+        self.assertIsNone(_latency_statistics([])["p95_ms"])
@@ -0,0 +1,93 @@
+import io
+import math
+import unittest
+
+from tesla_powerwall import SnapshotDecodeError
+from tesla_powerwall.delta import (
+    SnapshotDecoder,
+    SnapshotEncoder,
+    dump_snapshots,
+    load_snapshots,
+)
+from tests.unit import METERS_AGGREGATES_RESPONSE, snapshot
+
+
+class TestDelta(unittest.TestCase):
+    def assertSnapshotEqual(self, decoded, expected):
+        self.assertEqual(decoded.timestamp, expected.timestamp)
+        self.assertEqual(decoded.soe, expected.soe)
+        self.assertEqual(decoded.grid_status, expected.grid_status)
+        self.assertEqual(decoded.operation_mode, expected.operation_mode)
+        self.assertEqual(decoded.meters.meters, expected.meters.meters)
+        self.assertEqual(decoded.batteries, expected.batteries)
+
+    def test_round_trip(self):
+        encoder = SnapshotEncoder(keyframe_interval=4)
+        decoder = SnapshotDecoder()
+        frames = []
+        for i in range(10):
+            expected = snapshot(i)
+            frame = encoder.encode(expected)
+            frames.append(frame)
+            self.assertSnapshotEqual(decoder.decode(frame), expected)
+
+        self.assertEqual([frame[4] for frame in frames], list(b"KDDDKDDDKD"))
+        self.assertLess(len(frames[1]) * 4, len(frames[0]))
+        # Types of the values are preserved
+        decoded = decoder.decode(encoder.encode(snapshot(10)))
+        self.assertIsInstance(decoded.batteries[0].p_out, int)
+        self.assertIsInstance(decoded.meters.site.frequency, float)
+
+    def test_layout_change_and_special_values(self):
+        encoder = SnapshotEncoder()
+        decoder = SnapshotDecoder()
+        decoder.decode(encoder.encode(snapshot(0)))
+
+        meters = dict(METERS_AGGREGATES_RESPONSE)
+        del meters["solar"]
+        expected = snapshot(1, meters)
+        frame = encoder.encode(expected)
+        self.assertEqual(frame[4], ord("K"))
+        self.assertSnapshotEqual(decoder.decode(frame), expected)
+
+        expected = snapshot(2, meters)
+        expected.meters.site.instant_power = -0.0
+        expected.meters.load.instant_power = math.nan
+        expected.batteries[1].disabled_reasons = ["DisabledExcessiveVoltageDrop"]
+        decoded = decoder.decode(encoder.encode(expected))
+        self.assertEqual(math.copysign(1, decoded.meters.site.instant_power), -1)
+        self.assertTrue(math.isnan(decoded.meters.load.instant_power))
+        self.assertEqual(
+            decoded.batteries[1].disabled_reasons, ["DisabledExcessiveVoltageDrop"]
+        )
+
+    def test_invalid_frames(self):
+        encoder = SnapshotEncoder()
+        keyframe = encoder.encode(snapshot(0))
+        encoder.encode(snapshot(1))
+        delta = encoder.encode(snapshot(2))
+
+        decoder = SnapshotDecoder()
+        with self.assertRaises(SnapshotDecodeError):
+            decoder.decode(delta)
+        with self.assertRaises(SnapshotDecodeError):
+            decoder.decode(b"XYZ" + keyframe[3:])
+        with self.assertRaises(SnapshotDecodeError):
+            decoder.decode(keyframe[:-3])
+        decoder.decode(keyframe)
+        # The delta of frame 1 is missing
+        with self.assertRaises(SnapshotDecodeError):
+            decoder.decode(delta)
+
+    def test_dump_and_load(self):
+        expected = [snapshot(i) for i in range(20)]
+        file = io.BytesIO()
+        dump_snapshots(expected, file, keyframe_interval=8)
+        file.seek(0)
+        decoded = list(load_snapshots(file))
+        self.assertEqual(len(decoded), 20)
+        for decoded_snapshot, expected_snapshot in zip(decoded, expected):
+            self.assertSnapshotEqual(decoded_snapshot, expected_snapshot)
+
+        with self.assertRaises(SnapshotDecodeError):
+            list(load_snapshots(io.BytesIO(file.getvalue()[:-1])))
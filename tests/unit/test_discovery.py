@@ -0,0 +1,161 @@
+import asyncio
+import io
+import json
+import os
+import time
+import unittest
+from unittest import mock
+
+import aresponses
+
+from tesla_powerwall import DiscoveredGateway, discover
+from tesla_powerwall.cli import parse_args, run
+from tesla_powerwall.discovery import expand, identify
+from tests.unit import ENDPOINT_PATH, STATUS_RESPONSE
+
+DIN = "1232100-00-E--TG123456789ABC"
+
+
+class TestTargets(unittest.TestCase):
+    def test_expand(self):
+        self.assertEqual(list(expand(["10.0.0.0/30"])), ["10.0.0.1", "10.0.0.2"])
+        self.assertEqual(list(expand(["10.0.0.7/32"])), ["10.0.0.7"])
+        self.assertEqual(
+            list(expand(["10.0.0.254-10.0.1.1"])),
+            ["10.0.0.254", "10.0.0.255", "10.0.1.0", "10.0.1.1"],
+        )
+        self.assertEqual(
+            list(expand(["192.168.91.1", "10.0.0.3-4", "powerwall-2.local"])),
+            ["192.168.91.1", "10.0.0.3", "10.0.0.4", "powerwall-2.local"],
+        )
+        self.assertEqual(len(list(expand(["192.168.1.0/24"]))), 254)
+
+        self.assertEqual(list(expand(["fe80::1", "gateway."])), ["fe80::1", "gateway."])
+
+        for target in (
+            "10.0.0.5-3",
+            "10.0.0.1-fe80::1",
+            "10.0.0.0/33",
+            "bad host",
+            "",
+            "-powerwall.local",
+            "powerwall..local",
+            "a" * 64,
+        ):
+            with self.assertRaises(ValueError):
+                # Before any address of the valid target is yielded
+                next(expand(["10.0.0.1", target]))
+
+    def test_identify(self):
+        gateway = identify("10.0.0.2", {**STATUS_RESPONSE, "din": DIN}, 0.01)
+        self.assertEqual(
+            gateway, DiscoveredGateway("10.0.0.2", "hec", "1.50.1 c58c2df3", DIN, 0.01)
+        )
+        self.assertIsNone(identify("10.0.0.2", STATUS_RESPONSE, 0.01).din)
+
+        self.assertIsNone(identify("10.0.0.2", {}, 0.01))
+        self.assertIsNone(identify("10.0.0.2", [], 0.01))
+        self.assertIsNone(identify("10.0.0.2", {"version": "1.0"}, 0.01))
+
+
+class TestDiscover(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.aresponses = aresponses.ResponsesMockServer()
+        await self.aresponses.__aenter__()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # host -> (delay, status, body) of the hosts which answer
+        self.hosts = {}
+        self.aresponses.add(
+            self.aresponses.ANY,
+            f"{ENDPOINT_PATH}status",
+            "GET",
+            self.status,
+            repeat=self.aresponses.INFINITY,
+        )
+
+    async def asyncTearDown(self):
+        await self.aresponses.__aexit__(None, None, None)
+
+    async def status(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Hosts without a gateway do not answer
+            delay, status, body = self.hosts.get(request.host, (10, 200, ""))
+            await asyncio.sleep(delay)
+            return self.aresponses.Response(status=status, text=body)
+        finally:
+            self.in_flight -= 1
+
+    def add_gateway(self, host, delay=0.0, din=None):
+        status = dict(STATUS_RESPONSE, **({"din": din} if din else {}))
+        self.hosts[host] = (delay, 200, json.dumps(status))
+
+    async def test_discover(self):
+        self.add_gateway("10.0.0.3", delay=0.1)
+        self.add_gateway("10.0.0.50", din=DIN)
+        self.hosts["10.0.0.5"] = (0, 404, "")
+        self.hosts["10.0.0.6"] = (0, 200, "<html></html>")
+        self.hosts["10.0.0.7"] = (0, 200, json.dumps({"status": "ok"}))
+
+        start = time.monotonic()
+        gateways = [
+            gateway
+            async for gateway in discover(["10.0.0.0/26"], concurrency=32, timeout=0.5)
+        ]
+        # 62 hosts in 2 rounds of at most 0.5 s
+        self.assertLess(time.monotonic() - start, 2)
+
+        # In the order in which they answered, not by address
+        self.assertEqual(
+            [(gateway.address, gateway.din) for gateway in gateways],
+            [("10.0.0.3", None), ("10.0.0.50", DIN)],
+        )
+        self.assertEqual(gateways[0].device_type, "hec")
+        self.assertEqual(gateways[0].version, "1.50.1 c58c2df3")
+        self.assertGreaterEqual(gateways[0].latency, 0.1)
+        self.assertLessEqual(self.max_in_flight, 32)
+
+    async def test_concurrency(self):
+        self.add_gateway("10.0.0.9")
+        gateways = [
+            gateway
+            async for gateway in discover(["10.0.0.1-10"], concurrency=3, timeout=0.1)
+        ]
+        self.assertEqual([gateway.address for gateway in gateways], ["10.0.0.9"])
+        self.assertEqual(self.max_in_flight, 3)
+
+    async def test_close(self):
+        self.add_gateway("10.0.0.1")
+        gateways = discover(["10.0.0.1-4"], timeout=10)
+        start = time.monotonic()
+        self.assertEqual((await gateways.__anext__()).address, "10.0.0.1")
+        # Cancels the requests to the other hosts
+        await gateways.aclose()
+        self.assertLess(time.monotonic() - start, 1)
+
+    async def test_invalid_target(self):
+        with self.assertRaises(ValueError):
+            async for _ in discover(["10.0.0.0/26", "bad host"], timeout=0.1):
+                pass
+        self.assertEqual(self.max_in_flight, 0)
+
+    async def test_cli(self):
+        self.add_gateway("10.0.0.2", din=DIN)
+        with mock.patch.dict(os.environ, clear=True):
+            args = parse_args(["discover", "10.0.0.1-3", "--host-timeout", "0.1"])
+        args.output = io.BytesIO()
+        await run(args)
+
+        (line,) = args.output.getvalue().splitlines()
+        self.assertEqual(
+            json.loads(line),
+            {
+                "address": "10.0.0.2",
+                "device_type": "hec",
+                "version": "1.50.1 c58c2df3",
+                "din": DIN,
+                "latency": mock.ANY,
+            },
+        )
@@ -0,0 +1,184 @@
+import gzip
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import aresponses
+
+from tesla_powerwall import API, ApiError, DownloadResult, ResponseTooLargeError
+from tests.unit import ENDPOINT, ENDPOINT_HOST, ENDPOINT_PATH
+
+LOGS = b"".join(b"2023-03-25 13:10:48 log line %d\n" % i for i in range(20000))
+
+
+class AsyncSink:
+    def __init__(self):
+        self.chunks = []
+
+    async def write(self, data):
+        self.chunks.append(data)
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.calls = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.calls.append(getattr(fn, "__name__", None))
+        return super().submit(fn, *args, **kwargs)
+
+
+class TestDownload(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.aresponses = aresponses.ResponsesMockServer()
+        await self.aresponses.__aenter__()
+        self.api = API(ENDPOINT)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "logs")
+
+    async def asyncTearDown(self):
+        await self.api.close()
+        await self.aresponses.__aexit__(None, None, None)
+        self.directory.cleanup()
+
+    def add_logs(self, handler=None, status=200, body=LOGS):
+        self.aresponses.add(
+            ENDPOINT_HOST,
+            f"{ENDPOINT_PATH}getlogs",
+            "GET",
+            handler or self.aresponses.Response(status=status, body=body),
+        )
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    async def test_download_to_path(self):
+        self.add_logs()
+        progress = []
+
+        result = await self.api.download_logs(
+            self.path, chunk_size=4096, progress=progress.append
+        )
+
+        self.assertIsInstance(result, DownloadResult)
+        self.assertEqual(self.read(), LOGS)
+        self.assertTrue(result.complete)
+        self.assertEqual(result.bytes_received, len(LOGS))
+        self.assertEqual(result.bytes_written, len(LOGS))
+        self.assertEqual(result.resumed_from, 0)
+        self.assertGreater(result.bytes_per_second, 0)
+        self.assertTrue(progress)
+        self.aresponses.assert_plan_strictly_followed()
+
+    async def test_file_io_in_executor(self):
+        self.add_logs()
+        executor = RecordingExecutor()
+        loop_thread = threading.get_ident()
+        threads = set()
+        api = API(ENDPOINT, executor=executor)
+        try:
+            with mock.patch(
+                "tesla_powerwall.download.open",
+                side_effect=lambda *args: (
+                    threads.add(threading.get_ident()) or open(*args)
+                ),
+                create=True,
+            ):
+                result = await api.download_logs(self.path, chunk_size=4096)
+        finally:
+            await api.close()
+            executor.shutdown()
+
+        self.assertEqual(self.read(), LOGS)
+        # The file was opened, written and closed in the executor
+        self.assertEqual(len(threads), 1)
+        self.assertNotIn(loop_thread, threads)
+        self.assertEqual(executor.calls[-1], "close")
+        self.assertEqual(executor.calls.count("write"), len(executor.calls) - 2)
+        self.assertGreaterEqual(len(executor.calls) - 2, len(LOGS) // 4096)
+        self.assertTrue(result.complete)
+        self.aresponses.assert_plan_strictly_followed()
+
+    async def test_gzip_to_async_sink(self):
+        self.add_logs()
+        sink = AsyncSink()
+
+        result = await self.api.download_logs(sink, compression="gzip")
+
+        data = b"".join(sink.chunks)
+        self.assertEqual(gzip.decompress(data), LOGS)
+        self.assertEqual(result.bytes_written, len(data))
+        self.assertLess(result.bytes_written, result.bytes_received)
+
+    async def test_max_size(self):
+        self.add_logs()
+        with self.assertRaises(ResponseTooLargeError) as context:
+            await self.api.download_logs(self.path, max_size=1000)
+        self.assertEqual(context.exception.max_size, 1000)
+        self.assertIsInstance(context.exception, ApiError)
+
+        # Without a content length the download stops once the cap is reached
+        async def chunked(request):
+            response = self.aresponses.Response()
+            response.enable_chunked_encoding()
+            await response.prepare(request)
+            for start in range(0, len(LOGS), 8192):
+                await response.write(LOGS[start : start + 8192])
+            await response.write_eof()
+            return response
+
+        self.add_logs(chunked)
+        with self.assertRaises(ResponseTooLargeError):
+            await self.api.download_logs(self.path, compression="gzip", max_size=100000)
+        # The data received before the cap is still readable
+        with gzip.open(self.path) as f:
+            partial = f.read()
+        self.assertLessEqual(len(partial), 100000)
+        self.assertTrue(LOGS.startswith(partial))
+
+    async def test_resume(self):
+        with open(self.path, "wb") as f:
+            f.write(LOGS[:1000])
+
+        def partial(request):
+            self.assertEqual(request.headers["Range"], "bytes=1000-")
+            return self.aresponses.Response(status=206, body=LOGS[1000:])
+
+        self.add_logs(partial)
+        result = await self.api.download_logs(self.path, resume=True)
+        self.assertEqual(self.read(), LOGS)
+        self.assertEqual(result.resumed_from, 1000)
+        self.assertEqual(result.bytes_received, len(LOGS) - 1000)
+
+        # The file is complete
+        self.add_logs(status=416, body=b"")
+        result = await self.api.download_logs(self.path, resume=True)
+        self.assertTrue(result.complete)
+        self.assertEqual(result.bytes_received, 0)
+        self.assertEqual(self.read(), LOGS)
+
+        # Range requests are not supported, so the download starts over
+        with open(self.path, "wb") as f:
+            f.write(b"stale")
+        self.add_logs()
+        result = await self.api.download_logs(self.path, resume=True)
+        self.assertEqual(result.resumed_from, 0)
+        self.assertEqual(self.read(), LOGS)
+        self.aresponses.assert_plan_strictly_followed()
+
+    async def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            await self.api.download_logs(self.path, compression="gzip", resume=True)
+        with self.assertRaises(ValueError):
+            await self.api.download_logs(AsyncSink(), resume=True)
+
+    async def test_error_status(self):
+        self.add_logs(status=500, body=b"internal error")
+        with self.assertRaises(ApiError):
+            await self.api.download_logs(self.path)
+        self.assertFalse(os.path.exists(self.path))
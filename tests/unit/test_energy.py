@@ -0,0 +1,227 @@
+import copy
+import math
+import random
+import unittest
+from unittest import mock
+
+from tesla_powerwall import MetersAggregatesResponse, MeterType, energy
+from tesla_powerwall.energy import (
+    METER_POWER_SIGNS,
+    EnergyIntegrator,
+    PowerIntegrator,
+    detect_counter_resets,
+    integrate_power,
+    total_energy,
+)
+from tesla_powerwall.history import MeterHistory
+from tests.unit import METERS_AGGREGATES_RESPONSE
+
+
+class TestEnergy(unittest.TestCase):
+    def test_total_energy(self):
+        # 1 kW for one hour, then -1 kW for one hour
+        self.assertEqual(total_energy([0, 3600], [1000, 1000]), (1000, 0))
+        self.assertEqual(total_energy([0, 3600], [-1000, -1000]), (0, 1000))
+        # Linear ramp from 1 kW to -1 kW crosses zero after half an hour
+        self.assertEqual(total_energy([0, 3600], [1000, -1000]), (250, 250))
+        self.assertEqual(total_energy([0, 3600, 7200], [1000, 1000, 1000], 60), (0, 0))
+
+    def test_integrate_power_intervals(self):
+        timestamps = [float(t) for t in range(0, 7201, 60)]
+        power = [3600.0] * len(timestamps)
+        intervals = integrate_power(timestamps, power, interval=3600)
+        self.assertEqual([i.start for i in intervals], [0, 3600])
+        self.assertAlmostEqual(intervals[0].imported, 3600)
+        self.assertAlmostEqual(intervals[1].imported, 3600)
+        self.assertEqual(intervals[0].covered, 3600)
+
+        # Segments crossing an interval boundary are split
+        intervals = integrate_power(
+            [0, 1800, 5400], [0, 3600, 3600], interval=3600, max_gap=3600
+        )
+        self.assertAlmostEqual(intervals[0].imported, 900 + 1800)
+        self.assertAlmostEqual(intervals[1].imported, 1800)
+
+    def test_gaps(self):
+        intervals = integrate_power(
+            [0, 60, 4000, 4060], [1000] * 4, interval=3600, max_gap=120
+        )
+        self.assertEqual(len(intervals), 2)
+        self.assertAlmostEqual(intervals[0].imported, 1000 / 60)
+        self.assertEqual(intervals[0].covered, 60)
+        self.assertEqual(intervals[1].start, 3600)
+        self.assertEqual(intervals[1].covered, 60)
+
+    def test_counters(self):
+        self.assertEqual(detect_counter_resets([1, 5, 10, 2, 4, 3.5]), [3])
+
+        integrator = PowerIntegrator(interval=3600, max_gap=3600)
+        integrator.add(0, 1000, energy_imported=100, energy_exported=0)
+        integrator.add(1800, 1000, energy_imported=600, energy_exported=0)
+        # The counter was reset
+        completed = integrator.add(3600, 1000, energy_imported=5, energy_exported=0)
+        self.assertEqual(len(completed), 1)
+        self.assertEqual(completed[0].counter_imported, 500)
+        self.assertAlmostEqual(completed[0].imported, 1000)
+        self.assertAlmostEqual(completed[0].imported_difference, 500)
+        self.assertEqual(completed[0].exported_difference, 0)
+
+        completed = integrator.add(3700, 1000, energy_imported=40, energy_exported=0)
+        self.assertEqual(completed, [])
+        current = integrator.current
+        self.assertEqual(current.counter_resets, 1)
+        self.assertEqual(current.counter_imported, 5 + 35)
+
+    def test_energy_integrator(self):
+        integrator = EnergyIntegrator(interval=60)
+        meters = MetersAggregatesResponse.from_dict(METERS_AGGREGATES_RESPONSE)
+        integrator.add_meters(meters, 0)
+        completed = integrator.add_meters(meters, 90)
+        self.assertEqual(len(completed[MeterType.LOAD]), 1)
+        self.assertAlmostEqual(
+            completed[MeterType.LOAD][0].imported,
+            meters.load.instant_power * 60 / 3600,
+        )
+        self.assertEqual(completed[MeterType.LOAD][0].counter_imported, 0)
+
+    def test_reconcile_solar_and_battery(self):
+        # One hour at the constant power of the fixture: solar produced
+        # 6099 Wh, which its counters count as exported, and the battery
+        # charged with 10 Wh, which its counters count as imported
+        later = copy.deepcopy(METERS_AGGREGATES_RESPONSE)
+        later["solar"]["energy_exported"] += 6099.032958984375
+        later["battery"]["energy_imported"] += 10
+
+        integrator = EnergyIntegrator(interval=7200, max_gap=3600)
+        integrator.add_meters(
+            MetersAggregatesResponse.from_dict(METERS_AGGREGATES_RESPONSE), 0
+        )
+        integrator.add_meters(MetersAggregatesResponse.from_dict(later), 3600)
+
+        solar = integrator.integrator(MeterType.SOLAR).current
+        self.assertAlmostEqual(solar.exported, 6099.032958984375)
+        self.assertEqual(solar.imported, 0)
+        battery = integrator.integrator(MeterType.BATTERY).current
+        self.assertAlmostEqual(battery.imported, 10)
+        self.assertEqual(battery.exported, 0)
+        for interval in (solar, battery):
+            self.assertAlmostEqual(interval.imported_difference, 0)
+            self.assertAlmostEqual(interval.exported_difference, 0)
+
+        intervals = integrate_power(
+            [0, 3600],
+            [6099.0, 6099.0],
+            max_gap=3600,
+            sign=METER_POWER_SIGNS[MeterType.SOLAR],
+        )
+        self.assertAlmostEqual(intervals[0].exported, 6099)
+
+    def history(self):
+        # Ten samples a minute apart, the solar meter is missing from two
+        history = MeterHistory(10)
+        without_solar = copy.deepcopy(METERS_AGGREGATES_RESPONSE)
+        del without_solar["solar"]
+        for index in range(10):
+            later = copy.deepcopy(
+                without_solar if index in (2, 5) else METERS_AGGREGATES_RESPONSE
+            )
+            for meter in later.values():
+                meter["energy_imported"] += index
+            history.append(MetersAggregatesResponse.from_dict(later), index * 60.0)
+        return history
+
+    def test_history_with_gaps(self):
+        history = self.history()
+        timestamps = history.timestamps()
+        power = history.values(MeterType.SOLAR, "instant_power")
+        self.assertTrue(math.isnan(power[2]))
+        sign = METER_POWER_SIGNS[MeterType.SOLAR]
+        for np in (energy.np, None):
+            with mock.patch.object(energy, "np", np):
+                # The missing samples are bridged by their neighbours
+                imported, exported = total_energy(timestamps, power, sign=sign)
+                self.assertEqual(imported, 0)
+                self.assertAlmostEqual(exported, 6099.032958984375 * 540 / 3600)
+                # Unless they are too far apart
+                _, exported = total_energy(timestamps, power, 60, sign)
+                self.assertAlmostEqual(exported, 6099.032958984375 * 300 / 3600)
+
+                intervals = integrate_power(
+                    timestamps,
+                    power,
+                    max_gap=60,
+                    energy_imported=history.values(MeterType.SOLAR, "energy_imported"),
+                    sign=sign,
+                )
+                self.assertEqual(len(intervals), 1)
+                self.assertEqual(intervals[0].covered, 300)
+                self.assertAlmostEqual(intervals[0].counter_imported, 9)
+
+    def test_nan_power(self):
+        integrator = PowerIntegrator(interval=3600, max_gap=3600)
+        integrator.add(0, 1000, energy_imported=0)
+        self.assertEqual(integrator.add(1800, math.nan, energy_imported=5), [])
+        integrator.add(3599, 1000, energy_imported=10)
+        self.assertAlmostEqual(integrator.current.imported, 3599 / 3.6)
+        self.assertEqual(integrator.current.counter_imported, 10)
+
+
+@unittest.skipIf(energy.np is None, "numpy is not installed")
+class TestEnergyNumpy(unittest.TestCase):
+    def series(self):
+        rng = random.Random(1234)
+        timestamps, power, imported, exported = [], [], [], []
+        timestamp = 10.0
+        counter = 0.0
+        for index in range(2000):
+            # Mostly regular samples, some gaps and some duplicate timestamps
+            timestamp += rng.choice([0, 5, 10, 10, 10, 30, 400, 4000])
+            timestamps.append(timestamp)
+            power.append(float("nan") if index % 97 == 0 else rng.uniform(-3000, 3000))
+            counter = 0.0 if index % 500 == 499 else counter + rng.uniform(0, 5)
+            imported.append(counter)
+            exported.append(counter / 2)
+        return timestamps, power, imported, exported
+
+    def assertSameIntervals(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        for first, second in zip(actual, expected):
+            self.assertEqual((first.start, first.end), (second.start, second.end))
+            self.assertAlmostEqual(first.imported, second.imported, places=6)
+            self.assertAlmostEqual(first.exported, second.exported, places=6)
+            self.assertAlmostEqual(first.covered, second.covered, places=6)
+            for counter in ("counter_imported", "counter_exported"):
+                if getattr(second, counter) is None:
+                    self.assertIsNone(getattr(first, counter))
+                else:
+                    self.assertAlmostEqual(
+                        getattr(first, counter), getattr(second, counter), places=6
+                    )
+            self.assertEqual(first.counter_resets, second.counter_resets)
+
+    def test_integrate_power(self):
+        timestamps, power, imported, exported = self.series()
+        for kwargs in (
+            {},
+            {"interval": 60, "max_gap": 600, "sign": -1.0},
+            {"energy_imported": imported, "energy_exported": exported},
+            {"interval": 900, "energy_exported": exported},
+        ):
+            vectorized = integrate_power(timestamps, power, **kwargs)
+            with mock.patch.object(energy, "np", None):
+                expected = integrate_power(timestamps, power, **kwargs)
+            self.assertGreater(len(expected), 10)
+            self.assertSameIntervals(vectorized, expected)
+
+        self.assertEqual(integrate_power([], []), [])
+        with self.assertRaises(ValueError):
+            integrate_power([10, 5], [1, 1])
+
+    def test_total_energy(self):
+        timestamps, power, _, _ = self.series()
+        for max_gap, sign in ((math.inf, 1.0), (300, 1.0), (300, -1.0)):
+            vectorized = total_energy(timestamps, power, max_gap, sign)
+            with mock.patch.object(energy, "np", None):
+                expected = total_energy(timestamps, power, max_gap, sign)
+            self.assertAlmostEqual(vectorized[0], expected[0], places=6)
+            self.assertAlmostEqual(vectorized[1], expected[1], places=6)
@@ -0,0 +1,240 @@
+import asyncio
+import gc
+import io
+import json
+import unittest
+from unittest import mock
+
+import aiohttp
+import aresponses
+
+from tesla_powerwall import (
+    API,
+    FailoverAPI,
+    Powerwall,
+    RequestTimeoutError,
+)
+from tests.unit import ENDPOINT_PATH, STATUS_RESPONSE
+
+LAN = "1.1.1.1"
+WIFI = "192.168.91.1"
+
+
+class TestFailoverAPI(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.aresponses = aresponses.ResponsesMockServer()
+        await self.aresponses.__aenter__()
+        # (host, path, AuthCookie) of every request
+        self.requests = []
+
+    async def asyncTearDown(self):
+        await self.aresponses.__aexit__(None, None, None)
+
+    def add(
+        self,
+        host,
+        path,
+        body,
+        delay=0.0,
+        method="GET",
+        cookie=None,
+        repeat=1,
+        status=200,
+    ):
+        async def handler(request):
+            self.requests.append((host, path, request.cookies.get("AuthCookie")))
+            await asyncio.sleep(delay)
+            response = self.aresponses.Response(
+                status=status,
+                headers={"Content-Type": "application/json"},
+                text=json.dumps(body),
+            )
+            if cookie is not None:
+                response.set_cookie("AuthCookie", cookie)
+            return response
+
+        self.aresponses.add(
+            host, f"{ENDPOINT_PATH}{path}", method, handler, repeat=repeat
+        )
+
+    def add_status(self, lan_delay=0.0, wifi_delay=0.0):
+        self.add(LAN, "status", STATUS_RESPONSE, delay=lan_delay)
+        self.add(WIFI, "status", STATUS_RESPONSE, delay=wifi_delay)
+
+    def add_login(self, host, cookie):
+        self.add(
+            host,
+            "login/Basic",
+            {
+                "email": "",
+                "firstname": "Tesla",
+                "lastname": "Energy",
+                "roles": ["Home_Owner"],
+                "token": "x",
+                "provider": "Basic",
+                "loginTime": "2023-03-25T13:10:48.9029581+01:00",
+            },
+            method="POST",
+            cookie=cookie,
+        )
+
+    async def test_routes_to_fastest(self):
+        self.add_status(lan_delay=0.05)
+        self.add(WIFI, "system_status/soe", {"percentage": 50})
+
+        async with FailoverAPI([LAN, WIFI]) as api:
+            self.assertEqual(await api.get_system_status_soe(), {"percentage": 50})
+            latencies = api.latencies()
+            self.assertLess(latencies[WIFI], latencies[LAN])
+            self.assertEqual(api.url("status").host, WIFI)
+
+        self.assertEqual(self.requests[-1][:2], (WIFI, "system_status/soe"))
+        self.aresponses.assert_all_requests_matched()
+        self.aresponses.assert_no_unused_routes()
+
+    async def test_failover(self):
+        self.add_status(wifi_delay=0.05)
+        self.add(LAN, "system_status/soe", {"percentage": 40}, delay=1)
+        self.add(WIFI, "system_status/soe", {"percentage": 50}, repeat=2)
+
+        async with FailoverAPI(
+            [LAN, WIFI], endpoint_timeouts={"system_status/soe": 0.1}
+        ) as api:
+            self.assertEqual(api.url("status").host, LAN)
+            self.assertEqual(await api.get_system_status_soe(), {"percentage": 50})
+            # The failed address is used only after the others
+            self.assertEqual(api.url("status").host, WIFI)
+            self.assertEqual(await api.get_system_status_soe(), {"percentage": 50})
+
+        self.assertEqual(
+            [request[:2] for request in self.requests[2:]],
+            [
+                (LAN, "system_status/soe"),
+                (WIFI, "system_status/soe"),
+                (WIFI, "system_status/soe"),
+            ],
+        )
+        self.aresponses.assert_all_requests_matched()
+
+    async def test_unreachable_during_probe(self):
+        self.add_status(lan_delay=1)
+        self.add(WIFI, "system_status/soe", {"percentage": 50})
+
+        async with FailoverAPI([LAN, WIFI], probe_timeout=0.1) as api:
+            self.assertEqual(await api.probe(), {LAN: None, WIFI: mock.ANY})
+            self.assertEqual(await api.get_system_status_soe(), {"percentage": 50})
+
+        self.assertNotIn((LAN, "system_status/soe", None), self.requests)
+
+    async def test_error_status_during_probe(self):
+        # E.g. a proxy in front of the gateway which can not reach it
+        self.add(LAN, "status", {}, status=502)
+        self.add(WIFI, "status", STATUS_RESPONSE, delay=0.05)
+        self.add(WIFI, "system_status/soe", {"percentage": 50})
+
+        async with FailoverAPI([LAN, WIFI]) as api:
+            self.assertEqual(await api.get_system_status_soe(), {"percentage": 50})
+            self.assertEqual(api.latencies(), {LAN: None, WIFI: mock.ANY})
+
+        self.aresponses.assert_all_requests_matched()
+
+    async def test_failed_background_probe(self):
+        self.add(LAN, "status", STATUS_RESPONSE, repeat=2)
+        self.add(WIFI, "status", STATUS_RESPONSE, delay=0.05, repeat=2)
+        self.add(LAN, "system_status/soe", {"percentage": 50}, repeat=3)
+        handler = mock.Mock()
+        asyncio.get_running_loop().set_exception_handler(handler)
+
+        async with FailoverAPI([LAN, WIFI], probe_interval=0) as api:
+            await api.get_system_status_soe()
+            with mock.patch.object(api, "probe", side_effect=RuntimeError):
+                # Starts a background probe, which fails
+                await api.get_system_status_soe()
+                await asyncio.sleep(0)
+            # Replaces the failed probe, which is then garbage collected
+            await api.get_system_status_soe()
+            gc.collect()
+
+        handler.assert_not_called()
+
+    async def test_download(self):
+        self.add_status(lan_delay=0.05)
+        self.aresponses.add(
+            WIFI,
+            f"{ENDPOINT_PATH}getlogs",
+            "GET",
+            self.aresponses.Response(body=b"logs" * 100),
+        )
+
+        async with FailoverAPI([LAN, WIFI]) as api:
+            destination = io.BytesIO()
+            result = await api.download_logs(destination, chunk_size=16)
+            self.assertTrue(result.complete)
+            self.assertEqual(destination.getvalue(), b"logs" * 100)
+
+    async def test_all_unreachable(self):
+        self.add_status()
+        self.add(LAN, "system_status/soe", {}, delay=1)
+        self.add(WIFI, "system_status/soe", {}, delay=1)
+
+        async with FailoverAPI([LAN, WIFI], timeout=0.1) as api:
+            with self.assertRaises(RequestTimeoutError):
+                await api.get_system_status_soe()
+
+    async def test_post_timeout_is_not_repeated(self):
+        self.add_status(wifi_delay=0.05)
+        self.add(LAN, "site_info/site_name", {}, delay=1, method="POST")
+
+        async with FailoverAPI([LAN, WIFI], timeout=0.1) as api:
+            with self.assertRaises(RequestTimeoutError):
+                await api.post_site_info_site_name({"site_name": "Home"})
+
+        self.assertNotIn((WIFI, "site_info/site_name", None), self.requests)
+
+    async def test_authentication_per_address(self):
+        self.add_status(wifi_delay=0.05)
+        self.add_login(LAN, "lan")
+        self.add(LAN, "system_status/soe", {"percentage": 40})
+        self.add(LAN, "system_status/soe", {}, delay=1)
+        self.add_login(WIFI, "wifi")
+        self.add(WIFI, "system_status/soe", {"percentage": 50})
+
+        async with FailoverAPI(
+            [LAN, WIFI], endpoint_timeouts={"system_status/soe": 0.1}
+        ) as api:
+            self.assertFalse(api.is_authenticated())
+            await api.login("customer", "", "password")
+            self.assertTrue(api.is_authenticated())
+            await api.get_system_status_soe()
+            # The address the requests fail over to logs in with its own cookie
+            await api.get_system_status_soe()
+
+        self.assertEqual(
+            self.requests[2:],
+            [
+                (LAN, "login/Basic", None),
+                (LAN, "system_status/soe", "lan"),
+                (LAN, "system_status/soe", "lan"),
+                (WIFI, "login/Basic", None),
+                (WIFI, "system_status/soe", "wifi"),
+            ],
+        )
+
+    async def test_invalid_endpoints(self):
+        with self.assertRaises(ValueError):
+            FailoverAPI([])
+        with self.assertRaises(ValueError):
+            FailoverAPI(LAN)
+
+
+class TestPowerwallFailover(unittest.IsolatedAsyncioTestCase):
+    async def test_endpoints(self):
+        async with Powerwall([LAN, WIFI]) as powerwall:
+            api = powerwall.get_api()
+            self.assertIsInstance(api, FailoverAPI)
+            self.assertIsInstance(api, API)
+            self.assertEqual(api.endpoints, [LAN, WIFI])
+
+        async with aiohttp.ClientSession() as session:
+            with self.assertRaises(ValueError):
+                Powerwall([LAN, WIFI], http_session=session)
@@ -0,0 +1,65 @@
+import math
+import unittest
+
+from tesla_powerwall import MetersAggregatesResponse, MeterType
+from tesla_powerwall.history import MeterHistory
+from tests.unit import METERS_AGGREGATES_RESPONSE
+
+
+def meters_with_power(power: float) -> MetersAggregatesResponse:
+    response = {
+        key: {**value, "instant_power": power}
+        for key, value in METERS_AGGREGATES_RESPONSE.items()
+        if key != "solar"
+    }
+    return MetersAggregatesResponse.from_dict(response)
+
+
+class TestMeterHistory(unittest.TestCase):
+    def test_append_and_wrap_around(self):
+        history = MeterHistory(3)
+        for i in range(5):
+            history.append(meters_with_power(i * 10), timestamp=100 + i)
+
+        self.assertEqual(len(history), 3)
+        self.assertEqual(list(history.timestamps()), [102, 103, 104])
+        self.assertEqual(
+            list(history.values(MeterType.SITE, "instant_power")), [20, 30, 40]
+        )
+        # Solar is missing in every sample
+        self.assertTrue(
+            all(math.isnan(v) for v in history.values(MeterType.SOLAR, "frequency"))
+        )
+
+    def test_queries(self):
+        history = MeterHistory(4)
+        for i in range(6):
+            history.append(meters_with_power(i), timestamp=float(i))
+
+        timestamps, values = history.last(2, MeterType.LOAD, "instant_power")
+        self.assertEqual(list(timestamps), [4, 5])
+        self.assertEqual(list(values), [4, 5])
+
+        timestamps, values = history.last(10, MeterType.LOAD, "instant_power")
+        self.assertEqual(list(timestamps), [2, 3, 4, 5])
+
+        timestamps, values = history.between(3, 5, MeterType.LOAD, "instant_power")
+        self.assertEqual(list(timestamps), [3, 4])
+        self.assertEqual(list(values), [3, 4])
+
+        views = history.views(MeterType.LOAD, "instant_power")
+        self.assertEqual(len(views), 2)
+        self.assertEqual([v for view in views for v in view], [2, 3, 4, 5])
+        self.assertEqual([v for view in history.views() for v in view], [2, 3, 4, 5])
+
+    def test_invalid_usage(self):
+        history = MeterHistory(2, meters=[MeterType.SITE], typecode="f")
+        history.append(meters_with_power(1), timestamp=10)
+        with self.assertRaises(ValueError):
+            history.append(meters_with_power(1), timestamp=5)
+        with self.assertRaises(KeyError):
+            history.values(MeterType.LOAD, "instant_power")
+        with self.assertRaises(KeyError):
+            history.values(MeterType.SITE, "unknown")
+        with self.assertRaises(ValueError):
+            MeterHistory(0)
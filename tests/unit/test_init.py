@@ -0,0 +1,112 @@
+import ast
+import subprocess
+import sys
+import unittest
+
+import tesla_powerwall
+
+
+class TestLazyImport(unittest.TestCase):
+    def imported_modules(self, statement: str) -> set:
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys; {}; print(' '.join(sys.modules))".format(statement),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        return set(output.split())
+
+    def test_import_does_not_load_dependencies(self):
+        for statement in (
+            "import tesla_powerwall",
+            "import tesla_powerwall.const",
+            "from tesla_powerwall import GridStatus, MeterType",
+        ):
+            modules = self.imported_modules(statement)
+            for dependency in ("aiohttp", "yarl", "orjson", "tesla_powerwall.api"):
+                self.assertNotIn(dependency, modules, statement)
+
+        modules = self.imported_modules("from tesla_powerwall import Powerwall")
+        self.assertIn("aiohttp", modules)
+
+    def test_exports(self):
+        for name in tesla_powerwall.__all__:
+            self.assertTrue(hasattr(tesla_powerwall, name), name)
+            self.assertIn(name, dir(tesla_powerwall))
+
+        from tesla_powerwall.responses import MeterResponse
+
+        self.assertIs(tesla_powerwall.MeterResponse, MeterResponse)
+        self.assertIs(tesla_powerwall.const, sys.modules["tesla_powerwall.const"])
+        with self.assertRaises(AttributeError):
+            tesla_powerwall.Unknown
+
+    def test_all_contains_baseline_exports(self):
+        # __all__ of version 0.5.2, whose __init__ imported everything eagerly
+        baseline = [
+            "const",
+            "error",
+            "api",
+            "API",
+            "SUPPORTED_OPERATION_MODES",
+            "DeviceType",
+            "GridState",
+            "GridStatus",
+            "IslandMode",
+            "LineStatus",
+            "MeterType",
+            "OperationMode",
+            "Roles",
+            "SyncType",
+            "User",
+            "AccessDeniedError",
+            "ApiError",
+            "MeterNotAvailableError",
+            "MissingAttributeError",
+            "PowerwallError",
+            "PowerwallUnreachableError",
+            "helpers",
+            "assert_attribute",
+            "convert_to_kw",
+            "responses",
+            "powerwall",
+            "Powerwall",
+            "BatteryResponse",
+            "LoginResponse",
+            "MeterDetailsReadings",
+            "MeterDetailsResponse",
+            "MeterResponse",
+            "MetersAggregatesResponse",
+            "PowerwallStatusResponse",
+            "SiteInfoResponse",
+            "SiteMasterResponse",
+            "SolarResponse",
+            "VERSION",
+        ]
+        self.assertEqual(
+            [name for name in baseline if name not in tesla_powerwall.__all__], []
+        )
+        self.assertEqual(
+            len(set(tesla_powerwall.__all__)), len(tesla_powerwall.__all__)
+        )
+
+        namespace = {}
+        exec("from tesla_powerwall import *", namespace)
+        for name in baseline:
+            self.assertIn(name, namespace)
+        self.assertIs(namespace["responses"], sys.modules["tesla_powerwall.responses"])
+
+    def test_exports_match_type_checking_imports(self):
+        with open(tesla_powerwall.__file__) as f:
+            tree = ast.parse(f.read())
+
+        imports = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.level == 1:
+                imports[node.module] = tuple(alias.name for alias in node.names)
+
+        self.assertEqual(imports, tesla_powerwall._EXPORTS)
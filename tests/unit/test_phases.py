@@ -0,0 +1,76 @@
+import math
+import unittest
+
+from tesla_powerwall import MeterDetailsResponse, MeterType
+from tesla_powerwall.phases import (
+    PhaseAnalytics,
+    PhaseReadings,
+    imbalance,
+    phase_metrics,
+)
+from tests.unit import METER_SITE_RESPONSE
+
+
+def details(**readings) -> MeterDetailsResponse:
+    src = METER_SITE_RESPONSE[0]
+    return MeterDetailsResponse.from_dict(
+        {**src, "Cached_readings": {**src["Cached_readings"], **readings}}
+    )
+
+
+THREE_PHASES = {
+    "real_power_a": 1000,
+    "real_power_b": 1000,
+    "real_power_c": 1300,
+    "i_a_current": 4,
+    "i_b_current": 4,
+    "i_c_current": -4,
+    "v_l1n": 230,
+    "v_l2n": 230,
+    "v_l3n": 236.9,
+}
+
+
+class TestPhases(unittest.TestCase):
+    def test_phase_readings(self):
+        readings = PhaseReadings.from_readings(details().readings)
+        self.assertEqual(list(readings.mask), [1, 1, 0, 1, 1, 1, 1, 1, 0])
+        self.assertEqual(readings.real_power[0], -17.950000762939453)
+        self.assertTrue(math.isnan(readings.voltage[2]))
+
+    def test_imbalance(self):
+        self.assertAlmostEqual(imbalance([90, 100, 110]), 10)
+        self.assertTrue(math.isnan(imbalance([100])))
+        self.assertTrue(math.isnan(imbalance([0, 0])))
+
+    def test_phase_metrics(self):
+        metrics = phase_metrics(
+            PhaseReadings.from_readings(details(**THREE_PHASES).readings)
+        )
+        self.assertAlmostEqual(metrics.power_imbalance, 200 / 1100 * 100)
+        self.assertEqual(metrics.current_imbalance, 0)
+        self.assertAlmostEqual(metrics.voltage_imbalance, 4.6 / 232.3 * 100)
+        self.assertAlmostEqual(metrics.apparent_power, 4 * (230 + 230 + 236.9))
+        self.assertAlmostEqual(metrics.voltage_deviation, 3)
+
+        # The second phase of the fixture is not connected
+        metrics = phase_metrics(PhaseReadings.from_readings(details().readings))
+        self.assertTrue(math.isnan(metrics.voltage_imbalance))
+        self.assertAlmostEqual(
+            metrics.voltage_deviation, (247.55999755859375 - 230) / 230 * 100
+        )
+
+    def test_analytics(self):
+        analytics = PhaseAnalytics(window=10)
+        for t in range(20):
+            analytics.add(details(**{**THREE_PHASES, "v_l3n": 230 + t}), t)
+
+        self.assertEqual(analytics.locations, [MeterType.SITE])
+        monitor = analytics.monitor(MeterType.SITE)
+        window = monitor.window("voltage_deviation")
+        self.assertEqual(window.count, 10)
+        self.assertAlmostEqual(window.maximum, 19 / 230 * 100)
+        self.assertAlmostEqual(monitor.last.voltage_deviation, 19 / 230 * 100)
+        self.assertEqual(monitor.window("voltage_deviation", now=100).count, 0)
+        with self.assertRaises(KeyError):
+            monitor.window("frequency")
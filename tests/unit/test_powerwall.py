@@ -1,17 +1,24 @@
+import dataclasses
 import datetime
 import json
+import pickle
+import random
 import unittest
 from typing import Optional, Union
+from unittest import mock
 
 import aiohttp
 import aresponses
 
 from tesla_powerwall import (
     API,
+    BatteryResponse,
     DeviceType,
     GridState,
     GridStatus,
+    InvalidResponseError,
     IslandMode,
+    LoginResponse,
     MeterDetailsReadings,
     MeterDetailsResponse,
     MeterNotAvailableError,
@@ -21,9 +28,15 @@ from tesla_powerwall import (
     MissingAttributeError,
     OperationMode,
     Powerwall,
+    PowerwallStatusResponse,
     SiteMasterResponse,
+    SystemStatusResponse,
+    TelemetrySnapshot,
     assert_attribute,
+    classify_power_flows,
     convert_to_kw,
+    convert_to_kw_many,
+    helpers,
 )
 from tests.unit import (
     ENDPOINT,
@@ -110,6 +123,138 @@ class TestPowerWall(unittest.IsolatedAsyncioTestCase):
         self.assertIsNone(meters.get_meter(MeterType.GENERATOR))
         with self.assertRaises(MeterNotAvailableError):
             meters.generator
+        with self.assertRaises(AttributeError):
+            meters.not_a_meter
+        self.assertIs(meters.site, meters.get_meter(MeterType.SITE))
+        self.assertEqual(pickle.loads(pickle.dumps(meters)).site, meters.site)
+        self.aresponses.assert_plan_strictly_followed()
+
+    def test_responses_without_raw(self):
+        meters = MetersAggregatesResponse.from_dict(
+            METERS_AGGREGATES_RESPONSE, keep_raw=False
+        )
+        self.assertIsNone(meters._raw)
+        self.assertIsNone(meters.site._raw)
+        self.assertEqual(meters.site.instant_power, -5347.455078125)
+        self.assertFalse(hasattr(meters.site, "__dict__"))
+        self.assertIn("instant_power=", repr(meters.site))
+
+        readings = MeterDetailsResponse.from_dict(
+            METER_SITE_RESPONSE[0], keep_raw=False
+        ).readings
+        self.assertIsNone(readings._raw)
+        self.assertEqual(readings.meter, MeterType.SITE)
+        self.assertEqual(readings.instant_power, -18.00000076368451)
+        self.assertIsNone(readings.v_l3n)
+
+    def test_lazy_responses(self):
+        eager_batteries = [
+            BatteryResponse.from_dict(battery)
+            for battery in SYSTEM_STATUS_RESPONSE["battery_blocks"]
+        ]
+        lazy_batteries = [
+            BatteryResponse.from_dict(battery, lazy=True)
+            for battery in SYSTEM_STATUS_RESPONSE["battery_blocks"]
+        ]
+        for eager, lazy in zip(eager_batteries, lazy_batteries):
+            self.assertIsInstance(lazy, BatteryResponse)
+            for field in dataclasses.fields(BatteryResponse):
+                self.assertEqual(getattr(lazy, field.name), getattr(eager, field.name))
+
+        status = PowerwallStatusResponse.from_dict(STATUS_RESPONSE, lazy=True)
+        self.assertEqual(status.device_type, DeviceType.GW1)
+        self.assertEqual(
+            status.up_time_seconds,
+            datetime.timedelta(seconds=61891, microseconds=214751),
+        )
+        # Decoded values are cached
+        self.assertIs(status.up_time_seconds, status.up_time_seconds)
+
+        readings = MeterDetailsResponse.from_dict(
+            METER_SITE_RESPONSE[0], lazy=True
+        ).readings
+        self.assertEqual(readings.meter, MeterType.SITE)
+        self.assertEqual(readings.get_power(), -0.0)
+        self.assertIsNone(readings.v_l3n)
+
+        # Errors in lazily decoded fields are only raised on access
+        broken = PowerwallStatusResponse.from_dict(
+            {**STATUS_RESPONSE, "device_type": "unknown"}, lazy=True
+        )
+        self.assertEqual(broken.version, "1.50.1 c58c2df3")
+        with self.assertRaises(InvalidResponseError):
+            broken.device_type
+
+    def test_pickle_lazy_responses(self):
+        status = PowerwallStatusResponse.from_dict(STATUS_RESPONSE, lazy=True)
+        pickled = pickle.dumps(status)
+        # Decodes device_type before pickling again
+        self.assertEqual(status.device_type, DeviceType.GW1)
+        for data in (pickled, pickle.dumps(status)):
+            copy = pickle.loads(data)
+            self.assertIs(type(copy), type(status))
+            self.assertEqual(copy.device_type, DeviceType.GW1)
+            self.assertEqual(copy.version, "1.50.1 c58c2df3")
+
+        readings = MeterDetailsResponse.from_dict(
+            METER_SITE_RESPONSE[0], lazy=True
+        ).readings
+        copy = pickle.loads(pickle.dumps(readings))
+        self.assertEqual(copy.meter, MeterType.SITE)
+        self.assertEqual(copy.instant_power, readings.instant_power)
+
+    def test_invalid_responses(self):
+        battery = dict(SYSTEM_STATUS_RESPONSE["battery_blocks"][0])
+        del battery["p_out"]
+        del battery["PackageSerialNumber"]
+        battery["pinv_grid_state"] = "Unknown"
+        with self.assertRaises(InvalidResponseError) as context:
+            BatteryResponse.from_dict(battery)
+        self.assertEqual(context.exception.response_type, "BatteryResponse")
+        self.assertEqual(context.exception.missing, ["PackageSerialNumber", "p_out"])
+        self.assertEqual(list(context.exception.invalid.keys()), ["grid_state"])
+
+        with self.assertRaises(InvalidResponseError) as context:
+            PowerwallStatusResponse.from_dict(
+                {**STATUS_RESPONSE, "device_type": "unknown", "up_time_seconds": "x"}
+            )
+        self.assertEqual(
+            list(context.exception.invalid.keys()), ["up_time_seconds", "device_type"]
+        )
+
+        with self.assertRaises(InvalidResponseError):
+            MetersAggregatesResponse.from_dict({"unknown_meter": {}})
+
+        # A KeyError of a parse function is an invalid value, not a missing key
+        with self.assertRaises(InvalidResponseError) as context:
+            LoginResponse.from_dict(
+                {
+                    "firstname": "Tesla",
+                    "lastname": "Energy",
+                    "token": "x",
+                    "roles": ["Bogus"],
+                    "loginTime": "2023-03-25T13:10:48.9029581+01:00",
+                }
+            )
+        self.assertEqual(context.exception.missing, [])
+        self.assertEqual(context.exception.invalid, {"roles": "invalid value 'Bogus'"})
+
+        del battery["disabled_reasons"]
+        with self.assertRaises(InvalidResponseError) as context:
+            BatteryResponse.from_dict(battery)
+        self.assertEqual(
+            context.exception.missing,
+            ["PackageSerialNumber", "p_out", "disabled_reasons"],
+        )
+        self.assertEqual(context.exception.invalid, {})
+
+    async def test_get_meters_lazy(self):
+        self.add_response("meters/aggregates", body=METERS_AGGREGATES_RESPONSE)
+        async with Powerwall(ENDPOINT, lazy_responses=True) as powerwall:
+            meters = await powerwall.get_meters()
+        self.assertIsInstance(meters.site, MeterResponse)
+        self.assertEqual(meters.site.instant_power, -5347.455078125)
+        self.assertEqual(meters.load.is_sending_to(), True)
         self.aresponses.assert_plan_strictly_followed()
 
     async def test_get_meter_site(self):
@@ -228,6 +373,22 @@ class TestPowerWall(unittest.IsolatedAsyncioTestCase):
         )
         self.aresponses.assert_plan_strictly_followed()
 
+    async def test_get_snapshot(self):
+        self.add_response("meters/aggregates", body=METERS_AGGREGATES_RESPONSE)
+        self.add_response("system_status/soe", body={"percentage": 53.123423})
+        self.add_response("system_status/grid_status", body=GRID_STATUS_RESPONSE)
+        self.add_response("system_status", body=SYSTEM_STATUS_RESPONSE)
+        self.add_response("operation", body=OPERATION_RESPONSE)
+
+        snapshot = await self.powerwall.get_snapshot()
+        self.assertIsInstance(snapshot, TelemetrySnapshot)
+        self.assertEqual(snapshot.soe, 53.123423)
+        self.assertEqual(snapshot.grid_status, GridStatus.CONNECTED)
+        self.assertEqual(snapshot.operation_mode, OperationMode.SELF_CONSUMPTION)
+        self.assertEqual(len(snapshot.batteries), 3)
+        self.assertIsInstance(snapshot.meters, MetersAggregatesResponse)
+        self.aresponses.assert_plan_strictly_followed()
+
     async def test_get_version(self):
         self.add_response("status", body=STATUS_RESPONSE)
         self.assertEqual(await self.powerwall.get_version(), "1.50.1")
@@ -265,6 +426,76 @@ class TestPowerWall(unittest.IsolatedAsyncioTestCase):
         )
         self.aresponses.assert_plan_strictly_followed()
 
+    async def test_system_status_with_invalid_battery(self):
+        broken = dict(SYSTEM_STATUS_RESPONSE)
+        broken["battery_blocks"] = [{"PackagePartNumber": "XXX-G"}]
+        for _ in range(3):
+            self.add_response("system_status", body=broken)
+
+        # Neither reads the battery blocks
+        self.assertEqual(await self.powerwall.get_capacity(), 28078)
+        self.assertEqual(await self.powerwall.get_energy(), 14807)
+        with self.assertRaises(InvalidResponseError):
+            await self.powerwall.get_batteries()
+        self.aresponses.assert_plan_strictly_followed()
+
+    async def test_system_status_partial(self):
+        batteries_only = {"battery_blocks": SYSTEM_STATUS_RESPONSE["battery_blocks"]}
+        self.add_response("system_status", body=batteries_only)
+        # Only the battery blocks are read
+        batteries = await self.powerwall.get_batteries()
+        self.assertEqual(len(batteries), 3)
+
+        null_energy = {**SYSTEM_STATUS_RESPONSE, "nominal_energy_remaining": None}
+        self.add_response("system_status", body=null_energy)
+        with self.assertRaises(MissingAttributeError):
+            await self.powerwall.get_energy()
+        self.add_response("system_status", body=batteries_only)
+        with self.assertRaises(MissingAttributeError):
+            await self.powerwall.get_capacity()
+        self.aresponses.assert_plan_strictly_followed()
+
+    def test_system_status_unknown_island_state(self):
+        src = {**SYSTEM_STATUS_RESPONSE, "system_island_state": "SystemFutureState"}
+        for lazy in (False, True):
+            system_status = SystemStatusResponse.from_dict(src, lazy=lazy)
+            self.assertIsNone(system_status.system_island_state)
+            self.assertEqual(system_status.energy_remaining, 14807)
+
+    async def test_get_system_status(self):
+        self.add_response("system_status", body=SYSTEM_STATUS_RESPONSE)
+        system_status = await self.powerwall.get_system_status()
+        self.assertIsInstance(system_status, SystemStatusResponse)
+        self.assertEqual(system_status.energy_remaining, 14807)
+        self.assertEqual(system_status.capacity, 28078)
+        self.assertEqual(system_status.available_blocks, 2)
+        self.assertEqual(system_status.max_charge_power, 9200)
+        self.assertEqual(system_status.system_island_state, GridStatus.CONNECTED)
+
+        # A provided system status is used instead of fetching it again
+        self.assertEqual(await self.powerwall.get_energy(system_status), 14807)
+        self.assertEqual(await self.powerwall.get_capacity(system_status), 28078)
+        batteries = await self.powerwall.get_batteries(system_status)
+        self.assertEqual(len(batteries), 3)
+        self.assertEqual(batteries[2].grid_state, GridState.DISABLED)
+        self.aresponses.assert_plan_strictly_followed()
+
+        minimal = {
+            key: SYSTEM_STATUS_RESPONSE[key]
+            for key in (
+                "nominal_energy_remaining",
+                "nominal_full_pack_energy",
+                "battery_blocks",
+            )
+        }
+        system_status = SystemStatusResponse.from_dict(minimal, keep_raw=False)
+        self.assertIsNone(system_status.system_island_state)
+        self.assertIsNone(system_status.batteries[0]._raw)
+
+        lazy = SystemStatusResponse.from_dict(SYSTEM_STATUS_RESPONSE, lazy=True)
+        self.assertEqual(lazy.batteries[0].p_out, -1830)
+        self.assertEqual(lazy.system_island_state, GridStatus.CONNECTED)
+
     async def test_islanding_mode_offgrid(self):
         self.add_response(
             "v2/islanding/mode", method="POST", body=ISLANDING_MODE_OFFGRID_RESPONSE
@@ -292,6 +523,56 @@ class TestPowerWall(unittest.IsolatedAsyncioTestCase):
             assert_attribute(resp, "test", "test")
 
         self.assertEqual(convert_to_kw(2500, -1), 2.5)
+        self.assertEqual(list(convert_to_kw_many([2500, 1449], -1)), [2.5, 1.449])
+        self.assertEqual(list(convert_to_kw_many([2500, 1449])), [2.5, 1.4])
+
+    def test_classify_power_flows(self):
+        power = [-1500, -40, 0, 40, 60, 1500]
+        for meter_type in MeterType:
+            for precision in (-1, 1, 2):
+                meters = [
+                    MeterResponse.from_dict(
+                        meter_type,
+                        {**METERS_AGGREGATES_RESPONSE["site"], "instant_power": value},
+                    )
+                    for value in power
+                ]
+                flows = classify_power_flows(power, meter_type, precision)
+                self.assertEqual(
+                    list(flows.power), [m.get_power(precision) for m in meters]
+                )
+                self.assertEqual(
+                    [bool(v) for v in flows.active],
+                    [m.is_active(precision) for m in meters],
+                )
+                self.assertEqual(
+                    [bool(v) for v in flows.drawing_from],
+                    [m.is_drawing_from(precision) for m in meters],
+                )
+                self.assertEqual(
+                    [bool(v) for v in flows.sending_to],
+                    [m.is_sending_to(precision) for m in meters],
+                )
+
+        flows = classify_power_flows([100, 100], [MeterType.SITE, MeterType.LOAD])
+        self.assertEqual(list(flows.drawing_from), [1, 0])
+        self.assertEqual(list(flows.sending_to), [0, 1])
+        with self.assertRaises(ValueError):
+            classify_power_flows([100], [MeterType.SITE, MeterType.LOAD])
+
+    @unittest.skipIf(helpers._numpy() is None, "numpy is not installed")
+    def test_classify_power_flows_numpy(self):
+        rng = random.Random(1234)
+        # Random readings and integer watts, many of which are ties in kW
+        power = [rng.uniform(-8000, 8000) for _ in range(2000)]
+        power += [float(value) for value in range(-3000, 3000, 5)]
+        meters = [rng.choice(list(MeterType)) for _ in power]
+        for precision in (-1, 0, 1, 2, 3):
+            vectorized = classify_power_flows(power, meters, precision)
+            with mock.patch.object(helpers, "_np", None):
+                expected = classify_power_flows(power, meters, precision)
+            self.assertEqual(vectorized, expected)
+            self.assertEqual(convert_to_kw_many(iter(power), precision), expected.power)
 
     async def test_close(self):
         api_session = None
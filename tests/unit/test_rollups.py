@@ -0,0 +1,77 @@
+import math
+import random
+import unittest
+
+from tesla_powerwall import MetersAggregatesResponse
+from tesla_powerwall.rollups import (
+    QuantileSketch,
+    RollingWindow,
+    TelemetryRollups,
+    TumblingWindow,
+)
+from tests.unit import METERS_AGGREGATES_RESPONSE
+
+
+class TestRollups(unittest.TestCase):
+    def test_quantile_sketch(self):
+        rng = random.Random(1234)
+        values = [rng.uniform(-5000, 5000) for _ in range(1000)] + [0.0] * 10
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+
+        values.sort()
+        for q in (0.0, 0.1, 0.5, 0.9, 1.0):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(sketch.quantile(q), exact, delta=abs(exact) * 0.02)
+
+        for value in values:
+            sketch.remove(value)
+        self.assertEqual(sketch.count, 0)
+        self.assertTrue(math.isnan(sketch.quantile(0.5)))
+
+    def test_rolling_window(self):
+        window = RollingWindow(10)
+        for t, value in enumerate([5, 1, 4, 2, 3] * 4):
+            window.add(t, value)
+
+        # Only the samples at t = 10..19 are in the window
+        self.assertEqual(window.count, 10)
+        self.assertEqual(window.mean, 3)
+        self.assertEqual(window.minimum, 1)
+        self.assertEqual(window.maximum, 5)
+        self.assertAlmostEqual(window.percentile(50), 3, delta=0.1)
+
+        window.expire(100)
+        self.assertEqual(window.count, 0)
+        self.assertTrue(math.isnan(window.minimum))
+
+        with self.assertRaises(ValueError):
+            window.add(50, 1)
+
+    def test_tumbling_window(self):
+        tumbling = TumblingWindow(60, retention=2)
+        for t in range(0, 200, 10):
+            tumbling.add(t, t)
+
+        buckets = tumbling.buckets()
+        self.assertEqual([bucket.start for bucket in buckets], [120, 180])
+        self.assertEqual(buckets[0].count, 6)
+        self.assertEqual(buckets[0].mean, 145)
+        self.assertEqual(buckets[0].minimum, 120)
+        self.assertEqual(buckets[0].maximum, 170)
+        self.assertIs(tumbling.current, buckets[1])
+
+    def test_telemetry_rollups(self):
+        rollups = TelemetryRollups(widths=(60,))
+        meters = MetersAggregatesResponse.from_dict(METERS_AGGREGATES_RESPONSE)
+        for t in range(3):
+            rollups.add_meters(meters, t)
+            rollups.add_soe(50 + t, t)
+
+        self.assertEqual(rollups.window("site", 60).mean, meters.site.instant_power)
+        self.assertEqual(rollups.window("soe", 60).maximum, 52)
+        self.assertEqual(rollups.buckets("soe", 60)[0].count, 3)
+        self.assertEqual(rollups.window("soe", 60, now=120).count, 0)
+        with self.assertRaises(KeyError):
+            rollups.add("generator", 0, 1)
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+from tesla_powerwall import (
+    MetersAggregatesResponse,
+    PowerwallError,
+    SystemStatusResponse,
+)
+from tesla_powerwall.sqlite_sink import OVERFLOW_DROP, SQLiteSink, battery_samples
+from tests.unit import METERS_AGGREGATES_RESPONSE, SYSTEM_STATUS_RESPONSE
+
+
+class TestSQLiteSink(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "telemetry.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    async def test_write_and_query(self):
+        meters = MetersAggregatesResponse.from_dict(METERS_AGGREGATES_RESPONSE)
+        status = SystemStatusResponse.from_dict(SYSTEM_STATUS_RESPONSE)
+
+        with SQLiteSink(self.path, batch_size=7, flush_interval=0.01) as sink:
+            for t in range(10):
+                await sink.add_meters("gw1", meters, t)
+                await sink.add_charge("gw1", 50 + t, t)
+            await sink.add_batteries("gw2", status.batteries, 0)
+
+        statistics = sink.statistics
+        self.assertEqual(statistics.queued, 0)
+        self.assertEqual(statistics.dropped, 0)
+        self.assertEqual(
+            statistics.written,
+            10 * (4 * 5 + 1) + len(battery_samples("gw2", status.batteries, 0)),
+        )
+        self.assertGreater(statistics.batches, 1)
+        self.assertGreater(statistics.write_throughput, 0)
+
+        self.assertEqual(
+            sink.query("gw1", "soe", 2, 5), [(2.0, 52.0), (3.0, 53.0), (4.0, 54.0)]
+        )
+        self.assertEqual(
+            sink.query("gw1", "site.instant_power", 0, 1),
+            [(0.0, meters.site.instant_power)],
+        )
+        self.assertEqual(sink.query("gw2", "soe", 0, 10), [])
+        self.assertIn("battery.TGXXX.p_out", sink.metrics("gw2"))
+
+        with self.assertRaises(PowerwallError):
+            sink.put([("gw1", "soe", 100, 1)])
+
+    def test_drop_on_overload(self):
+        sink = SQLiteSink(self.path, max_queued=3, overflow=OVERFLOW_DROP)
+        self.assertTrue(sink.put([("gw", "soe", 0, 1), ("gw", "soe", 1, 2)]))
+        self.assertFalse(sink.put([("gw", "soe", 2, 3), ("gw", "soe", 3, 4)]))
+        self.assertEqual(sink.statistics.queued, 2)
+        self.assertEqual(sink.statistics.dropped, 2)
+
+        # Queued samples are written on close even if the writer never ran
+        sink.close()
+        self.assertEqual(sink.query("gw", "soe", 0, 10), [(0.0, 1.0), (1.0, 2.0)])
+
+    def test_skip_non_finite(self):
+        with SQLiteSink(self.path, flush_interval=0.01) as sink:
+            sink.put(
+                [
+                    ("gw", "soe", 0, 1),
+                    ("gw", "soe", 1, float("nan")),
+                    ("gw", "soe", 2, float("inf")),
+                    ("gw", "soe", 3, 4),
+                ]
+            )
+        self.assertEqual(sink.query("gw", "soe", 0, 10), [(0.0, 1.0), (3.0, 4.0)])
+        self.assertEqual(sink.statistics.written, 2)
+        self.assertEqual(sink.statistics.skipped, 2)
+
+    def test_block_timeout(self):
+        sink = SQLiteSink(self.path, max_queued=1)
+        self.assertTrue(sink.put([("gw", "soe", 0, 1)]))
+        self.assertFalse(sink.put([("gw", "soe", 1, 2)], timeout=0.01))
+        self.assertEqual(sink.statistics.dropped, 1)
+        sink.close()
@@ -0,0 +1,128 @@
+import asyncio
+import inspect
+import json
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import aresponses
+
+from tesla_powerwall import GridStatus, Powerwall, SyncPowerwall
+from tests.unit import ENDPOINT, ENDPOINT_HOST, ENDPOINT_PATH, GRID_STATUS_RESPONSE
+
+
+class TestSyncPowerwall(unittest.TestCase):
+    def setUp(self):
+        self.powerwall = SyncPowerwall(ENDPOINT)
+        # The mock server has to run on the loop of the powerwall
+        self.aresponses = aresponses.ResponsesMockServer(loop=self.powerwall.loop)
+        self.run_on_loop(self.aresponses.__aenter__())
+
+    def tearDown(self):
+        self.run_on_loop(self.aresponses.__aexit__(None, None, None))
+        self.powerwall.close()
+
+    def run_on_loop(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.powerwall.loop).result()
+
+    def add_response(self, path, body, method="GET", repeat=1, handler=None):
+        self.aresponses.add(
+            ENDPOINT_HOST,
+            f"{ENDPOINT_PATH}{path}",
+            method,
+            handler
+            or self.aresponses.Response(
+                headers={"Content-Type": "application/json"}, text=json.dumps(body)
+            ),
+            repeat=repeat,
+        )
+
+    def test_get_charge(self):
+        self.add_response("system_status/soe", {"percentage": 53.123423})
+        self.assertEqual(self.powerwall.get_charge(), 53.123423)
+        self.add_response("system_status/grid_status", GRID_STATUS_RESPONSE)
+        self.assertEqual(self.powerwall.get_grid_status(), GridStatus.CONNECTED)
+        self.aresponses.assert_plan_strictly_followed()
+
+    def test_keeps_authentication(self):
+        def login(request):
+            response = self.aresponses.Response(
+                headers={"Content-Type": "application/json"},
+                text=json.dumps(
+                    {
+                        "email": "",
+                        "firstname": "Tesla",
+                        "lastname": "Energy",
+                        "roles": ["Home_Owner"],
+                        "token": "x4jbH...XMP8w==",
+                        "provider": "Basic",
+                        "loginTime": "2023-03-25T13:10:48.9029581+01:00",
+                    }
+                ),
+            )
+            response.set_cookie("AuthCookie", "foo")
+            return response
+
+        cookies = []
+
+        def charge(request):
+            cookies.append(request.cookies.get("AuthCookie"))
+            return self.aresponses.Response(
+                headers={"Content-Type": "application/json"},
+                text=json.dumps({"percentage": 50}),
+            )
+
+        self.add_response("login/Basic", None, method="POST", handler=login)
+        self.add_response("system_status/soe", None, repeat=2, handler=charge)
+
+        self.assertFalse(self.powerwall.is_authenticated())
+        self.powerwall.login("password")
+        self.assertTrue(self.powerwall.is_authenticated())
+        self.powerwall.get_charge()
+        self.powerwall.get_charge()
+        self.assertEqual(cookies, ["foo", "foo"])
+
+    def test_concurrent_callers(self):
+        threads = set()
+
+        def charge(request):
+            threads.add(threading.current_thread())
+            return self.aresponses.Response(
+                headers={"Content-Type": "application/json"},
+                text=json.dumps({"percentage": 50}),
+            )
+
+        self.add_response("system_status/soe", None, repeat=40, handler=charge)
+        with ThreadPoolExecutor(8) as executor:
+            charges = list(
+                executor.map(lambda _: self.powerwall.get_charge(), range(40))
+            )
+
+        self.assertEqual(charges, [50] * 40)
+        # All requests were sent from the single loop of the powerwall
+        self.assertEqual(threads, {self.powerwall._thread})
+        self.aresponses.assert_plan_strictly_followed()
+
+    def test_close(self):
+        self.run_on_loop(self.aresponses.__aexit__(None, None, None))
+        self.powerwall.close()
+        self.powerwall.close()
+        self.assertFalse(self.powerwall._thread.is_alive())
+        with self.assertRaises(RuntimeError):
+            self.powerwall.get_charge()
+
+        self.powerwall = SyncPowerwall(ENDPOINT)
+        self.aresponses = aresponses.ResponsesMockServer(loop=self.powerwall.loop)
+        self.run_on_loop(self.aresponses.__aenter__())
+
+    def test_wraps_coroutine_methods(self):
+        for name, method in inspect.getmembers(Powerwall, inspect.iscoroutinefunction):
+            if name.startswith("_"):
+                continue
+            wrapper = getattr(SyncPowerwall, name, None)
+            self.assertIsNotNone(wrapper, name)
+            self.assertFalse(inspect.iscoroutinefunction(wrapper), name)
+            self.assertEqual(
+                inspect.signature(wrapper), inspect.signature(method), name
+            )
+        self.assertFalse(hasattr(SyncPowerwall, "__aenter__"))
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import time
+import unittest
+from unittest import mock
+
+import aresponses
+
+from tesla_powerwall import (
+    API,
+    AdaptiveTimeout,
+    FixedTimeout,
+    Powerwall,
+    PowerwallUnreachableError,
+    RequestTimeoutError,
+    TimeoutPolicy,
+    deadline,
+)
+from tesla_powerwall.timeouts import remaining
+from tests.unit import (
+    ENDPOINT,
+    ENDPOINT_HOST,
+    ENDPOINT_PATH,
+    GRID_STATUS_RESPONSE,
+    METERS_AGGREGATES_RESPONSE,
+    OPERATION_RESPONSE,
+)
+
+
+class RecordingTimeout(FixedTimeout):
+    def __init__(self, seconds):
+        super().__init__(seconds)
+        self.observed = []
+
+    def observe(self, path, latency):
+        self.observed.append(path)
+
+
+class TestTimeoutPolicies(unittest.TestCase):
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            TimeoutPolicy()
+
+    def test_fixed(self):
+        self.assertEqual(FixedTimeout(2.5).timeout("status"), 2.5)
+        with self.assertRaises(ValueError):
+            FixedTimeout(0)
+        self.assertIsNone(FixedTimeout(None).timeout("status"))
+
+    def test_adaptive(self):
+        policy = AdaptiveTimeout(
+            percentile=90, multiplier=2, floor=0.05, ceiling=5, min_samples=5
+        )
+        self.assertEqual(policy.timeout("system_status/soe"), 5)
+
+        for _ in range(4):
+            policy.observe("system_status/soe", 0.1)
+        self.assertEqual(policy.timeout("system_status/soe"), 5)
+        policy.observe("system_status/soe", 0.1)
+        self.assertAlmostEqual(policy.timeout("system_status/soe"), 0.2, delta=0.02)
+        # Every endpoint is tracked separately
+        self.assertEqual(policy.timeout("getlogs"), 5)
+
+        for _ in range(10):
+            policy.observe("fast", 0.001)
+            policy.observe("slow", 20)
+        self.assertEqual(policy.timeout("fast"), 0.05)
+        self.assertEqual(policy.timeout("slow"), 5)
+
+        with self.assertRaises(ValueError):
+            AdaptiveTimeout(floor=2, ceiling=1)
+        with self.assertRaises(ValueError):
+            AdaptiveTimeout(percentile=0)
+
+    def test_adaptive_window(self):
+        now = 1000.0
+        with mock.patch("tesla_powerwall.timeouts.time.monotonic", lambda: now):
+            policy = AdaptiveTimeout(
+                percentile=100,
+                multiplier=1,
+                floor=0.01,
+                ceiling=5,
+                window=60,
+                min_samples=1,
+            )
+            policy.observe("status", 1.0)
+            now += 30
+            policy.observe("status", 0.1)
+            self.assertAlmostEqual(policy.timeout("status"), 1.0, delta=0.1)
+            now += 31
+            self.assertAlmostEqual(policy.timeout("status"), 0.1, delta=0.01)
+            now += 60
+            self.assertEqual(policy.timeout("status"), 5)
+
+    def test_deadline(self):
+        self.assertIsNone(remaining())
+        with deadline(10):
+            self.assertLessEqual(remaining(), 10)
+            with deadline(1):
+                self.assertLessEqual(remaining(), 1)
+            # A nested deadline can not extend the deadline
+            with deadline(100):
+                self.assertLessEqual(remaining(), 10)
+            self.assertGreater(remaining(), 1)
+        self.assertIsNone(remaining())
+
+
+class TestRequestTimeouts(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.aresponses = aresponses.ResponsesMockServer()
+        await self.aresponses.__aenter__()
+
+    async def asyncTearDown(self):
+        await self.aresponses.__aexit__(None, None, None)
+
+    def add_response(self, path, body, delay=0.0, repeat=1):
+        async def handler(request):
+            await asyncio.sleep(delay)
+            return self.aresponses.Response(
+                headers={"Content-Type": "application/json"}, text=json.dumps(body)
+            )
+
+        self.aresponses.add(
+            ENDPOINT_HOST, f"{ENDPOINT_PATH}{path}", "GET", handler, repeat=repeat
+        )
+
+    async def test_endpoint_timeouts(self):
+        self.add_response("system_status/soe", {"percentage": 50}, delay=1)
+        self.add_response("status", {"version": "1.50.1"}, delay=0.05)
+
+        async with API(ENDPOINT, endpoint_timeouts={"system_status/soe": 0.05}) as api:
+            start = time.monotonic()
+            with self.assertRaises(RequestTimeoutError) as context:
+                await api.get_system_status_soe()
+            self.assertLess(time.monotonic() - start, 0.5)
+            self.assertEqual(context.exception.path, "system_status/soe")
+            self.assertEqual(context.exception.timeout, 0.05)
+            self.assertIsInstance(context.exception, PowerwallUnreachableError)
+            self.assertIsInstance(context.exception, TimeoutError)
+
+            self.assertEqual(await api.get_status(), {"version": "1.50.1"})
+
+    async def test_no_timeout(self):
+        self.add_response("status", {"version": "1.50.1"}, delay=0.05)
+        self.add_response("status", {"version": "1.50.1"}, delay=1)
+
+        async with API(ENDPOINT, timeout=None) as api:
+            request = mock.patch.object(
+                api._http_session, "request", wraps=api._http_session.request
+            )
+            with request as spy:
+                self.assertEqual(await api.get_status(), {"version": "1.50.1"})
+            self.assertIsNone(spy.call_args.kwargs["timeout"].total)
+            self.assertIsNone(api.timeout_policy("status").timeout("status"))
+
+            # A deadline still limits requests without a timeout
+            with self.assertRaises(RequestTimeoutError) as context:
+                with deadline(0.05):
+                    await api.get_status()
+            self.assertAlmostEqual(context.exception.timeout, 0.05, delta=0.01)
+
+    async def test_adaptive_timeout(self):
+        self.add_response("system_status/soe", {"percentage": 50}, repeat=3)
+        self.add_response("system_status/soe", {"percentage": 50}, delay=1)
+        policy = AdaptiveTimeout(floor=0.1, ceiling=10, min_samples=3)
+
+        async with API(ENDPOINT, timeout=policy) as api:
+            for _ in range(3):
+                await api.get_system_status_soe()
+            self.assertEqual(policy.timeout("system_status/soe"), 0.1)
+
+            start = time.monotonic()
+            with self.assertRaises(RequestTimeoutError):
+                await api.get_system_status_soe()
+            self.assertLess(time.monotonic() - start, 0.5)
+
+    async def test_deadline(self):
+        self.add_response("system_status/soe", {"percentage": 50}, delay=1)
+        self.add_response("status", {"version": "1.50.1"}, delay=1)
+
+        async with API(ENDPOINT) as api:
+            start = time.monotonic()
+            with self.assertRaises(RequestTimeoutError):
+                with deadline(0.1):
+                    await asyncio.gather(api.get_system_status_soe(), api.get_status())
+            self.assertLess(time.monotonic() - start, 0.5)
+
+            # No request is sent once the deadline has passed
+            with deadline(0):
+                with self.assertRaises(RequestTimeoutError):
+                    await api.get_status()
+
+    async def test_observe(self):
+        self.add_response("status", {"version": "1.50.1"})
+        self.add_response("status", {}, delay=1, repeat=2)
+        policy = RecordingTimeout(0.1)
+
+        async with API(ENDPOINT, timeout=policy) as api:
+            await api.get_status()
+            with self.assertRaises(RequestTimeoutError):
+                await api.get_status()
+            self.assertEqual(policy.observed, ["status", "status"])
+
+            # Timed out because of the deadline, not because of the endpoint
+            with self.assertRaises(RequestTimeoutError):
+                with deadline(0.05):
+                    await api.get_status()
+            self.assertEqual(policy.observed, ["status", "status"])
+
+    async def test_snapshot_timeout(self):
+        self.add_response("meters/aggregates", METERS_AGGREGATES_RESPONSE)
+        self.add_response("system_status/soe", {"percentage": 50})
+        self.add_response("system_status/grid_status", GRID_STATUS_RESPONSE)
+        self.add_response("system_status", {}, delay=1)
+        self.add_response("operation", OPERATION_RESPONSE)
+
+        async with Powerwall(ENDPOINT) as powerwall:
+            start = time.monotonic()
+            with self.assertRaises(RequestTimeoutError) as context:
+                await powerwall.get_snapshot(timeout=0.2)
+            self.assertLess(time.monotonic() - start, 0.6)
+            self.assertEqual(context.exception.path, "system_status")